@@ -1,19 +1,99 @@
 import os
-from huggingface_hub import InferenceClient
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
 from dotenv import load_dotenv
 
+from app.ai_models import get_model_settings
+from app.inference import HuggingFaceBackend, InferenceRouter, LlamaCppBackend
+
 load_dotenv()
 
 AI_API_KEY = os.getenv("AI_API_KEY")
+AI_HTTP_TIMEOUT = float(os.getenv("AI_HTTP_TIMEOUT", "60"))
+# An OpenAI-compatible server to send chat completions to, such as a dedicated Inference
+# Endpoint or a local stand-in, instead of the Hugging Face router
+AI_BASE_URL = os.getenv("AI_BASE_URL") or None
+# Several backends to route between, as comma-separated "name=model_id" or "name=model_id@base_url"
+# entries, such as "router=meta-llama/Llama-3.1-8B-Instruct,endpoint=meta-llama/Llama-3.1-8B-Instruct@https://..."
+# Defaults to the configured model on AI_BASE_URL
+AI_BACKENDS = os.getenv("AI_BACKENDS", "")
+# A quantized GGUF model to run on the CPU when every remote backend fails, needs llama-cpp-python
+AI_LOCAL_MODEL_PATH = os.getenv("AI_LOCAL_MODEL_PATH") or None
+AI_LOCAL_CONTEXT_WINDOW = int(os.getenv("AI_LOCAL_CONTEXT_WINDOW", "8192"))
+AI_LOCAL_THREADS = int(os.getenv("AI_LOCAL_THREADS")) if os.getenv("AI_LOCAL_THREADS") else None
+
+_client = None
+_client_lock = threading.Lock()
+
 
-def get_ai_client() -> InferenceClient:
+def parse_backends(spec: str) -> List[Tuple[str, str, Optional[str]]]:
     """
-    Initializes and returns a Hugging Face InferenceClient.
+    Returns (name, model id, base url) of each AI_BACKENDS entry.
+    """
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, target = entry.partition("=")
+        model_id, _, base_url = target.partition("@")
+        if not name or not model_id:
+            raise ValueError(f"Invalid AI_BACKENDS entry: {entry!r}")
+        backends.append((name.strip(), model_id.strip(), base_url.strip() or None))
+    return backends
+
+
+def create_ai_client():
+    """
+    Initializes and returns the router over the configured inference backends:
+    Hugging Face AsyncInferenceClients, and the local model when AI_LOCAL_MODEL_PATH is set.
     """
     if not AI_API_KEY:
         raise ValueError("AI_API_KEY must be set in the environment for the Hugging Face client.")
 
-    return InferenceClient(token=AI_API_KEY)
+    backends = parse_backends(AI_BACKENDS) or [("default", get_model_settings().model_id, AI_BASE_URL)]
+    router = InferenceRouter([HuggingFaceBackend(name, model_id, AI_API_KEY, base_url, AI_HTTP_TIMEOUT)
+                              for name, model_id, base_url in backends])
+    if AI_LOCAL_MODEL_PATH:
+        router.register(LlamaCppBackend("local", AI_LOCAL_MODEL_PATH, AI_LOCAL_CONTEXT_WINDOW, AI_LOCAL_THREADS))
+    return router
+
+
+def get_ai_client():
+    """
+    Returns the single client instance reused by every call, created on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_ai_client()
+    return _client
+
+
+async def close_ai_client() -> None:
+    """
+    Closes the client if it was ever created.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def ai_backend_stats() -> Dict[str, Any]:
+    """
+    Returns the router's per-backend timings, without creating the client for them.
+    """
+    return _client.stats() if _client is not None else {"hedges": 0, "backends": []}
+
+
+class LazyAIClient:
+    """
+    Stands in for the AI client so modules can hold it from import time,
+    the client is only created by the first call made through it.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_ai_client(), name)
+
 
-# Initialize a single client instance to be reused
-client = get_ai_client()
\ No newline at end of file
+client = LazyAIClient()
@@ -0,0 +1,55 @@
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class ModelSettings:
+    model_id: str
+    # Token budget for prompt + completion. Kept below the model's hard limit so latency stays predictable.
+    context_window: int
+    max_output_tokens: int
+    # Hugging Face repo of the tokenizer used for budgeting, defaults to the model itself
+    tokenizer_id: Optional[str] = None
+    # Ask for a JSON workout plan constrained to its schema instead of free text
+    structured_output: bool = True
+    # A JSON plan spells out every field name, it needs more room than the same plan as text
+    max_plan_tokens: int = 1200
+
+
+MODELS = {
+    "llama-3.1-8b": ModelSettings(model_id="meta-llama/Llama-3.1-8B-Instruct",
+                                  context_window=8192, max_output_tokens=500),
+    "qwen-2.5-7b": ModelSettings(model_id="Qwen/Qwen2.5-7B-Instruct",
+                                 context_window=8192, max_output_tokens=500),
+    "mistral-7b": ModelSettings(model_id="mistralai/Mistral-7B-Instruct-v0.3",
+                                context_window=8192, max_output_tokens=500),
+}
+
+DEFAULT_MODEL = "llama-3.1-8b"
+
+
+def get_model_settings(name: Optional[str] = None) -> ModelSettings:
+    """
+    Returns the settings of the configured model.
+    AI_MODEL accepts a key of MODELS or a raw Hugging Face model id,
+    AI_MAX_TOKENS, AI_MAX_PLAN_TOKENS and AI_CONTEXT_WINDOW override the limits,
+    AI_STRUCTURED_OUTPUT=false asks for free text for models without JSON output.
+    """
+    name = name or os.getenv("AI_MODEL", DEFAULT_MODEL)
+    settings = MODELS.get(name) or replace(MODELS[DEFAULT_MODEL], model_id=name)
+
+    if os.getenv("AI_MAX_TOKENS"):
+        settings = replace(settings, max_output_tokens=int(os.getenv("AI_MAX_TOKENS")))
+    if os.getenv("AI_MAX_PLAN_TOKENS"):
+        settings = replace(settings, max_plan_tokens=int(os.getenv("AI_MAX_PLAN_TOKENS")))
+    if os.getenv("AI_CONTEXT_WINDOW"):
+        settings = replace(settings, context_window=int(os.getenv("AI_CONTEXT_WINDOW")))
+    if os.getenv("AI_STRUCTURED_OUTPUT"):
+        settings = replace(settings,
+                           structured_output=os.getenv("AI_STRUCTURED_OUTPUT").lower() in ("1", "true", "yes"))
+    return settings
@@ -1,20 +1,86 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from firebase_admin import auth
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+
+class VerifiedTokenCache:
+    """
+    Decoded claims of already verified ID tokens, keyed by a SHA-256 of the token.
+    An entry is only served until the token's `exp` claim, so an expired token is
+    always sent back to Firebase and rejected there.
+    """
+
+    def __init__(self, max_entries: int = AUTH_TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims.get("exp", 0) > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return claims
+            if claims is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict) -> None:
+        if "exp" not in claims:
+            return
+        with self._lock:
+            self._entries[self._key(token)] = claims
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache()
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Dependency to get the current user from a Firebase ID token.
     Verifies the token and returns the user object.
+    Already verified tokens are served from `token_cache` until they expire,
+    only a cache miss pays for the signature check on the threadpool.
     """
+    decoded_token = token_cache.get(token)
+    if decoded_token is not None:
+        return decoded_token
     try:
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await run_in_threadpool(auth.verify_id_token, token)
+        token_cache.put(token, decoded_token)
         return decoded_token
     except auth.ExpiredIdTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="ID token has expired.")
     except auth.InvalidIdTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid ID token.")
     except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials.")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials.")
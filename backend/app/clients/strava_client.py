@@ -1,8 +1,111 @@
-import requests
-from typing import Dict, Any, List
+import asyncio
+import os
+import random
+import re
+import httpx
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.clients.strava_rate_limit import (BACKGROUND, INTERACTIVE, STRAVA_QUOTA_FIRESTORE,
+                                           StravaQuotaStore, StravaRateLimiter)
+from app.telemetry import span
+
+STRAVA_API_BASE_URL = os.getenv("STRAVA_API_BASE_URL", "https://www.strava.com/api/v3")
+STRAVA_OAUTH_URL = os.getenv("STRAVA_OAUTH_URL", "https://www.strava.com/oauth")
+
+# Connection pool settings for the shared Strava HTTP client
+STRAVA_HTTP_MAX_CONNECTIONS = int(os.getenv("STRAVA_HTTP_MAX_CONNECTIONS", "100"))
+STRAVA_HTTP_MAX_KEEPALIVE = int(os.getenv("STRAVA_HTTP_MAX_KEEPALIVE", "20"))
+STRAVA_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("STRAVA_HTTP_KEEPALIVE_EXPIRY", "30"))
+STRAVA_HTTP_TIMEOUT = float(os.getenv("STRAVA_HTTP_TIMEOUT", "10"))
+# Whole-call deadlines per priority lane, including retries
+STRAVA_INTERACTIVE_TIMEOUT = float(os.getenv("STRAVA_INTERACTIVE_TIMEOUT", "10"))
+STRAVA_BACKGROUND_TIMEOUT = float(os.getenv("STRAVA_BACKGROUND_TIMEOUT", "120"))
+STRAVA_MAX_RETRIES = int(os.getenv("STRAVA_MAX_RETRIES", "3"))
+STRAVA_BACKOFF_BASE_SECONDS = float(os.getenv("STRAVA_BACKOFF_BASE_SECONDS", "0.5"))
+STRAVA_BACKOFF_MAX_SECONDS = float(os.getenv("STRAVA_BACKOFF_MAX_SECONDS", "8"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+rate_limiter = StravaRateLimiter()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared keep-alive HTTP client used for every Strava call.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=STRAVA_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=STRAVA_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=STRAVA_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=STRAVA_HTTP_TIMEOUT,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Closes the shared HTTP client and its pooled connections.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def configure_shared_quota(firestore_db) -> None:
+    """
+    Shares the rate-limit usage across instances through Firestore, when enabled.
+    """
+    if STRAVA_QUOTA_FIRESTORE:
+        rate_limiter.quota_store = StravaQuotaStore(firestore_db)
+
+
+def _retryable(response: httpx.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter, spreads retries of concurrent callers apart
+    return random.uniform(0, min(STRAVA_BACKOFF_MAX_SECONDS, STRAVA_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _operation(method: str, url: str) -> str:
+    # Ids replaced by a placeholder, one metric series per endpoint
+    return f"{method} " + re.sub(r"/\d+", "/{id}", url.split("?", 1)[0].removeprefix(STRAVA_API_BASE_URL))
+
+
+async def _send(method: str, url: str, priority: int, **kwargs) -> httpx.Response:
+    operation = _operation(method, url)
+    for attempt in range(STRAVA_MAX_RETRIES + 1):
+        await rate_limiter.acquire(priority)
+        try:
+            with span("strava", operation) as strava_span:
+                response = await get_http_client().request(method, url, **kwargs)
+                strava_span.status = str(response.status_code)
+        except httpx.TransportError:
+            if attempt == STRAVA_MAX_RETRIES:
+                raise
+        else:
+            rate_limiter.update(response.headers, response.status_code)
+            if not _retryable(response) or attempt == STRAVA_MAX_RETRIES:
+                return response
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def request(method: str, url: str, priority: int = INTERACTIVE,
+                  timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+    """
+    Sends a Strava API call through the rate limiter, retrying 429, 5xx and
+    connection errors with jittered exponential backoff.
+    `timeout` bounds the whole call, waiting for quota and retries included.
+    """
+    if timeout is None:
+        timeout = STRAVA_INTERACTIVE_TIMEOUT if priority == INTERACTIVE else STRAVA_BACKGROUND_TIMEOUT
+    return await asyncio.wait_for(_send(method, url, priority, **kwargs), timeout)
 
-STRAVA_API_BASE_URL = "https://www.strava.com/api/v3"
-STRAVA_OAUTH_URL = "https://www.strava.com/oauth"
 
 def get_authorization_url(client_id: str, redirect_uri: str) -> str:
     """
@@ -18,7 +121,7 @@ def get_authorization_url(client_id: str, redirect_uri: str) -> str:
     auth_url = f"{STRAVA_OAUTH_URL}/authorize?{'&'.join([f'{k}={v}' for k, v in params.items()])}"
     return auth_url
 
-def get_tokens(client_id: str, client_secret: str, code: str) -> Dict[str, Any]:
+async def get_tokens(client_id: str, client_secret: str, code: str) -> Dict[str, Any]:
     """
     Exchanges authorization code to access and refresh tokens.
     """
@@ -28,16 +131,85 @@ def get_tokens(client_id: str, client_secret: str, code: str) -> Dict[str, Any]:
         "code": code,
         "grant_type": "authorization_code",
     }
-    response = requests.post(f"{STRAVA_OAUTH_URL}/token", data=payload)
+    with span("strava", "POST /oauth/token") as strava_span:
+        response = await get_http_client().post(f"{STRAVA_OAUTH_URL}/token", data=payload)
+        strava_span.status = str(response.status_code)
     response.raise_for_status()
     return response.json()
 
-def get_activities(access_token: str, per_page: int) -> List[Dict[str, Any]]:
+async def refresh_access_token(client_id: str, client_secret: str, refresh_token: str) -> Dict[str, Any]:
     """
-    Fetches the latest activities
+    Exchanges a refresh token for a new short-lived access token.
+    The response may carry a new refresh token, which replaces the old one.
+    """
+    payload = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token",
+    }
+    with span("strava", "POST /oauth/token") as strava_span:
+        response = await get_http_client().post(f"{STRAVA_OAUTH_URL}/token", data=payload)
+        strava_span.status = str(response.status_code)
+    response.raise_for_status()
+    return response.json()
+
+async def get_activities(access_token: str, per_page: int, page: int = 1,
+                         after: Optional[int] = None, before: Optional[int] = None,
+                         priority: int = INTERACTIVE) -> List[Dict[str, Any]]:
+    """
+    Fetches a page of activities, newest first.
+    `after` and `before` are epoch timestamps bounding the activity start time.
     """
     headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"per_page": per_page, "page": page}
+    if after is not None:
+        params["after"] = after
+    if before is not None:
+        params["before"] = before
+    response = await request("GET", f"{STRAVA_API_BASE_URL}/athlete/activities",
+                             priority=priority, headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
+
+async def get_activities_if_modified(access_token: str, per_page: int,
+                                     etag: Optional[str] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Fetches the latest activities, revalidating against a previously seen ETag.
+    Returns (None, etag) when Strava answers 304 Not Modified.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    if etag:
+        headers["If-None-Match"] = etag
     params = {"per_page": per_page, "page": 1}
-    response = requests.get(f"{STRAVA_API_BASE_URL}/athlete/activities", headers=headers, params=params)
+    response = await request("GET", f"{STRAVA_API_BASE_URL}/athlete/activities",
+                             headers=headers, params=params)
+    if response.status_code == 304:
+        return None, etag
     response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return response.json(), response.headers.get("ETag")
+
+async def get_activity(access_token: str, activity_id: int, priority: int = INTERACTIVE) -> Dict[str, Any]:
+    """
+    Fetches a single activity by id.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await request("GET", f"{STRAVA_API_BASE_URL}/activities/{activity_id}",
+                             priority=priority, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+async def get_activity_streams(access_token: str, activity_id: int, keys: List[str],
+                               priority: int = BACKGROUND) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetches the time-series streams of an activity, keyed by stream type.
+    Streams the activity has no data for are absent from the result.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"keys": ",".join(keys), "key_by_type": "true"}
+    response = await request("GET", f"{STRAVA_API_BASE_URL}/activities/{activity_id}/streams",
+                             priority=priority, headers=headers, params=params)
+    if response.status_code == 404:
+        return {}
+    response.raise_for_status()
+    return response.json()
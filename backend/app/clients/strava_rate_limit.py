@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Strava's default application limits, replaced by the X-RateLimit-Limit header once seen
+STRAVA_RATE_LIMIT_SHORT = int(os.getenv("STRAVA_RATE_LIMIT_SHORT", "200"))
+STRAVA_RATE_LIMIT_DAILY = int(os.getenv("STRAVA_RATE_LIMIT_DAILY", "2000"))
+# Share of each window background sync may not touch, kept for interactive reads
+STRAVA_RATE_LIMIT_RESERVE = float(os.getenv("STRAVA_RATE_LIMIT_RESERVE", "0.2"))
+STRAVA_RATE_LIMIT_BACKGROUND_BURST = float(os.getenv("STRAVA_RATE_LIMIT_BACKGROUND_BURST", "5"))
+# Longest an interactive call waits for quota before failing fast
+STRAVA_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("STRAVA_RATE_LIMIT_MAX_WAIT_SECONDS", "5"))
+STRAVA_QUOTA_FIRESTORE = os.getenv("STRAVA_QUOTA_FIRESTORE", "false").lower() in ("1", "true", "yes")
+STRAVA_QUOTA_SYNC_SECONDS = float(os.getenv("STRAVA_QUOTA_SYNC_SECONDS", "5"))
+STRAVA_QUOTA_COLLECTION = "strava_rate_limit"
+
+# Priority lanes, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+SHORT_WINDOW_SECONDS = 15 * 60
+DAY_SECONDS = 24 * 3600
+
+
+class StravaRateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Strava rate limit reached, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def _parse_pair(value: Optional[str]):
+    try:
+        short, daily = (int(part.strip()) for part in value.split(",")[:2])
+        return short, daily
+    except Exception:
+        return None
+
+
+class StravaQuotaStore:
+    """
+    Publishes the last seen usage to Firestore so every instance sees what the others spent.
+    """
+
+    def __init__(self, firestore_db, collection: str = STRAVA_QUOTA_COLLECTION, document: str = "app"):
+        self.firestore_db = firestore_db
+        self.collection = collection
+        self.document = document
+
+    def _ref(self):
+        return self.firestore_db.collection(self.collection).document(self.document)
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        with span("firestore", "strava_rate_limit.get"):
+            snapshot = await run_in_threadpool(self._ref().get)
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def publish(self, state: Dict[str, Any]) -> None:
+        with span("firestore", "strava_rate_limit.set"):
+            await run_in_threadpool(self._ref().set, state)
+
+
+class StravaRateLimiter:
+    """
+    Client-side view of the Strava application quota: a 15 minute window and a daily one.
+
+    Every response's X-RateLimit-Limit / X-RateLimit-Usage headers reset the usage
+    counters, and calls in between are counted locally. Interactive calls may spend
+    the whole window. Background calls stop at a reserve and draw from a token bucket
+    refilled at the rate that spreads the rest of their share over what is left of the
+    window, so a backfill cannot burn the quota in a burst.
+    """
+
+    def __init__(self, short_limit: int = STRAVA_RATE_LIMIT_SHORT, daily_limit: int = STRAVA_RATE_LIMIT_DAILY,
+                 reserve: float = STRAVA_RATE_LIMIT_RESERVE, background_burst: float = STRAVA_RATE_LIMIT_BACKGROUND_BURST,
+                 max_wait_seconds: float = STRAVA_RATE_LIMIT_MAX_WAIT_SECONDS,
+                 quota_store: Optional[StravaQuotaStore] = None, sync_seconds: float = STRAVA_QUOTA_SYNC_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.background_burst = background_burst
+        self.max_wait_seconds = max_wait_seconds
+        self.quota_store = quota_store
+        self.sync_seconds = sync_seconds
+        self.clock = clock
+        self.short_usage = 0
+        self.daily_usage = 0
+        self._window = self._day = None
+        self._background_tokens = background_burst
+        self._background_refilled_at = clock()
+        self._interactive_waiting = 0
+        self._synced_at = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+        self.throttled = 0
+
+    def _roll(self, now: float) -> None:
+        # Strava's short window starts on the quarter hour, the daily one at midnight UTC
+        window, day = int(now // SHORT_WINDOW_SECONDS), int(now // DAY_SECONDS)
+        if window != self._window:
+            self._window, self.short_usage = window, 0
+        if day != self._day:
+            self._day, self.daily_usage = day, 0
+
+    def _seconds_to_reset(self, now: float, daily: bool) -> float:
+        period = DAY_SECONDS if daily else SHORT_WINDOW_SECONDS
+        return period - now % period
+
+    def _background_allowance(self) -> float:
+        reserve_short = self.short_limit * self.reserve
+        reserve_daily = self.daily_limit * self.reserve
+        return min(self.short_limit - reserve_short - self.short_usage,
+                   self.daily_limit - reserve_daily - self.daily_usage)
+
+    def _refill_background(self, now: float) -> float:
+        allowance = max(self._background_allowance(), 0)
+        rate = allowance / max(self._seconds_to_reset(now, daily=False), 1)
+        elapsed = now - self._background_refilled_at
+        self._background_tokens = min(self.background_burst, self._background_tokens + elapsed * rate)
+        self._background_refilled_at = now
+        return rate
+
+    def _wait_for_reset(self, now: float) -> float:
+        waits = []
+        if self.short_usage >= self.short_limit:
+            waits.append(self._seconds_to_reset(now, daily=False))
+        if self.daily_usage >= self.daily_limit:
+            waits.append(self._seconds_to_reset(now, daily=True))
+        return max(waits) if waits else 0.0
+
+    def try_acquire(self, priority: int = INTERACTIVE) -> float:
+        """
+        Takes one call from the quota and returns 0, or returns the seconds to wait before retrying.
+        """
+        now = self.clock()
+        self._roll(now)
+        if priority == INTERACTIVE:
+            wait = self._wait_for_reset(now)
+        else:
+            rate = self._refill_background(now)
+            if self._interactive_waiting or self._background_allowance() < 1:
+                wait = max(self._wait_for_reset(now), 1.0)
+            elif self._background_tokens < 1:
+                wait = (1 - self._background_tokens) / rate if rate else 1.0
+            else:
+                self._background_tokens -= 1
+                wait = 0.0
+        if wait:
+            return wait
+        self.short_usage += 1
+        self.daily_usage += 1
+        return 0.0
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        """
+        Waits for quota. Interactive calls fail with StravaRateLimited rather than wait long.
+        """
+        self._maybe_sync()
+        if priority == INTERACTIVE:
+            self._interactive_waiting += 1
+        try:
+            while True:
+                wait = self.try_acquire(priority)
+                if not wait:
+                    return
+                self.throttled += 1
+                if priority == INTERACTIVE and wait > self.max_wait_seconds:
+                    raise StravaRateLimited(wait)
+                # Re-check regularly, a response or another instance may report fresher usage
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            if priority == INTERACTIVE:
+                self._interactive_waiting -= 1
+
+    def update(self, headers: Mapping[str, str], status_code: Optional[int] = None) -> None:
+        """
+        Resets the counters from a response's rate-limit headers.
+        """
+        self._roll(self.clock())
+        limits = _parse_pair(headers.get("X-RateLimit-Limit"))
+        usage = _parse_pair(headers.get("X-RateLimit-Usage"))
+        if limits:
+            self.short_limit, self.daily_limit = limits
+        if usage:
+            self.short_usage, self.daily_usage = usage
+        if status_code == 429 and not usage:
+            # Over the limit without usage headers, assume the short window is spent
+            self.short_usage = max(self.short_usage, self.short_limit)
+        if usage or status_code == 429:
+            self._maybe_sync(publish=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "short_usage": self.short_usage, "short_limit": self.short_limit,
+            "daily_usage": self.daily_usage, "daily_limit": self.daily_limit,
+            "throttled": self.throttled,
+        }
+
+    def _maybe_sync(self, publish: bool = False) -> None:
+        if self.quota_store is None or (self._sync_task is not None and not self._sync_task.done()):
+            return
+        now = self.clock()
+        if now - self._synced_at < self.sync_seconds:
+            return
+        self._synced_at = now
+        try:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync(publish))
+        except RuntimeError:
+            pass
+
+    async def _sync(self, publish: bool) -> None:
+        try:
+            shared = await self.quota_store.load()
+            self._roll(self.clock())
+            if shared and shared.get("window") == self._window:
+                self.short_usage = max(self.short_usage, shared.get("short_usage", 0))
+            if shared and shared.get("day") == self._day:
+                self.daily_usage = max(self.daily_usage, shared.get("daily_usage", 0))
+            if publish:
+                await self.quota_store.publish({
+                    "window": self._window, "day": self._day,
+                    "short_usage": self.short_usage, "daily_usage": self.daily_usage,
+                    "short_limit": self.short_limit, "daily_limit": self.daily_limit,
+                    "updated_at": datetime.now(timezone.utc),
+                })
+        except Exception as e:
+            logger.error(f"Error syncing the shared Strava quota: {e}")
@@ -0,0 +1,139 @@
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
+
+# Smaller bodies gain little and cost a compressor per response
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Levels for responses compressed on the fly, well below the maximums that only pay off for static assets
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    # Server-Sent Events must reach the client as they are sent
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    The encoding to answer an Accept-Encoding header with: the one with the highest
+    q-value among br (when brotli is installed) and gzip, br on a tie. None for identity.
+    """
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    candidates = [(weights.get(name, weights.get("*", 0.0)), -rank, name) for rank, name in enumerate(available)]
+    weight, _, name = max(candidates)
+    return name if weight > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        """
+        Compresses a chunk of a streamed body and flushes it, so lines are not held back.
+        """
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def _compressed_headers(headers: List[Tuple[bytes, bytes]], encoding: str) -> List[Tuple[bytes, bytes]]:
+    result = []
+    for name, value in headers:
+        if name.lower() == b"content-length":
+            continue
+        if name.lower() == b"etag" and value.startswith(b'"'):
+            # The compressed body is a different representation, a strong ETag would claim byte equality
+            value = b"W/" + value
+        result.append((name, value))
+    return result + [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip, as negotiated with Accept-Encoding.
+    JSON, NDJSON and text bodies of at least COMPRESSION_MIN_SIZE bytes are compressed,
+    streamed bodies chunk by chunk; event streams and already encoded bodies are not.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = b""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value
+        encoding = choose_encoding(accept_encoding.decode("latin-1")) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                if (b"content-encoding" in headers
+                        or not is_compressible(headers.get(b"content-type", b"").decode("latin-1"))):
+                    await send(message)
+                    return
+                # Held back until the first body message tells whether and how to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                await send({**start_message, "headers": _compressed_headers(start_message.get("headers", []),
+                                                                          encoding)})
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
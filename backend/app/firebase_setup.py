@@ -1,20 +1,61 @@
+import logging
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-try:
-    if not firebase_admin._apps:
-        if os.getenv('K_SERVICE'):
-            # Production environment on Google Cloud
-            firebase_admin.initialize_app()
-            print("Firebase Admin SDK initialized in PRODUCTION mode.")
-        else:
-            # Local development
-            SERVICE_ACCOUNT_KEY_PATH = os.path.join(os.path.dirname(__file__), "firebase-service-account.json")
-            cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
-            firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK initialized in LOCAL mode.")
-except Exception as e:
-    print(f"Error initializing Firebase Admin SDK: {e}")
-
-db = firestore.client()
\ No newline at end of file
+import threading
+
+logger = logging.getLogger(__name__)
+
+_db = None
+_lock = threading.RLock()
+
+
+def initialize_firebase():
+    """
+    Initializes the default Firebase app once. Cheap, unlike creating the Firestore client.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _lock:
+        try:
+            if not firebase_admin._apps:
+                if os.getenv('K_SERVICE'):
+                    # Production environment on Google Cloud
+                    firebase_admin.initialize_app()
+                    logger.info("Firebase Admin SDK initialized in PRODUCTION mode.")
+                else:
+                    # Local development
+                    SERVICE_ACCOUNT_KEY_PATH = os.path.join(os.path.dirname(__file__), "firebase-service-account.json")
+                    cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
+                    firebase_admin.initialize_app(cred)
+                    logger.info("Firebase Admin SDK initialized in LOCAL mode.")
+        except Exception as e:
+            logger.error(f"Error initializing Firebase Admin SDK: {e}")
+
+
+def get_firestore_db():
+    """
+    Returns the shared Firestore client, initializing the Firebase Admin SDK on first use.
+    Safe to call from the threadpool, the client is created once.
+    """
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                # firebase_admin.firestore pulls in the whole Google Cloud client stack
+                from firebase_admin import firestore
+                initialize_firebase()
+                _db = firestore.client()
+    return _db
+
+
+class LazyFirestoreClient:
+    """
+    Stands in for the Firestore client so modules can hold it from import time,
+    the client is only created by the first call made through it.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_firestore_db(), name)
+
+
+db = LazyFirestoreClient()
@@ -0,0 +1,381 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import ai_backend_calls
+
+logger = logging.getLogger(__name__)
+
+# A second backend is asked when the first has not answered within this percentile of its recent latencies
+AI_HEDGE_ENABLED = os.getenv("AI_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "0.95"))
+# Until a backend has this many samples its budget is AI_HEDGE_DEFAULT_SECONDS
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+AI_HEDGE_DEFAULT_SECONDS = float(os.getenv("AI_HEDGE_DEFAULT_SECONDS", "10"))
+AI_MAX_HEDGES = int(os.getenv("AI_MAX_HEDGES", "1"))
+# A backend failing this many calls in a row is only tried after the others for the cooldown
+AI_BACKEND_FAILURES = int(os.getenv("AI_BACKEND_FAILURES", "3"))
+AI_BACKEND_COOLDOWN_SECONDS = float(os.getenv("AI_BACKEND_COOLDOWN_SECONDS", "30"))
+AI_BACKEND_WINDOW = int(os.getenv("AI_BACKEND_WINDOW", "200"))
+# Weight of the latest sample in a backend's moving average latency, which routing ranks by
+AI_BACKEND_EWMA_ALPHA = float(os.getenv("AI_BACKEND_EWMA_ALPHA", "0.2"))
+
+# Completions are timed until they return, streams until their first chunk
+KINDS = ("complete", "stream")
+
+
+def _namespace(value):
+    """
+    Gives llama.cpp's OpenAI-style dicts the attribute access of Hugging Face's outputs.
+    """
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class BackendTimings:
+    """
+    The latencies of a backend's last `window` successful calls of one kind, and its call outcomes.
+    """
+
+    def __init__(self, window: int = AI_BACKEND_WINDOW):
+        self.latencies: deque = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def record(self, seconds: float, complete: bool = True) -> None:
+        """
+        A cancelled call only tells the latency was at least `seconds`: it moves the average,
+        so a backend that always loses its hedges ranks last, but not the percentiles.
+        """
+        if complete:
+            self.latencies.append(seconds)
+        self.ewma = seconds if self.ewma is None else (
+            AI_BACKEND_EWMA_ALPHA * seconds + (1 - AI_BACKEND_EWMA_ALPHA) * self.ewma)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "errors": self.errors, "cancelled": self.cancelled,
+                "samples": len(self.latencies), "ewma": self.ewma,
+                "p50": self.percentile(0.5), "p95": self.percentile(0.95)}
+
+
+class InferenceBackend:
+    """
+    A model server answering chat completions with Hugging Face's `chat_completion` interface.
+    `local` backends run in this process and are only used when every remote one failed.
+    """
+
+    local = False
+
+    def __init__(self, name: str, model_id: str):
+        self.name = name
+        self.model_id = model_id
+        self.timings = {kind: BackendTimings() for kind in KINDS}
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.hedge_wins = 0
+
+    async def chat_completion(self, messages: List[Dict[str, str]], stream: bool = False, **options):
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def succeeded(self, kind: str, seconds: float) -> None:
+        self.consecutive_failures = 0
+        self.timings[kind].record(seconds)
+
+    def failed(self, kind: str) -> None:
+        self.timings[kind].errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= AI_BACKEND_FAILURES:
+            self.cooldown_until = time.monotonic() + AI_BACKEND_COOLDOWN_SECONDS
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "model": self.model_id, "local": self.local,
+                "available": self.available(time.monotonic()), "consecutive_failures": self.consecutive_failures,
+                "hedge_wins": self.hedge_wins, **{kind: self.timings[kind].stats() for kind in KINDS}}
+
+
+class HuggingFaceBackend(InferenceBackend):
+    """
+    The Hugging Face router, or an OpenAI-compatible server at `base_url` such as a
+    dedicated Inference Endpoint. The client keeps its HTTP session open between calls.
+    """
+
+    def __init__(self, name: str, model_id: str, token: str, base_url: Optional[str] = None,
+                 timeout: float = 60.0):
+        super().__init__(name, model_id)
+        self.token = token
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # The inference client imports most of huggingface_hub, keep it off the import path
+                    from huggingface_hub import AsyncInferenceClient
+
+                    self._client = AsyncInferenceClient(base_url=self.base_url, token=self.token,
+                                                        timeout=self.timeout)
+        return self._client
+
+    async def chat_completion(self, messages: List[Dict[str, str]], stream: bool = False, **options):
+        return await self.client.chat_completion(model=self.model_id, messages=messages, stream=stream, **options)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class LlamaCppBackend(InferenceBackend):
+    """
+    A small quantized GGUF model run on the CPU with llama.cpp, for degraded mode when
+    the remote backends are down. Needs the optional llama-cpp-python package, the
+    model is loaded on first use and serves one generation at a time.
+    """
+
+    local = True
+
+    def __init__(self, name: str, model_path: str, context_window: int = 4096, threads: Optional[int] = None):
+        super().__init__(name, os.path.basename(model_path))
+        self.model_path = model_path
+        self.context_window = context_window
+        self.threads = threads
+        self._llama = None
+        self._load_lock = threading.Lock()
+        self._generate_lock = asyncio.Lock()
+
+    def _load(self):
+        if self._llama is None:
+            with self._load_lock:
+                if self._llama is None:
+                    # Imported on first use, loading llama.cpp's native library is slow and only this backend needs it
+                    try:
+                        from llama_cpp import Llama
+                    except ImportError:
+                        raise RuntimeError("The local inference backend needs the llama-cpp-python package.")
+                    self._llama = Llama(model_path=self.model_path, n_ctx=self.context_window,
+                                        n_threads=self.threads, verbose=False)
+        return self._llama
+
+    def _options(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        response_format = options.pop("response_format", None)
+        if response_format is not None and response_format.get("type") == "json_schema":
+            # llama.cpp constrains the output to the schema with a grammar
+            options["response_format"] = {"type": "json_object",
+                                          "schema": response_format["json_schema"]["schema"]}
+        return options
+
+    async def chat_completion(self, messages: List[Dict[str, str]], stream: bool = False, **options):
+        options = self._options(options)
+        if stream:
+            return self._stream(messages, options)
+        llama = await run_in_threadpool(self._load)
+        async with self._generate_lock:
+            completion = await run_in_threadpool(lambda: llama.create_chat_completion(messages=messages, **options))
+        return _namespace(completion)
+
+    async def _stream(self, messages: List[Dict[str, str]], options: Dict[str, Any]) -> AsyncIterator:
+        llama = await run_in_threadpool(self._load)
+        async with self._generate_lock:
+            chunks = await run_in_threadpool(
+                lambda: llama.create_chat_completion(messages=messages, stream=True, **options))
+            done = object()
+            try:
+                while True:
+                    chunk = await run_in_threadpool(next, chunks, done)
+                    if chunk is done:
+                        return
+                    yield _namespace(chunk)
+            finally:
+                # Stops generating when the stream is closed early
+                chunks.close()
+
+
+async def _chain(first, rest: AsyncIterator) -> AsyncIterator:
+    try:
+        yield first
+        async for chunk in rest:
+            yield chunk
+    finally:
+        if hasattr(rest, "aclose"):
+            await rest.aclose()
+
+
+async def _empty() -> AsyncIterator:
+    return
+    yield
+
+
+class InferenceRouter:
+    """
+    Sends chat completions to the registered backends, with the interface of a single client.
+
+    Remote backends are ranked by the moving average of their recent latencies, those
+    failing repeatedly are put last for a cooldown, and local ones come after every remote
+    one. A call goes to the first backend, and when that has not answered within its
+    hedge budget, the `AI_HEDGE_PERCENTILE` of its recent latencies, the same call is sent
+    to the next one: the first to answer wins and the other is cancelled, which closes
+    its connection and stops the generation. A failed call moves on to the next backend.
+    Streams are timed and hedged on their first chunk.
+    """
+
+    def __init__(self, backends: Sequence[InferenceBackend] = (), hedge: bool = AI_HEDGE_ENABLED,
+                 max_hedges: int = AI_MAX_HEDGES):
+        self.backends: List[InferenceBackend] = []
+        self.hedge = hedge
+        self.max_hedges = max_hedges
+        self.hedges = 0
+        for backend in backends:
+            self.register(backend)
+
+    def register(self, backend: InferenceBackend) -> None:
+        self.backends.append(backend)
+
+    def candidates(self, kind: str) -> List[InferenceBackend]:
+        """
+        Backends in the order a call tries them. A backend without samples ranks first, so each is measured.
+        """
+        now = time.monotonic()
+        remote = [backend for backend in self.backends if not backend.local]
+        ready = sorted((backend for backend in remote if backend.available(now)),
+                       key=lambda backend: backend.timings[kind].ewma or 0.0)
+        cooling = [backend for backend in remote if not backend.available(now)]
+        return ready + cooling + [backend for backend in self.backends if backend.local]
+
+    def budget(self, backend: InferenceBackend, kind: str) -> float:
+        timings = backend.timings[kind]
+        if len(timings.latencies) < AI_HEDGE_MIN_SAMPLES:
+            return AI_HEDGE_DEFAULT_SECONDS
+        return timings.percentile(AI_HEDGE_PERCENTILE)
+
+    async def _attempt(self, backend: InferenceBackend, kind: str, messages: List[Dict[str, str]],
+                       stream: bool, options: Dict[str, Any]):
+        started = time.perf_counter()
+        status = "ok"
+        response = None
+        backend.timings[kind].calls += 1
+        try:
+            response = await backend.chat_completion(messages, stream=stream, **dict(options))
+            if not stream:
+                return response
+            try:
+                first = await response.__anext__()
+            except StopAsyncIteration:
+                return _empty()
+            return _chain(first, response)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            backend.timings[kind].cancelled += 1
+            if response is not None and hasattr(response, "aclose"):
+                await response.aclose()
+            raise
+        except Exception:
+            status = "error"
+            backend.failed(kind)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if status == "ok":
+                backend.succeeded(kind, elapsed)
+            elif status == "cancelled":
+                backend.timings[kind].record(elapsed, complete=False)
+            ai_backend_calls.observe(elapsed, backend.name, kind, status)
+
+    async def chat_completion(self, messages: List[Dict[str, str]], stream: bool = False, **options):
+        """
+        Returns the completion, or for `stream=True` an async iterator of its chunks, from the first backend
+        to answer. Raises the last backend's error when all of them failed.
+        """
+        kind = "stream" if stream else "complete"
+        queue = self.candidates(kind)
+        if not queue:
+            raise RuntimeError("No inference backend is registered.")
+        first = queue[0]
+        pending: Dict[asyncio.Task, InferenceBackend] = {}
+        hedges = 0
+        error: Optional[Exception] = None
+
+        def launch() -> InferenceBackend:
+            backend = queue.pop(0)
+            pending[asyncio.create_task(self._attempt(backend, kind, messages, stream, options))] = backend
+            return backend
+
+        current, launched_at = launch(), time.monotonic()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and hedges < self.max_hedges and queue and not queue[0].local:
+                    timeout = max(0.0, launched_at + self.budget(current, kind) - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    self.hedges += 1
+                    logger.info(f"Inference backend {current.name} exceeded its {self.budget(current, kind):.2f}s "
+                                f"budget, hedging on {queue[0].name}.")
+                    current, launched_at = launch(), time.monotonic()
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        logger.error(f"Error from inference backend {backend.name}: {error}")
+                        continue
+                    result = task.result()
+                    if backend is not first:
+                        backend.hedge_wins += 1
+                    for other in done - {task}:
+                        if not other.exception() and hasattr(other.result(), "aclose"):
+                            await other.result().aclose()
+                    return result
+                if not pending and queue:
+                    current, launched_at = launch(), time.monotonic()
+        finally:
+            # The losers, and every attempt when the caller is cancelled
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise error
+
+    async def feature_extraction(self, text: str, model: Optional[str] = None):
+        """
+        Embeddings come from the first remote backend, they are not routed.
+        """
+        backend = next((backend for backend in self.backends if isinstance(backend, HuggingFaceBackend)), None)
+        if backend is None:
+            raise RuntimeError("Embeddings need a remote inference backend, none is configured in AI_BACKENDS.")
+        return await backend.client.feature_extraction(text, model=model)
+
+    async def close(self) -> None:
+        for backend in self.backends:
+            await backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hedges": self.hedges, "backends": [backend.stats() for backend in self.backends]}
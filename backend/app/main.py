@@ -1,18 +1,58 @@
+import logging
 import os
 
-import textwrap
+import asyncio
+import json
+import secrets
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query, Depends, APIRouter
+from fastapi import FastAPI, HTTPException, Path, Query, Depends, APIRouter, BackgroundTasks, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.clients import strava_client
-from app.ai_client import client
-from app.auth import get_current_user
-from app.firebase_setup import db as firestore_db
+from app.ai_client import ai_backend_stats, client, close_ai_client
+from app.ai_models import get_model_settings
+from app.auth import get_current_user, token_cache
+from app.compression import CompressionMiddleware
+from app.firebase_setup import db as firestore_db, initialize_firebase
+from app.models.activity import Activity
+from app.models.saved_workout import SavedWorkout
+from app.models.user_context import UserContext
 from app.models.user_profile import UserProfile
 from app.models.workout_request import WorkoutRequest
 from app.models.workout_to_save import WorkoutToSave
+from app.models.workouts_to_save import WorkoutsToSave
+from app.prompts import build_workout_messages, get_token_counter
+from app.responses import FastJSONResponse
+from app.telemetry import (Gauge, PROMETHEUS_CONTENT_TYPE, TelemetryMiddleware, ai_time_to_first_token, ai_tokens,
+                           configure_logging, registry, render_metrics, span)
+from app.user_context import get_user_context, load_user_context, user_context_cache
+from services.activity_cache import ActivityCache, STRAVA_CACHE_FIRESTORE, athlete_cache_key
+from services.activity_store import ActivityStore
+from services.activity_streams import ActivityStreamService, StreamStore
+from services.activity_summary import format_activity_context
+from services.analytics import format_analytics_context
+from services.analytics_service import AnalyticsService
+from services.dashboard import DashboardService
+from services.activity_sync import ActivitySyncService
 from services.strava_service import StravaService
+from services.strava_token_manager import StravaTokenManager
+from services.strava_webhook import StravaWebhookProcessor
+from services.job_queue import JobQueue, JobQueueFull
+from services.ready_suggestions import ReadySuggestionStore
+from services.data_transfer import InvalidImportLine, NDJSON_MEDIA_TYPE, export_user_data, import_user_data
+from services.workout_plans import (WORKOUT_PLAN_RESPONSE_FORMAT, InvalidSuggestion, is_valid_suggestion,
+                                    suggestion_response, workout_document)
+from services.workout_store import InvalidCursor, WorkoutStore, WORKOUT_FIELDS
+from services.suggestion_cache import (SuggestionCache, SUGGESTION_CACHE_SEMANTIC,
+                                       SUGGESTION_CACHE_EMBEDDING_MODEL, activity_fingerprint)
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -20,12 +60,39 @@ load_dotenv()
 STRAVA_CLIENT_ID = os.getenv("STRAVA_CLIENT_ID")
 STRAVA_CLIENT_SECRET = os.getenv("STRAVA_CLIENT_SECRET")
 STRAVA_REDIRECT_URI = os.getenv("STRAVA_REDIRECT_URI")
+NBR_OF_ACTIVITIES = 30
+STRAVA_WEBHOOK_VERIFY_TOKEN = os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN")
+STRAVA_WEBHOOK_SUBSCRIPTION_ID = os.getenv("STRAVA_WEBHOOK_SUBSCRIPTION_ID")
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>", and is not served without one
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # Token verification needs the Firebase app, the Firestore client is created on first use
+    initialize_firebase()
+    webhook_processor.start()
+    job_queue.start()
+    # Loading the tokenizer can download it from the Hub, do it in the background rather than on a first request
+    tokenizer_loader = asyncio.create_task(
+        run_in_threadpool(get_token_counter, model_settings.tokenizer_id or model_settings.model_id))
+    yield
+    tokenizer_loader.cancel()
+    await job_queue.stop()
+    await webhook_processor.stop()
+    # Release the pooled upstream connections on shutdown
+    await strava_client.close_http_client()
+    await close_ai_client()
+
 
 api_router = APIRouter(prefix="/api/v1")
 app = FastAPI(
     title="VersionsUp - AI Workout Trainer API",
     description="API for fetching sport activity data and providing AI-powered workout suggestions.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # --- CORS Middleware ---
@@ -43,16 +110,188 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match", "X-Request-ID"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Request-ID"],
 
 )
+app.add_middleware(CompressionMiddleware)
+# Added last so it is outermost and times the whole request
+app.add_middleware(TelemetryMiddleware)
+
+activity_cache = ActivityCache(
+    firestore_db=firestore_db if STRAVA_CACHE_FIRESTORE else None)
+strava_client.configure_shared_quota(firestore_db)
+activity_store = ActivityStore(firestore_db)
+activity_store.add_listener(activity_cache.on_activities)
+activity_store.add_delete_listener(activity_cache.on_activities_deleted)
+strava_token_manager = StravaTokenManager(firestore_db)
+stream_store = StreamStore()
+stream_service = ActivityStreamService(stream_store)
+analytics_service = AnalyticsService(activity_store, firestore_db, stream_store)
+activity_store.add_listener(analytics_service.on_activities)
+activity_store.add_delete_listener(analytics_service.on_activities_deleted)
+activity_store.add_sync_listener(analytics_service.on_sync_state)
+workout_store = WorkoutStore(firestore_db)
+dashboard_service = DashboardService(firestore_db, activity_store, workout_store, analytics_service)
+activity_store.add_listener(dashboard_service.on_activities)
+activity_store.add_delete_listener(dashboard_service.on_activities_deleted)
+analytics_service.add_listener(dashboard_service.on_analytics)
+activity_sync = ActivitySyncService(activity_store)
+ready_suggestions = ReadySuggestionStore(firestore_db)
+activity_store.add_listener(ready_suggestions.on_activities)
+activity_store.add_delete_listener(ready_suggestions.on_activities_deleted)
+
+
+async def on_strava_deauthorized(user_uid: str) -> None:
+    user_context_cache.invalidate(user_uid)
+    dashboard_service.invalidate(user_uid)
+
+
+webhook_processor = StravaWebhookProcessor(activity_store, token_manager=strava_token_manager,
+                                           on_deauthorized=on_strava_deauthorized)
+
+
+async def embed_request_text(text: str):
+    with span("ai", "feature_extraction"):
+        return await client.feature_extraction(text, model=SUGGESTION_CACHE_EMBEDDING_MODEL)
+
+
+suggestion_cache = SuggestionCache(embed=embed_request_text if SUGGESTION_CACHE_SEMANTIC else None)
+job_queue = JobQueue()
+
+model_settings = get_model_settings()
+
+
+# --- Metrics read at scrape time from the counters the services already keep ---
+def cache_lookups():
+    yield ("activities", "hit"), activity_cache.hits
+    yield ("activities", "miss"), activity_cache.misses
+    yield ("suggestions", "hit"), suggestion_cache.hits
+    yield ("suggestions", "semantic_hit"), suggestion_cache.semantic_hits
+    yield ("suggestions", "miss"), suggestion_cache.misses
+    yield ("auth_tokens", "hit"), token_cache.hits
+    yield ("auth_tokens", "miss"), token_cache.misses
+
+
+def cache_hit_ratios():
+    for cache, hits, lookups in (
+            ("activities", activity_cache.hits, activity_cache.hits + activity_cache.misses),
+            ("suggestions", suggestion_cache.hits + suggestion_cache.semantic_hits,
+             suggestion_cache.hits + suggestion_cache.semantic_hits + suggestion_cache.misses),
+            ("auth_tokens", token_cache.hits, token_cache.hits + token_cache.misses)):
+        yield (cache,), hits / lookups if lookups else 0.0
+
+
+def strava_quota():
+    stats = strava_client.rate_limiter.stats()
+    yield ("short", "usage"), stats["short_usage"]
+    yield ("short", "limit"), stats["short_limit"]
+    yield ("daily", "usage"), stats["daily_usage"]
+    yield ("daily", "limit"), stats["daily_limit"]
+
+
+def ai_jobs():
+    metrics = job_queue.metrics()
+    for state in ("queue_depth", "in_flight"):
+        yield (state,), metrics[state]
+
+
+def ai_job_outcomes():
+    metrics = job_queue.metrics()
+    for outcome in ("submitted", "coalesced", "completed", "failed", "rejected"):
+        yield (outcome,), metrics[outcome]
+
+
+def ai_backend_latency():
+    for backend in ai_backend_stats()["backends"]:
+        for kind in ("complete", "stream"):
+            for quantile in ("p50", "p95"):
+                yield (backend["name"], kind, quantile), backend[kind][quantile]
+
+
+def ai_backend_outcomes():
+    stats = ai_backend_stats()
+    yield ("router", "hedged"), stats["hedges"]
+    for backend in stats["backends"]:
+        yield (backend["name"], "hedge_won"), backend["hedge_wins"]
+
+
+def background_work():
+    yield ("analytics_recompute",), analytics_service.recomputes
+    yield ("analytics_update",), analytics_service.updates
+    yield ("dashboard_build",), dashboard_service.builds
+    yield ("strava_token_refresh",), strava_token_manager.refreshes
+    yield ("strava_throttled",), strava_client.rate_limiter.throttled
+
+
+registry.register(Gauge("versionup_cache_lookups_total", "Cache lookups by result.",
+                        ("cache", "result"), cache_lookups, kind="counter"))
+registry.register(Gauge("versionup_cache_hit_ratio", "Share of cache lookups served from the cache.",
+                        ("cache",), cache_hit_ratios))
+registry.register(Gauge("versionup_strava_quota", "Strava rate-limit usage and limit as last reported.",
+                        ("window", "kind"), strava_quota))
+registry.register(Gauge("versionup_ai_jobs", "AI jobs waiting and running.", ("state",), ai_jobs))
+registry.register(Gauge("versionup_ai_jobs_total", "AI jobs by outcome.", ("outcome",), ai_job_outcomes,
+                        kind="counter"))
+registry.register(Gauge("versionup_ai_backend_latency_seconds",
+                        "Recent latency percentiles of each inference backend, which routing and hedging use.",
+                        ("backend", "kind", "quantile"), ai_backend_latency))
+registry.register(Gauge("versionup_ai_hedges_total", "Hedged inference calls, and the hedges each backend won.",
+                        ("backend", "outcome"), ai_backend_outcomes, kind="counter"))
+registry.register(Gauge("versionup_background_work_total", "Background computations and Strava throttling.",
+                        ("kind",), background_work, kind="counter"))
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter(model_settings.tokenizer_id or model_settings.model_id).count(text)
+
+
+def completion_token_counts(completion, prompt_tokens: int, suggestion: str):
+    """
+    Prefers the token usage reported by the provider, falls back to our own counts.
+    """
+    usage = getattr(completion, "usage", None)
+    reported_prompt = getattr(usage, "prompt_tokens", None)
+    reported_completion = getattr(usage, "completion_tokens", None)
+    return (reported_prompt if isinstance(reported_prompt, int) else prompt_tokens,
+            reported_completion if isinstance(reported_completion, int) else count_tokens(suggestion))
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 # --- Dependencies ---
-def get_strava_service():
-    return StravaService(firestore_db)
+_strava_service: Optional[StravaService] = None
+_strava_service_lock = threading.Lock()
+
+
+def get_strava_service() -> StravaService:
+    """
+    Returns the shared StravaService, created on first use. Sync endpoints resolve
+    it on the threadpool, so creation is guarded by a lock.
+    """
+    global _strava_service
+    if _strava_service is None:
+        with _strava_service_lock:
+            if _strava_service is None:
+                _strava_service = StravaService(firestore_db, activity_sync, strava_token_manager, stream_service)
+    return _strava_service
 
 
 # --- API Endpoints ---
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Exposes the app's metrics in the Prometheus text format, to scrapers holding METRICS_TOKEN.
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token.")
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @api_router.get("/")
 def read_root():
     return {"message": "VersionsUp API v1"}
@@ -67,35 +306,160 @@ def get_strava_auth_url(strava_services: StravaService = Depends(get_strava_serv
 
 
 @api_router.get("/strava/exchange_token")
-def exchange_token(code: str = Query(...), 
-                   user: dict = Depends(get_current_user), 
-                   strava_service: StravaService = Depends(get_strava_service)):
+async def exchange_token(background_tasks: BackgroundTasks,
+                         code: str = Query(...), 
+                         user: dict = Depends(get_current_user), 
+                         strava_service: StravaService = Depends(get_strava_service)):
     """
     Exchanges the authorization 'code' from Strava for an access token and refresh token.
-    Tokens are stored in Firestore for the authenticated user.
+    Tokens are stored in Firestore for the authenticated user, and the activity history
+    is backfilled in the background.
     """
-    return strava_service.exchange_token(code, user.get("uid"))
+    result = await strava_service.exchange_token(code, user.get("uid"))
+    user_context_cache.invalidate(user.get("uid"))
+    background_tasks.add_task(dashboard_service.refresh, user.get("uid"))
+    background_tasks.add_task(strava_service.backfill_activities, user.get("uid"))
+    return result
 
 @api_router.get("/strava/status", dependencies=[Depends(get_current_user)])
-def get_strava_connection_status(user: dict = Depends(get_current_user),
-                                 strava_service: StravaService = Depends(get_strava_service)):
+async def get_strava_connection_status(user_context: UserContext = Depends(get_user_context),
+                                       strava_service: StravaService = Depends(get_strava_service)):
     """
     Checks if the current user has connected their Strava account.
     """
-    return strava_service.get_strava_connection_status(user.get("uid"))
+    return await strava_service.get_strava_connection_status(user_context)
+
+
+@api_router.get("/strava/activities", dependencies=[Depends(get_current_user)],
+                response_model=List[Activity])
+async def list_activities(background_tasks: BackgroundTasks,
+                          per_page: int = Query(15, ge=1, le=100),
+                          cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+                          user_context: UserContext = Depends(get_user_context),
+                          strava_service: StravaService = Depends(get_strava_service)):
+    """
+    Fetches a page of the user's activities from the synced activity store.
+    New activities are pulled from Strava first; older pages trigger a history backfill.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    activities, next_cursor = await strava_service.get_activities(user_context, per_page=per_page, cursor=cursor)
+    if cursor is not None or next_cursor is None:
+        # No token handed over, the request's may expire before the backfill gets to run
+        background_tasks.add_task(strava_service.backfill_activities, user_context.uid)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(activities, headers=headers)
+
+
+@api_router.get("/strava/webhook")
+def validate_strava_webhook(mode: str = Query(..., alias="hub.mode"),
+                            verify_token: str = Query(..., alias="hub.verify_token"),
+                            challenge: str = Query(..., alias="hub.challenge")):
+    """
+    Answers the Strava push-subscription validation handshake.
+    """
+    if mode != "subscribe" or not STRAVA_WEBHOOK_VERIFY_TOKEN or verify_token != STRAVA_WEBHOOK_VERIFY_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid webhook verification.")
+    return {"hub.challenge": challenge}
+
+
+@api_router.post("/strava/webhook")
+async def receive_strava_webhook(request: Request):
+    """
+    Receives Strava push events. Events are queued and acknowledged immediately,
+    the activity store is updated by the background webhook worker.
+    """
+    try:
+        event = await request.json()
+    except ValueError:
+        event = None
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Invalid webhook event.")
+    if STRAVA_WEBHOOK_SUBSCRIPTION_ID and str(event.get("subscription_id")) != STRAVA_WEBHOOK_SUBSCRIPTION_ID:
+        raise HTTPException(status_code=403, detail="Unknown webhook subscription.")
+    webhook_processor.enqueue(event)
+    return {}
+
+
+@api_router.get("/strava/cache_stats", dependencies=[Depends(get_current_user)])
+def get_strava_cache_stats():
+    """
+    Returns hit and miss counters of the Strava activity cache.
+    """
+    return activity_cache.stats()
+
+
+@api_router.get("/analytics", dependencies=[Depends(get_current_user)])
+async def get_analytics(user: dict = Depends(get_current_user)):
+    """
+    Returns training analytics over the user's whole activity history: fitness, fatigue
+    and form, heart rate and pace zones, weekly and monthly volume, and personal bests.
+    """
+    try:
+        return await analytics_service.get_report(user.get("uid"))
+    except Exception as e:
+        logger.error(f"Error computing analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute analytics.")
+
+
+async def sync_dashboard_activities(strava_service: StravaService, user_uid: str) -> None:
+    # Recorded first, so views arriving while the sync runs do not start another
+    await dashboard_service.mark_synced(user_uid)
+    await strava_service.sync_activities(user_uid)
+
+
+@api_router.get("/dashboard", dependencies=[Depends(get_current_user)])
+async def get_dashboard(background_tasks: BackgroundTasks, if_none_match: Optional[str] = Header(None),
+                        user: dict = Depends(get_current_user),
+                        strava_service: StravaService = Depends(get_strava_service)):
+    """
+    Returns the user's materialized dashboard: recent activities, key training metrics,
+    the latest workout and the Strava connection status, read as one document.
+    Sends an ETag and answers a matching If-None-Match with 304 Not Modified.
+    For a connected user, new activities are synced in the background at most every
+    DASHBOARD_SYNC_SECONDS, and the rebuilt dashboard is served on the next request.
+    """
+    try:
+        dashboard = await dashboard_service.get(user.get("uid"))
+    except Exception as e:
+        logger.error(f"Error loading dashboard: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load dashboard.")
+
+    if dashboard_service.needs_sync(dashboard):
+        background_tasks.add_task(sync_dashboard_activities, strava_service, user.get("uid"))
+
+    etag = f'"{dashboard["version"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(dashboard, headers=headers)
+
+
+@api_router.get("/strava/rate_limit", dependencies=[Depends(get_current_user)])
+def get_strava_rate_limit():
+    """
+    Returns the Strava quota usage last reported by Strava and how often calls were throttled.
+    """
+    return strava_client.rate_limiter.stats()
+
+
+@api_router.get("/ai/backends", dependencies=[Depends(get_current_user)])
+def get_ai_backends():
+    """
+    Returns each inference backend's call outcomes and recent latencies, and how many calls were hedged.
+    """
+    return ai_backend_stats()
 
 
-@api_router.get("/strava/activities", dependencies=[Depends(get_current_user)])
-def list_activities(user: dict = Depends(get_current_user),
-                    strava_service: StravaService = Depends(get_strava_service,)):
+@api_router.get("/ai/cache_stats", dependencies=[Depends(get_current_user)])
+def get_suggestion_cache_stats():
     """
-    Fetches the last 5 activities.
+    Returns hit and miss counters of the workout suggestion cache and of the pre-generated suggestions.
     """
-    # TODO: add customizable per_page & pagination
-    return strava_service.get_activities(user.get("uid"))
+    return {**suggestion_cache.stats(), "ready": ready_suggestions.stats()}
 
 @api_router.put("/user/profile", dependencies=[Depends(get_current_user)])
-def update_user_profile(profile: UserProfile, user: dict = Depends(get_current_user)):
+def update_user_profile(profile: UserProfile, background_tasks: BackgroundTasks,
+                        user: dict = Depends(get_current_user)):
     """
     Updates the user's profile information.
     """
@@ -105,243 +469,455 @@ def update_user_profile(profile: UserProfile, user: dict = Depends(get_current_u
         profile_data = profile.dict(exclude_unset=True)
         if not profile_data:
             raise HTTPException(status_code=400, detail="No profile data provided.")
-        user_doc_ref.set({'profile': profile_data}, merge=True)
+        with span("firestore", "users.set"):
+            user_doc_ref.set({'profile': profile_data}, merge=True)
+        user_context_cache.invalidate(user_uid)
+        background_tasks.add_task(dashboard_service.refresh, user_uid)
         return {"message": "Profile updated successfully."}
     except Exception as e:
-        print(f"Error updating profile: {e}")
+        logger.error(f"Error updating profile: {e}")
         raise HTTPException(status_code=500, detail="Failed to update profile.")
 
 
 @api_router.get("/user/profile", dependencies=[Depends(get_current_user)])
-def get_user_profile(user: dict = Depends(get_current_user)):
+async def get_user_profile(user: dict = Depends(get_current_user)):
     """
     Retrieves the user's profile information.
     """
-    user_uid = user.get("uid")
     try:
-        user_doc_ref = firestore_db.collection('users').document(user_uid)
-        user_doc = user_doc_ref.get()
-        if user_doc.exists and 'profile' in user_doc.to_dict():
-            return user_doc.to_dict().get('profile')
-        return {}
+        user_context = await load_user_context(user.get("uid"))
+        return user_context.profile or {}
     except Exception as e:
-        print(f"Error fetching profile: {e}")
+        logger.error(f"Error fetching profile: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch profile.")
 
 
-@api_router.post("/ai/suggest_workout")
-def suggest_workout(request: WorkoutRequest, user: dict = Depends(get_current_user)):
+async def load_suggestion_metrics(user_uid: str) -> str:
     """
-    Generates a workout suggestion based on user's goals and recent activities.
+    Returns the user's training metrics as prompt text, never waiting on a first full computation.
+    """
+    try:
+        report = await analytics_service.get_report(user_uid, compute_missing=False)
+        return format_analytics_context(report)
+    except Exception as e:
+        logger.error(f"Error loading training metrics for AI suggestion: {e}")
+        return format_analytics_context(None)
+
+
+async def load_suggestion_context(user_context: UserContext):
+    """
+    Returns the user's Strava connection status, recent activities and training metrics for a suggestion.
     """
-    user_uid = user.get("uid")
     activities = []
     is_strava_connected = False
+    metrics_str = format_analytics_context(None)
+
+    if user_context.access_token:
+        is_strava_connected = True
 
-    user_doc = firestore_db.collection('users').document(user_uid).get()
-    if user_doc.exists and 'strava_tokens' in user_doc.to_dict():
-        access_token = user_doc.to_dict()['strava_tokens'].get('access_token')
-        if access_token:
-            is_strava_connected = True
+        async def load_activities():
             try:
-                activities = strava_client.get_activities(
-                    access_token=access_token, per_page=NBR_OF_ACTIVITIES)
+                strava_tokens = user_context.strava_tokens.model_dump()
+                access_token = await strava_token_manager.get_access_token(user_context.uid, strava_tokens)
+                return await activity_cache.get_activities(
+                    athlete_cache_key(user_context.uid, strava_tokens),
+                    access_token=access_token, per_page=NBR_OF_ACTIVITIES, user_uid=user_context.uid)
             except Exception as e:
-                print(f"Error fetching activities for AI suggestion: {e}")
-                activities = []
-
-    activities_str = '\n'.join(
-        map(str, activities)) if activities else "No recent activities found."
-
-    prompt = textwrap.dedent(f"""
-        You are VersionsUp, an expert AI Workout Coach.
-        You specialize in designing personalized, professional workout plans that are structured, motivating, and easy to follow.
-        Your goal is to help the user improve fitness, strength, endurance, and mental stability while maintaining safety and balance.
-        You always analyse past activities and use them to provide adapted plans to the user so that there can be a progression and they can reach their objectives.
-
-        🏋️ Tone & Style
-        Professional, supportive, and motivational — like a world-class personal trainer. Use clear sections, bullet points, and short explanations for readability.
-        Occasionally use encouraging language (e.g., “Great work!”, “You’ve got this!”). Write in natural, human-like English (avoid robotic or overly formal phrasing).
-
-        📋 Response Structure
-
-        Always structure your output like this:
-
-        1. Summary
-
-        Briefly explain the goal of the plan (e.g., “This workout focuses on full-body conditioning and fat burning.”).
-
-        2. Workout Plan
-
-        Organize clearly by days or categories (e.g., Day 1 – Upper Body, Day 2 – Cardio + Core, etc.).
-
-        For each exercise, include:
+                logger.error(f"Error fetching activities for AI suggestion: {e}")
+                return []
 
-        🏷 Exercise Name
+        activities, metrics_str = await asyncio.gather(
+            load_activities(), load_suggestion_metrics(user_context.uid))
 
-        🔁 Sets x Reps / Duration
+    return is_strava_connected, activities, metrics_str
 
-        💪 Muscles Worked
 
-        🎯 Purpose or Benefit (1–2 sentences explaining why it’s included)
-
-        Example format:
-
-        **Day 1 – Upper Body Strength**
-        1. Push-Ups – 3x12
-           💪 Chest, Shoulders, Triceps
-           🎯 Builds upper body strength and core stability.
-        2. Dumbbell Rows – 3x10 each side
-           💪 Back, Biceps
-           🎯 Improves posture and upper-back strength.
-
-        3. Warm-Up & Cool-Down
-
-        Always include a short warm-up and cool-down section with explanations (e.g., “Helps prevent injury and improve mobility”).
-
-        4. Tips or Guidance
-
-        Add a few personalized recommendations, such as:
-
-        Rest and recovery suggestions
+async def run_completion(request: WorkoutRequest, is_strava_connected: bool, activities_str: str,
+                         metrics_str: str, structured: bool) -> Tuple[str, int, int, Optional[str]]:
+    """
+    One model call for a workout suggestion.
+    Returns its output, the prompt and completion token counts and the finish reason.
+    """
+    # Counting tokens may first load the tokenizer, keep it off the event loop
+    messages, prompt_tokens = await run_in_threadpool(
+        build_workout_messages, request, is_strava_connected, activities_str, model_settings, metrics_str,
+        structured=structured)
+
+    # The plan is constrained to its schema by the model server, it is validated once on receipt
+    options = ({"response_format": WORKOUT_PLAN_RESPONSE_FORMAT, "max_tokens": model_settings.max_plan_tokens}
+               if structured else {"max_tokens": model_settings.max_output_tokens})
+    with span("ai", "chat_completion"):
+        completion = await client.chat_completion(
+            messages=messages,
+            **options,
+        )
+    choice = completion.choices[0]
+    content = choice.message.content or ""
+    prompt_tokens, completion_tokens = completion_token_counts(completion, prompt_tokens, content)
+    ai_tokens.inc("prompt", amount=prompt_tokens)
+    ai_tokens.inc("completion", amount=completion_tokens)
+    logger.info(f"Workout suggestion generated: prompt_tokens={prompt_tokens} completion_tokens={completion_tokens}")
+    return content, prompt_tokens, completion_tokens, getattr(choice, "finish_reason", None)
 
-        Breathing techniques
 
-        Nutrition or hydration reminders
+async def complete_suggestion(request: WorkoutRequest, is_strava_connected: bool,
+                              activities: list, metrics_str: str) -> Tuple[str, int, int]:
+    """
+    Runs the model for a workout suggestion.
+    Returns its output and the prompt and completion token counts. A structured plan
+    that does not validate, such as one cut off by the token limit, is asked for once
+    more as text. Raises InvalidSuggestion when the output still does not validate.
+    """
+    # Summarizing is pandas work, keep it off the event loop
+    activities_str = await run_in_threadpool(format_activity_context, activities)
+    structured = model_settings.structured_output
+    content, prompt_tokens, completion_tokens, finish_reason = await run_completion(
+        request, is_strava_connected, activities_str, metrics_str, structured)
+    if structured and not is_valid_suggestion(content, structured):
+        logger.warning("Structured workout plan did not validate, retrying as text.")
+        structured = False
+        content, retry_prompt_tokens, retry_completion_tokens, finish_reason = await run_completion(
+            request, is_strava_connected, activities_str, metrics_str, structured)
+        prompt_tokens += retry_prompt_tokens
+        completion_tokens += retry_completion_tokens
+    if not is_valid_suggestion(content, structured, finish_reason):
+        raise InvalidSuggestion(content, prompt_tokens, completion_tokens)
+    return content, prompt_tokens, completion_tokens
+
+
+async def generate_suggestion(request: WorkoutRequest, is_strava_connected: bool,
+                              activities: list, metrics_str: str, fingerprint: str) -> dict:
+    """
+    Runs the model for a workout suggestion and caches the result. Output that does not
+    validate is still answered when there is any, but not cached.
+    """
+    try:
+        content, prompt_tokens, completion_tokens = await complete_suggestion(
+            request, is_strava_connected, activities, metrics_str)
+    except InvalidSuggestion as e:
+        if not e.content.strip():
+            raise
+        logger.warning("Workout suggestion did not validate, answering it uncached.")
+        content, prompt_tokens, completion_tokens = e.content, e.prompt_tokens, e.completion_tokens
+    else:
+        await suggestion_cache.put(request, fingerprint, content)
+    return {**suggestion_response(content), "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
 
-        Motivation or mindset tips
 
-        ⚙️ Capabilities
+@api_router.post("/ai/suggest_workout")
+async def suggest_workout(request: WorkoutRequest, response: Response, background_tasks: BackgroundTasks,
+                          queue: bool = Query(False, description="Run the generation on the AI job queue"),
+                          wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a queued job"),
+                          user_context: UserContext = Depends(get_user_context)):
+    """
+    Generates a workout suggestion based on user's goals and recent activities.
+    With structured output the response has the `plan` (days, exercises, sets and reps,
+    muscles and purpose) besides its text in `suggestion`.
+    Token counts are reported in the X-Prompt-Tokens and X-Completion-Tokens headers.
 
-        You can:
+    With `queue=true` the generation runs on the AI job queue, where identical in-flight
+    requests are merged. The result is returned if it is ready within `wait` seconds,
+    otherwise a 202 with a job id to poll at /ai/jobs/{job_id}.
 
-        Adapt intensity and volume to the user’s level (Beginner / Intermediate / Advanced) as well as previous performance during activity history
+    A suggestion pre-generated overnight for the same request is returned at once while
+    it is fresh, with X-Suggestion-Source: ready.
+    """
+    user_uid = user_context.uid
+    background_tasks.add_task(ready_suggestions.record_request, user_uid, request,
+                              user_context.last_workout_request)
+    ready = await ready_suggestions.get(user_uid, request)
+    if ready is not None:
+        response.headers["X-Suggestion-Source"] = "ready"
+        return suggestion_response(ready)
+
+    is_strava_connected, activities, metrics_str = await load_suggestion_context(user_context)
+    fingerprint = activity_fingerprint(activities, is_strava_connected, metrics_str)
+    cached = await suggestion_cache.get(request, fingerprint)
+    if cached is not None:
+        return suggestion_response(cached)
+
+    if queue:
+        try:
+            job = job_queue.submit(
+                SuggestionCache.key_for(request, fingerprint), user_uid,
+                lambda: generate_suggestion(request, is_strava_connected, activities, metrics_str, fingerprint))
+        except JobQueueFull:
+            raise HTTPException(
+                status_code=503, detail="Too many pending workout suggestions, please retry shortly.")
+        if wait and await job_queue.wait(job, wait) and job.status == "done":
+            return {key: job.result[key] for key in ("suggestion", "plan") if key in job.result}
+        response.status_code = 202
+        return {"job_id": job.id, "status": job.status}
 
-        Adjust based on available equipment (e.g., “bodyweight only”, “dumbbells”, “gym”)
+    try:
+        result = await generate_suggestion(request, is_strava_connected, activities, metrics_str, fingerprint)
+        response.headers["X-Prompt-Tokens"] = str(result["prompt_tokens"])
+        response.headers["X-Completion-Tokens"] = str(result["completion_tokens"])
+        return {key: result[key] for key in ("suggestion", "plan") if key in result}
+    except Exception as e:
+        logger.error(f"Error calling AI service: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to generate workout suggestion.")
 
-        Focus on specific goals (e.g., fat loss, muscle gain, endurance, balance, mobility)
 
-        Offer weekly plans, progressive overload, or challenge-style programs
+@api_router.get("/ai/jobs/metrics", dependencies=[Depends(get_current_user)])
+def get_ai_job_metrics():
+    """
+    Returns queue depth, wait times and counters of the AI job queue.
+    """
+    return job_queue.metrics()
 
-        ❌ Avoid
 
-        Overly technical fitness jargon
+@api_router.get("/ai/jobs/{job_id}")
+def get_ai_job(job_id: str, user: dict = Depends(get_current_user)):
+    """
+    Returns the status, and once done the result, of a queued workout suggestion.
+    """
+    job = job_queue.get(job_id)
+    if job is None or user.get("uid") not in job.owners:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
 
-        Unclear, unstructured answers
 
-        Suggesting unsafe or unrealistic exercises
+@api_router.post("/ai/suggest_workout/stream")
+async def suggest_workout_stream(request: WorkoutRequest, http_request: Request, background_tasks: BackgroundTasks,
+                                 user_context: UserContext = Depends(get_user_context)):
+    """
+    Streams a workout suggestion as Server-Sent Events while the model generates it.
+    Emits `token` events with each content delta, then a `done` event with timings.
+    The stream is always text, a cached or pre-generated plan is sent rendered.
+    """
+    background_tasks.add_task(ready_suggestions.record_request, user_context.uid, request,
+                              user_context.last_workout_request)
+    cached = await ready_suggestions.get(user_context.uid, request)
+    if cached is None:
+        is_strava_connected, activities, metrics_str = await load_suggestion_context(user_context)
+        fingerprint = activity_fingerprint(activities, is_strava_connected, metrics_str)
+        cached = await suggestion_cache.get(request, fingerprint)
+    if cached is None:
+        # Summarizing is pandas work and counting tokens may first load the tokenizer, keep both off the event loop
+        activities_str = await run_in_threadpool(format_activity_context, activities)
+        messages, prompt_tokens = await run_in_threadpool(
+            build_workout_messages, request, is_strava_connected, activities_str, model_settings, metrics_str)
+
+    async def event_stream():
+        started = time.perf_counter()
+        first_token_at = None
+        stream = None
+        parts = []
+        finish_reason = None
+        if cached is not None:
+            yield sse_event("token", {"content": suggestion_response(cached)["suggestion"]})
+            yield sse_event("done", {"ttft_ms": (time.perf_counter() - started) * 1000,
+                                     "total_ms": (time.perf_counter() - started) * 1000, "cached": True})
+            return
+        try:
+            with span("ai", "chat_completion_stream") as ai_span:
+                stream = await client.chat_completion(
+                    messages=messages,
+                    max_tokens=model_settings.max_output_tokens,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if await http_request.is_disconnected():
+                        logger.info("Client disconnected, cancelling workout suggestion stream.")
+                        ai_span.status = "disconnected"
+                        return
+                    if chunk.choices and getattr(chunk.choices[0], "finish_reason", None):
+                        finish_reason = chunk.choices[0].finish_reason
+                    content = chunk.choices[0].delta.content if chunk.choices else None
+                    if not content:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        ai_time_to_first_token.observe(first_token_at - started)
+                    parts.append(content)
+                    yield sse_event("token", {"content": content})
+
+            suggestion = "".join(parts)
+            # Text cut off by the token limit is sent, but not served to the next request
+            if is_valid_suggestion(suggestion, False, finish_reason):
+                await suggestion_cache.put(request, fingerprint, suggestion)
+
+            total_ms = (time.perf_counter() - started) * 1000
+            ttft_ms = (first_token_at - started) * 1000 if first_token_at else None
+            completion_tokens = count_tokens(suggestion)
+            ai_tokens.inc("prompt", amount=prompt_tokens)
+            ai_tokens.inc("completion", amount=completion_tokens)
+            logger.info(f"Workout suggestion streamed: ttft_ms={ttft_ms} total_ms={total_ms:.0f} "
+                        f"prompt_tokens={prompt_tokens} completion_tokens={completion_tokens}")
+            yield sse_event("done", {"ttft_ms": ttft_ms, "total_ms": total_ms,
+                                     "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        except Exception as e:
+            logger.error(f"Error streaming from AI service: {e}")
+            yield sse_event("error", {"detail": "Failed to generate workout suggestion."})
+        finally:
+            # Closing the upstream stream drops the connection, which stops generation
+            if stream is not None and hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-        Generic plans with no explanation
 
-        ✅ Example Output (Excerpt)
 
-        Goal: Full-body conditioning and fat loss.
+@api_router.post("/save_workout", dependencies=[Depends(get_current_user)])
+def save_workout(workout: WorkoutToSave, background_tasks: BackgroundTasks,
+                 user: dict = Depends(get_current_user)):
+    """
+    Saves a workout suggestion for the current user. A plan is stored in its compact
+    form, its text is rendered from it on read.
+    """
+    user_uid = user.get("uid")
+    
+    if not user_uid:
+        raise HTTPException(status_code=403, detail="User not authenticated.")
 
-        Day 1 – Strength & Core
+    try:
+        workout_ref = firestore_db.collection(
+            'users').document(user_uid).collection('workouts').document()
+        with span("firestore", "workouts.set"):
+            workout_ref.set({
+                **workout_document(workout.suggestion, workout.plan),
+                'created_at': datetime.utcnow()
+            })
+        background_tasks.add_task(dashboard_service.refresh, user_uid)
+        return {"message": "Workout saved successfully.", "workout_id": workout_ref.id}
+    except Exception as e:
+        logger.error(f"Error saving workout: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save workout.")
 
-        Squats – 3x15
-        💪 Legs, Glutes
-        🎯 Builds lower body strength and activates major muscle groups.
 
-        Push-Ups – 3x12
-        💪 Chest, Shoulders, Core
-        🎯 Improves upper body tone and stability.
+@api_router.post("/save_workouts", dependencies=[Depends(get_current_user)])
+async def save_workouts(workouts: WorkoutsToSave, background_tasks: BackgroundTasks,
+                        user: dict = Depends(get_current_user)):
+    """
+    Saves several workouts at once with batched writes.
+    """
+    user_uid = user.get("uid")
 
-        Plank – 3x30s
-        💪 Core, Shoulders
-        🎯 Enhances core endurance and posture control.
+    if not user_uid:
+        raise HTTPException(status_code=403, detail="User not authenticated.")
 
-        Warm-Up: 5 mins dynamic stretching (arm circles, lunges, hip rotations)
-        Cool-Down: Light stretching to relax muscles and improve recovery
-        Tip: Focus on controlled movement and steady breathing. Stay hydrated!
+    try:
+        created_at = datetime.utcnow()
+        workout_ids = await workout_store.save_workouts(
+            user_uid, [{**workout_document(workout.suggestion, workout.plan), 'created_at': created_at}
+                       for workout in workouts.workouts])
+        background_tasks.add_task(dashboard_service.refresh, user_uid)
+        return {"message": "Workouts saved successfully.", "workout_ids": workout_ids}
+    except Exception as e:
+        logger.error(f"Error saving workouts: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save workouts.")
 
-        **User's Goal:** {request.goal}
-        **Time Available:** {request.time} minutes per workout
-        **Available Equipment:** {request.equipment or "Bodyweight only"}
-        **Specific requirements:** {request.requirements or "no specific requirements"}
 
-        **User's Strava Connection Status:** {'Connected' if is_strava_connected else 'Not Connected'}
-        **User's Recent Activities (for context):** {activities_str}
+@api_router.get("/export", dependencies=[Depends(get_current_user)])
+async def export_data(user: dict = Depends(get_current_user)):
+    """
+    Streams the user's workouts and activities as NDJSON, one {"type", "data"} record per line.
+    """
+    return StreamingResponse(
+        export_user_data(workout_store, activity_store, user.get("uid")),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="versionup-export.ndjson"'})
 
-        Based on all this information, please provide a detailed workout suggestion.
-        The suggestion should be structured and easy to follow.
 
-        If the user's Strava is not connected, your primary goal is to provide a great general workout based on their stated goal, but also gently encourage them to connect their Strava account for a more personalized experience in the future. Mention this in the "Tips or Guidance" section.
-    """)
+@api_router.post("/import", dependencies=[Depends(get_current_user)])
+async def import_data(request: Request, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
+    """
+    Imports an NDJSON export from the request body as it streams in.
+    """
+    try:
+        counts = await import_user_data(workout_store, activity_store, user.get("uid"), request.stream())
+        background_tasks.add_task(dashboard_service.refresh, user.get("uid"))
+        return counts
+    except InvalidImportLine as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import record, {e}.")
+    except Exception as e:
+        logger.error(f"Error importing data: {e}")
+        raise HTTPException(status_code=500, detail="Failed to import data.")
+
+
+@api_router.get("/get_workouts", dependencies=[Depends(get_current_user)],
+                response_model=List[SavedWorkout])
+async def get_workouts(limit: int = Query(20, ge=1, le=100),
+                       cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+                       start: Optional[datetime] = Query(None, description="Only workouts saved at or after"),
+                       end: Optional[datetime] = Query(None, description="Only workouts saved before"),
+                       fields: Optional[List[str]] = Query(None, description="Fields to return besides id"),
+                       exercise: Optional[str] = Query(None, description="Only plans including this exercise"),
+                       user: dict = Depends(get_current_user)):
+    """
+    Retrieves a page of the current user's saved workouts, newest first.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    `fields=summary` lists plans without reading their days.
+    """
+    user_uid = user.get("uid")
+    
+    if not user_uid:
+        raise HTTPException(status_code=403, detail="User not authenticated.")
+    if fields and not set(fields) <= set(WORKOUT_FIELDS):
+        raise HTTPException(status_code=400, detail=f"Unknown workout fields, expected {', '.join(WORKOUT_FIELDS)}.")
 
     try:
-        response = client.chat_completion(
-            model="meta-llama/Llama-3.1-8B-Instruct",
-            messages=[
-                {"role": "system",
-                    "content": "You are a helpful and knowledgeable workout coach."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-        )
-        suggestion = response.choices[0].message.content
-        return {"suggestion": suggestion}
+        workouts, next_cursor = await workout_store.list_workouts(
+            user_uid, limit=limit, cursor=cursor, start=start, end=end, fields=fields, exercise=exercise)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
     except Exception as e:
-        print(f"Error calling AI service: {e}")
+        logger.error(f"Error fetching workouts: {e}")
         raise HTTPException(
-            status_code=500, detail="Failed to generate workout suggestion.")
+            status_code=500, detail="Failed to fetch workouts.")
 
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(workouts, headers=headers)
 
 
-@api_router.post("/save_workout", dependencies=[Depends(get_current_user)])
-def save_workout(workout: WorkoutToSave, user: dict = Depends(get_current_user)):
+@api_router.get("/workouts/{workout_id}", dependencies=[Depends(get_current_user)],
+                response_model=SavedWorkout)
+async def get_workout(workout_id: str, user: dict = Depends(get_current_user)):
     """
-    Saves a workout suggestion for the current user.
+    Retrieves one saved workout with its full plan.
     """
     user_uid = user.get("uid")
-    
+
     if not user_uid:
         raise HTTPException(status_code=403, detail="User not authenticated.")
 
     try:
-        workout_ref = firestore_db.collection(
-            'users').document(user_uid).collection('workouts').document()
-        workout_ref.set({
-            'suggestion': workout.suggestion,
-            'created_at': datetime.utcnow()
-        })
-        return {"message": "Workout saved successfully.", "workout_id": workout_ref.id}
+        workout = await workout_store.get_workout(user_uid, workout_id)
     except Exception as e:
-        print(f"Error saving workout: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save workout.")
+        logger.error(f"Error fetching workout: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch workout.")
+    if workout is None:
+        raise HTTPException(status_code=404, detail="Workout not found.")
+    return FastJSONResponse(workout)
 
 
-@api_router.get("/get_workouts", dependencies=[Depends(get_current_user)])
-def get_workouts(user: dict = Depends(get_current_user)):
+@api_router.get("/workouts/{workout_id}/days/{day}", dependencies=[Depends(get_current_user)])
+async def get_workout_day(workout_id: str, day: int = Path(..., ge=1, le=7),
+                          user: dict = Depends(get_current_user)):
     """
-    Retrieves all saved workouts for the current user.
+    Retrieves a single day of a saved plan, without reading the rest of it.
     """
     user_uid = user.get("uid")
-    
+
     if not user_uid:
         raise HTTPException(status_code=403, detail="User not authenticated.")
 
     try:
-        workouts_ref = firestore_db.collection(
-            'users').document(user_uid).collection('workouts').stream()
-        
-        workouts = []
-        for workout in workouts_ref:
-            workout_data = workout.to_dict()
-            workout_data['id'] = workout.id
-            workouts.append(workout_data)
-
-        workouts.sort(key=lambda x: x.get('created_at'), reverse=True)
-
-        return workouts
+        workout_day = await workout_store.get_workout_day(user_uid, workout_id, day)
     except Exception as e:
-        print(f"Error fetching workouts: {e}")
-        raise HTTPException(
-            status_code=500, detail="Failed to fetch workouts.")
+        logger.error(f"Error fetching workout day: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch workout day.")
+    if workout_day is None:
+        raise HTTPException(status_code=404, detail="Workout day not found.")
+    return workout_day
 
 
-@api_router.get("/get_latest_workout", dependencies=[Depends(get_current_user)])
-def get_latest_workout(user: dict = Depends(get_current_user)):
+@api_router.get("/get_latest_workout", dependencies=[Depends(get_current_user)],
+                response_model=List[SavedWorkout])
+async def get_latest_workout(user: dict = Depends(get_current_user)):
     """
     Retrieves the latest saved workout for the current user.
     """
@@ -351,19 +927,9 @@ def get_latest_workout(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="User not authenticated.")
 
     try:
-        workouts_ref = firestore_db.collection(
-            'users').document(user_uid).collection('workouts').order_by(
-                'created_at', direction='DESCENDING').limit(1).stream()
-        
-        workouts = []
-        for workout in workouts_ref:
-            workout_data = workout.to_dict()
-            workout_data['id'] = workout.id
-            workouts.append(workout_data)
-
-        return workouts
+        return FastJSONResponse(await workout_store.get_latest_workout(user_uid))
     except Exception as e:
-        print(f"Error fetching latest workout: {e}")
+        logger.error(f"Error fetching latest workout: {e}")
         raise HTTPException(
             status_code=500, detail="Failed to fetch latest workout.")
         
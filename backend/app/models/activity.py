@@ -0,0 +1,23 @@
+from typing_extensions import Annotated, Required, TypedDict
+
+from pydantic import ConfigDict, Field
+
+class Activity(TypedDict, total=False):
+    """
+    A Strava activity summary as synced. Only the common fields are listed,
+    the others Strava sends are returned as they are.
+    """
+    __pydantic_config__ = ConfigDict(extra="allow")
+
+    id: Required[int]
+    name: str
+    type: str
+    sport_type: str
+    distance: Annotated[float, Field(description="In meters")]
+    moving_time: Annotated[int, Field(description="In seconds")]
+    elapsed_time: Annotated[int, Field(description="In seconds")]
+    total_elevation_gain: float
+    start_date: str
+    start_date_local: str
+    average_heartrate: float
+    max_heartrate: float
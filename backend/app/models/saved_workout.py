@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from typing_extensions import Annotated, Required, TypedDict
+
+from pydantic import Field
+
+class SavedWorkout(TypedDict, total=False):
+    """
+    A saved workout as served, with the fields that were requested.
+    """
+    id: Required[str]
+    created_at: datetime
+    suggestion: str
+    summary: str
+    days: Annotated[List[str], Field(description="Day titles of a plan")]
+    exercises: Annotated[List[str], Field(description="Normalized exercise names of a plan")]
+    plan: Annotated[Dict[str, Any], Field(description="The plan, in the shape of WorkoutPlan")]
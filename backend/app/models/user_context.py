@@ -0,0 +1,37 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Dict, Optional
+
+
+class StravaTokens(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+    expires_at: Optional[int] = None
+    athlete: Dict[str, Any] = Field(default_factory=dict)
+
+
+class UserContext(BaseModel):
+    uid: str
+    exists: bool = False
+    profile: Optional[Dict[str, Any]] = None
+    strava_tokens: Optional[StravaTokens] = None
+    last_workout_request: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_snapshot(cls, uid: str, snapshot) -> "UserContext":
+        """
+        Decodes a users/{uid} document snapshot once.
+        """
+        data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        return cls(uid=uid, exists=snapshot.exists,
+                   profile=data.get('profile'), strava_tokens=data.get('strava_tokens'),
+                   last_workout_request=data.get('last_workout_request'))
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.strava_tokens.access_token if self.strava_tokens else None
+
+    @property
+    def is_strava_connected(self) -> bool:
+        return self.access_token is not None
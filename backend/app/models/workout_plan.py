@@ -0,0 +1,24 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class Exercise(BaseModel):
+    name: str = Field(..., max_length=100, example="Push-Ups")
+    sets: int = Field(..., ge=1, le=20, example=3)
+    reps: str = Field(..., max_length=40, description="Reps per set or a duration", example="12")
+    muscles: List[str] = Field(default_factory=list, max_length=8, example=["Chest", "Shoulders", "Triceps"])
+    purpose: str = Field("", max_length=300, example="Builds upper body strength and core stability.")
+
+
+class WorkoutDay(BaseModel):
+    title: str = Field(..., max_length=120, example="Day 1 – Upper Body Strength")
+    exercises: List[Exercise] = Field(..., min_length=1, max_length=15)
+
+
+class WorkoutPlan(BaseModel):
+    summary: str = Field(..., max_length=500, example="This plan focuses on full-body conditioning and fat loss.")
+    warm_up: str = Field("", max_length=500)
+    days: List[WorkoutDay] = Field(..., min_length=1, max_length=7)
+    cool_down: str = Field("", max_length=500)
+    tips: List[str] = Field(default_factory=list, max_length=8)
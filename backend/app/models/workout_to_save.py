@@ -1,4 +1,15 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, model_validator
+
+from app.models.workout_plan import WorkoutPlan
 
 class WorkoutToSave(BaseModel):
-    suggestion: str
+    suggestion: Optional[str] = None
+    plan: Optional[WorkoutPlan] = None
+
+    @model_validator(mode="after")
+    def check_content(self):
+        if self.suggestion is None and self.plan is None:
+            raise ValueError("A workout needs a suggestion or a plan.")
+        return self
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.models.workout_to_save import WorkoutToSave
+
+class WorkoutsToSave(BaseModel):
+    workouts: List[WorkoutToSave] = Field(..., min_length=1, max_length=5000)
@@ -0,0 +1,278 @@
+import logging
+import math
+import os
+import textwrap
+import threading
+from functools import lru_cache
+from string import Template
+from typing import List, Tuple
+
+from app.ai_models import ModelSettings
+from app.models.workout_request import WorkoutRequest
+
+logger = logging.getLogger(__name__)
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # optional, falls back to a character estimate
+    Tokenizer = None
+
+# Tokenizer repos of gated models, such as the default Llama one, are only downloaded with a Hub token
+TOKENIZER_HF_TOKEN = os.getenv("HF_TOKEN") or os.getenv("AI_API_KEY")
+
+SYSTEM_PROMPT = "You are a helpful and knowledgeable workout coach."
+
+# Tokens reserved for the chat template wrapping each message
+CHAT_TEMPLATE_OVERHEAD = 16
+
+# Compiled once at import, substituted on every request
+WORKOUT_COACH_TEMPLATE = Template(textwrap.dedent("""
+        You are VersionsUp, an expert AI Workout Coach.
+        You specialize in designing personalized, professional workout plans that are structured, motivating, and easy to follow.
+        Your goal is to help the user improve fitness, strength, endurance, and mental stability while maintaining safety and balance.
+        You always analyse past activities and use them to provide adapted plans to the user so that there can be a progression and they can reach their objectives.
+
+        🏋️ Tone & Style
+        Professional, supportive, and motivational — like a world-class personal trainer. Use clear sections, bullet points, and short explanations for readability.
+        Occasionally use encouraging language (e.g., “Great work!”, “You’ve got this!”). Write in natural, human-like English (avoid robotic or overly formal phrasing).
+
+        📋 Response Structure
+
+        Always structure your output like this:
+
+        1. Summary
+
+        Briefly explain the goal of the plan (e.g., “This workout focuses on full-body conditioning and fat burning.”).
+
+        2. Workout Plan
+
+        Organize clearly by days or categories (e.g., Day 1 – Upper Body, Day 2 – Cardio + Core, etc.).
+
+        For each exercise, include:
+
+        🏷 Exercise Name
+
+        🔁 Sets x Reps / Duration
+
+        💪 Muscles Worked
+
+        🎯 Purpose or Benefit (1–2 sentences explaining why it’s included)
+
+        Example format:
+
+        **Day 1 – Upper Body Strength**
+        1. Push-Ups – 3x12
+           💪 Chest, Shoulders, Triceps
+           🎯 Builds upper body strength and core stability.
+        2. Dumbbell Rows – 3x10 each side
+           💪 Back, Biceps
+           🎯 Improves posture and upper-back strength.
+
+        3. Warm-Up & Cool-Down
+
+        Always include a short warm-up and cool-down section with explanations (e.g., “Helps prevent injury and improve mobility”).
+
+        4. Tips or Guidance
+
+        Add a few personalized recommendations, such as:
+
+        Rest and recovery suggestions
+
+        Breathing techniques
+
+        Nutrition or hydration reminders
+
+        Motivation or mindset tips
+
+        ⚙️ Capabilities
+
+        You can:
+
+        Adapt intensity and volume to the user’s level (Beginner / Intermediate / Advanced) as well as previous performance during activity history
+
+        Adjust based on available equipment (e.g., “bodyweight only”, “dumbbells”, “gym”)
+
+        Focus on specific goals (e.g., fat loss, muscle gain, endurance, balance, mobility)
+
+        Offer weekly plans, progressive overload, or challenge-style programs
+
+        ❌ Avoid
+
+        Overly technical fitness jargon
+
+        Unclear, unstructured answers
+
+        Suggesting unsafe or unrealistic exercises
+
+        Generic plans with no explanation
+
+        ✅ Example Output (Excerpt)
+
+        Goal: Full-body conditioning and fat loss.
+
+        Day 1 – Strength & Core
+
+        Squats – 3x15
+        💪 Legs, Glutes
+        🎯 Builds lower body strength and activates major muscle groups.
+
+        Push-Ups – 3x12
+        💪 Chest, Shoulders, Core
+        🎯 Improves upper body tone and stability.
+
+        Plank – 3x30s
+        💪 Core, Shoulders
+        🎯 Enhances core endurance and posture control.
+
+        Warm-Up: 5 mins dynamic stretching (arm circles, lunges, hip rotations)
+        Cool-Down: Light stretching to relax muscles and improve recovery
+        Tip: Focus on controlled movement and steady breathing. Stay hydrated!
+
+        **User's Goal:** $goal
+        **Time Available:** $time minutes per workout
+        **Available Equipment:** $equipment
+        **Specific requirements:** $requirements
+
+        **User's Strava Connection Status:** $strava_status
+        **User's Recent Activities (for context):**
+        $activities
+
+        **User's Training Metrics (whole history):**
+        $metrics
+
+        Based on all this information, please provide a detailed workout suggestion.
+        The suggestion should be structured and easy to follow.
+
+        If the user's Strava is not connected, your primary goal is to provide a great general workout based on their stated goal, but also gently encourage them to connect their Strava account for a more personalized experience in the future. Mention this in the "Tips or Guidance" section.
+    """))
+
+
+# The same coach as a JSON plan; the schema itself is enforced through `response_format`
+WORKOUT_PLAN_TEMPLATE = Template(textwrap.dedent("""
+        You are VersionsUp, an expert AI Workout Coach.
+        You design personalized, professional workout plans that are structured, motivating, and safe.
+        You always analyse past activities and adapt the plan to them so that the user progresses towards their objectives.
+        Adapt intensity and volume to the user's level and previous performance, to the available equipment and to their goal.
+        Avoid technical jargon, unsafe or unrealistic exercises, and generic plans with no explanation.
+
+        Answer with a JSON workout plan only:
+        - summary: one or two sentences on the goal of the plan.
+        - warm_up: a short warm-up and why it helps.
+        - days: one entry per day with a title (e.g. "Day 1 – Upper Body Strength") and its exercises.
+          Each exercise has a name, sets, reps (a count, "10 each side" or a duration like "30s"),
+          the muscles worked, and its purpose in one sentence.
+        - cool_down: a short cool-down and why it helps.
+        - tips: a few personalized tips on recovery, breathing, nutrition or mindset.
+
+        **User's Goal:** $goal
+        **Time Available:** $time minutes per workout
+        **Available Equipment:** $equipment
+        **Specific requirements:** $requirements
+
+        **User's Strava Connection Status:** $strava_status
+        **User's Recent Activities (for context):**
+        $activities
+
+        **User's Training Metrics (whole history):**
+        $metrics
+
+        If the user's Strava is not connected, give a great general plan for their stated goal and add a tip encouraging them to connect it for a more personalized experience.
+    """))
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tokenizer when the `tokenizers` package and the
+    tokenizer files are available, otherwise estimates ~4 characters per token.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+
+
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter(tokenizer_id: str) -> TokenCounter:
+    """
+    Returns the counter of the tokenizer, loaded once. The first call may download the
+    tokenizer from the Hub with HF_TOKEN, or AI_API_KEY, it is made at startup off the
+    event loop, and concurrent first calls wait for that one load. When the tokenizer
+    cannot be loaded, token counts are a 4-characters-per-token estimate.
+    """
+    with _token_counter_lock:
+        return _load_token_counter(tokenizer_id)
+
+
+@lru_cache(maxsize=None)
+def _load_token_counter(tokenizer_id: str) -> TokenCounter:
+    if Tokenizer is not None:
+        try:
+            return TokenCounter(Tokenizer.from_pretrained(tokenizer_id, token=TOKENIZER_HF_TOKEN))
+        except Exception as e:
+            logger.warning(f"Could not load tokenizer {tokenizer_id}, estimating token counts: {e}")
+    return TokenCounter()
+
+
+def fit_activity_context(activities_str: str, budget: int, counter: TokenCounter) -> str:
+    """
+    Trims the activity context to `budget` tokens. Activity lines are newest first,
+    so the oldest ones are dropped first; the closing aggregate lines are kept.
+    """
+    if counter.count(activities_str) <= budget:
+        return activities_str
+
+    lines = activities_str.splitlines()
+    activity_lines, aggregate_lines = lines[:-2], lines[-2:]
+    while activity_lines:
+        activity_lines.pop()
+        candidate = "\n".join(activity_lines + aggregate_lines)
+        if counter.count(candidate) <= budget:
+            return candidate
+    return "Activity history omitted to fit the model context."
+
+
+def build_workout_messages(request: WorkoutRequest, is_strava_connected: bool, activities_str: str,
+                           settings: ModelSettings,
+                           metrics_str: str = "No training metrics available.",
+                           structured: bool = False) -> Tuple[List[dict], int]:
+    """
+    Builds the chat messages for a workout suggestion from the user's goals, summarized
+    activities and training metrics, trimmed to the model's token budget. The metrics are
+    a few lines and are kept whole, only the activity lines are trimmed. `structured`
+    asks for a JSON plan, with the output budget of a plan.
+    Returns the messages and the prompt token count.
+    """
+    template = WORKOUT_PLAN_TEMPLATE if structured else WORKOUT_COACH_TEMPLATE
+    max_tokens = settings.max_plan_tokens if structured else settings.max_output_tokens
+    counter = get_token_counter(settings.tokenizer_id or settings.model_id)
+    fields = {
+        "goal": request.goal,
+        "time": request.time,
+        "equipment": request.equipment or "Bodyweight only",
+        "requirements": request.requirements or "no specific requirements",
+        "strava_status": 'Connected' if is_strava_connected else 'Not Connected',
+        "metrics": metrics_str,
+    }
+
+    base_tokens = (counter.count(template.substitute(fields, activities=""))
+                   + counter.count(SYSTEM_PROMPT) + 2 * CHAT_TEMPLATE_OVERHEAD)
+    budget = settings.context_window - max_tokens - base_tokens
+    activities_str = fit_activity_context(activities_str, max(budget, 0), counter)
+
+    prompt = template.substitute(fields, activities=activities_str)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    prompt_tokens = base_tokens + counter.count(activities_str)
+    return messages, prompt_tokens
@@ -0,0 +1,38 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library encoder
+    orjson = None
+
+
+def _json_default(value):
+    # Firestore timestamps are datetime subclasses, which orjson does not serialize itself
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    The app's default response class, rendered with orjson when it is installed.
+    Compact output, without the spaces the standard encoder puts after separators.
+
+    Routes serving lists of documents the app stored itself return it directly: the
+    data is neither walked by `jsonable_encoder` nor validated against the route's
+    response model, which then only documents the response.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
@@ -0,0 +1,311 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line as Cloud Logging parses it, "text" for local development
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# One log line per request. Off by default, Cloud Run already logs every request's status and
+# latency, and the line costs several times what the metrics do
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "false").lower() in ("1", "true", "yes")
+
+# Prometheus' default buckets, stretched to cover AI generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+# --- Metrics ---
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in values)
+        return lines
+
+
+class Histogram:
+    """
+    Bucketed observations per label set. An observation is one bisect and a locked
+    increment, buckets are only made cumulative when scraped.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Read when scraped, `callback` returns (label values, value) pairs. Used to export
+    counters the caches and queues already keep, with `kind="counter"` for monotonic ones,
+    at no cost on the request path.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Tuple, float]]], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        try:
+            samples = [(labels, value) for labels, value in self.callback() if value is not None]
+        except Exception as e:
+            logger.error(f"Error collecting metric {self.name}: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {float(value)}" for labels, value in samples)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Histogram(
+    "versionup_http_request_duration_seconds", "Request latency by route and status.",
+    ("method", "route", "status")))
+upstream_calls = registry.register(Histogram(
+    "versionup_upstream_duration_seconds", "Latency of calls to Firestore, Strava and the AI service.",
+    ("upstream", "operation", "status")))
+ai_tokens = registry.register(Counter(
+    "versionup_ai_tokens_total", "Tokens sent to and generated by the AI service.", ("kind",)))
+ai_time_to_first_token = registry.register(Histogram(
+    "versionup_ai_time_to_first_token_seconds", "Time until a streamed suggestion's first token."))
+ai_backend_calls = registry.register(Histogram(
+    "versionup_ai_backend_duration_seconds",
+    "Latency of each inference backend, until the first chunk for streams.", ("backend", "kind", "status")))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class span:
+    """
+    Times a call to an upstream service into `versionup_upstream_duration_seconds`.
+    The status is "ok", "error" when the block raises, or what the caller sets on it.
+
+        with span("firestore", "users.get"):
+            snapshot = await run_in_threadpool(user_ref.get)
+    """
+
+    __slots__ = ("upstream", "operation", "status", "_started")
+
+    def __init__(self, upstream: str, operation: str):
+        self.upstream = upstream
+        self.operation = operation
+        self.status = "ok"
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+        upstream_calls.observe(time.perf_counter() - self._started, self.upstream, self.operation, self.status)
+        return False
+
+
+# --- Logging ---
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with Cloud Logging's field names, and the id of the request being served.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        request_id = request_id_var.get()
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"[{request_id}] {message}" if request_id else message
+
+
+class _AppLogHandler(logging.StreamHandler):
+    pass
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT) -> None:
+    """
+    Sends the app's logs to stdout, replacing a handler installed by an earlier call.
+    Handlers others installed on the root logger, such as pytest's, are kept.
+    """
+    handler = _AppLogHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else
+                         TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [h for h in root.handlers if not isinstance(h, _AppLogHandler)] + [handler]
+    root.setLevel(level)
+    # httpx logs every outbound call at INFO, upstream latency is in the metrics already
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+# --- Middleware ---
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def _request_id(headers: Dict[bytes, bytes]) -> str:
+    request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+    if _REQUEST_ID_PATTERN.match(request_id):
+        return request_id
+    # Cloud Run's load balancer traces every request, reuse its id so logs line up with the trace
+    trace = headers.get(b"x-cloud-trace-context", b"").decode("latin-1").split("/", 1)[0]
+    if _REQUEST_ID_PATTERN.match(trace):
+        return trace
+    return uuid.uuid4().hex
+
+
+class TelemetryMiddleware:
+    """
+    Times every HTTP request into `versionup_http_request_duration_seconds` by route template
+    and status, tags its logs with a request id, and returns that id as X-Request-ID.
+    A plain ASGI middleware, so it adds no task or body buffering to the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.access_log = logging.getLogger("versionup.access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(dict(scope["headers"]))
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_requests.observe(elapsed, scope["method"], route_path, status)
+            if LOG_REQUESTS:
+                self.access_log.info(f"{scope['method']} {route_path} {status}", extra={"fields": {
+                    "method": scope["method"], "path": scope["path"], "route": route_path,
+                    "status": status, "duration_ms": round(elapsed * 1000, 2)}})
+            request_id_var.reset(token)
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import get_current_user
+from app.firebase_setup import db as firestore_db
+from app.models.user_context import UserContext
+from app.telemetry import span
+
+# Seconds a decoded user document may be reused across requests, 0 disables the process cache
+USER_CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("USER_CONTEXT_CACHE_TTL_SECONDS", "0"))
+
+
+class UserContextCache:
+    """
+    Short-TTL process cache of decoded user documents.
+    Writers to users/{uid} call `invalidate` so this instance never serves its own stale writes.
+    """
+
+    def __init__(self, ttl_seconds: float = USER_CONTEXT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, UserContext]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, uid: str):
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None or time.time() - entry[0] >= self.ttl_seconds:
+                self._entries.pop(uid, None)
+                return None
+            return entry[1]
+
+    def put(self, context: UserContext) -> None:
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._entries[context.uid] = (time.time(), context)
+
+    def invalidate(self, uid: str) -> None:
+        with self._lock:
+            self._entries.pop(uid, None)
+
+
+user_context_cache = UserContextCache()
+
+
+async def load_user_context(uid: str) -> UserContext:
+    context = user_context_cache.get(uid)
+    if context is not None:
+        return context
+    with span("firestore", "users.get"):
+        snapshot = await run_in_threadpool(firestore_db.collection('users').document(uid).get)
+    context = UserContext.from_snapshot(uid, snapshot)
+    user_context_cache.put(context)
+    return context
+
+
+async def get_user_context(user: dict = Depends(get_current_user)) -> UserContext:
+    """
+    Dependency returning the current user's decoded Firestore document.
+    FastAPI caches dependencies per request, so the document is read at most once
+    per request however many endpoints' dependencies ask for it.
+    """
+    return await load_user_context(user.get("uid"))
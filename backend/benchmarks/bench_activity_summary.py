@@ -0,0 +1,76 @@
+"""
+Prompt size and build time for the activity context of `suggest_workout`.
+
+Compares the previous context (`str()` of every raw Strava activity dict) with
+the compact summary from `services.activity_summary`, on synthetic activities
+shaped like `/athlete/activities` responses.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_activity_summary --activities 30 --iterations 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.activity_summary import format_activity_context  # noqa: E402
+
+
+def synthetic_activity(index: int, start: datetime) -> dict:
+    date = start - timedelta(days=index, hours=random.randint(0, 5))
+    sport = random.choice(["Run", "Ride", "Swim", "WeightTraining"])
+    return {
+        "resource_state": 2, "athlete": {"id": 123, "resource_state": 1},
+        "name": f"{sport} #{index}", "distance": random.uniform(2000, 40000),
+        "moving_time": random.randint(900, 7200), "elapsed_time": random.randint(900, 8000),
+        "total_elevation_gain": random.uniform(0, 600), "type": sport, "sport_type": sport,
+        "workout_type": None, "id": 10_000_000 + index, "start_date": date.isoformat() + "Z",
+        "start_date_local": date.isoformat() + "Z", "timezone": "(GMT+09:00) Asia/Tokyo",
+        "utc_offset": 32400.0, "location_city": None, "location_state": None, "location_country": "Japan",
+        "achievement_count": 0, "kudos_count": 3, "comment_count": 0, "athlete_count": 1,
+        "photo_count": 0, "map": {"id": f"a{10_000_000 + index}", "resource_state": 2,
+                                  "summary_polyline": "".join(random.choices("abcdefghijklmnop_~", k=900))},
+        "trainer": False, "commute": False, "manual": False, "private": False, "visibility": "everyone",
+        "flagged": False, "gear_id": "g123", "start_latlng": [35.68, 139.76], "end_latlng": [35.69, 139.77],
+        "average_speed": 2.8, "max_speed": 5.1, "average_cadence": 80.2, "has_heartrate": True,
+        "average_heartrate": random.uniform(120, 170), "max_heartrate": random.uniform(170, 190),
+        "heartrate_opt_out": False, "display_hide_heartrate_option": True, "elev_high": 40.0, "elev_low": 2.0,
+        "upload_id": 9_000_000 + index, "upload_id_str": str(9_000_000 + index),
+        "external_id": f"garmin_{index}.fit", "from_accepted_tag": False, "pr_count": 0,
+        "total_photo_count": 0, "has_kudoed": False, "suffer_score": random.uniform(10, 150),
+    }
+
+
+def measure(build, activities, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        context = build(activities)
+    return context, (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    now = datetime(2025, 6, 1, 8, 0, 0)
+    activities = [synthetic_activity(i, now) for i in range(args.activities)]
+
+    raw, raw_ms = measure(lambda a: '\n'.join(map(str, a)), activities, args.iterations)
+    compact, compact_ms = measure(format_activity_context, activities, args.iterations)
+
+    # ~4 characters per token is a reasonable estimate for Llama tokenizers on English/JSON text
+    print(f"{'context':<12}{'chars':>10}{'~tokens':>10}{'ms/request':>12}")
+    print(f"{'raw dicts':<12}{len(raw):>10}{len(raw) // 4:>10}{raw_ms:>12.3f}")
+    print(f"{'summary':<12}{len(compact):>10}{len(compact) // 4:>10}{compact_ms:>12.3f}")
+    print(f"prompt context reduced {len(raw) / len(compact):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Full recompute and incremental update times of the training analytics.
+
+Builds a synthetic multi-year history shaped like `/athlete/activities`, with
+heart rate, distance and time streams stored for the most recent activities,
+then times `compute_state` over the whole history and `update_state` for one
+new activity, which is what the activity store listener does on every sync.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_analytics --years 5 --per-week 6 --streams 300
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.activity_streams import StreamStore, to_array  # noqa: E402
+from services.analytics import analytics_report, compute_state, update_state  # noqa: E402
+
+
+def synthetic_history(years: int, per_week: int, start: datetime) -> list:
+    activities = []
+    days = years * 365
+    for index in range(days * per_week // 7):
+        sport = random.choice(["Run", "Run", "Ride", "Swim", "WeightTraining"])
+        date = start + timedelta(days=index * 7 / per_week, hours=random.randint(0, 5))
+        moving = random.randint(1200, 7200)
+        speed = {"Run": 3.0, "Ride": 8.0, "Swim": 1.0}.get(sport, 0.0) * random.uniform(0.8, 1.2)
+        activities.append({
+            "id": 10_000_000 + index, "type": sport, "sport_type": sport,
+            "start_date": date.isoformat() + "Z", "start_date_local": date.isoformat() + "Z",
+            "distance": moving * speed, "moving_time": moving, "elapsed_time": moving + 120,
+            "total_elevation_gain": random.uniform(0, 500),
+            "average_heartrate": random.uniform(120, 165), "max_heartrate": random.uniform(170, 188),
+        })
+    return activities
+
+
+def synthetic_streams(activity: dict) -> dict:
+    seconds = np.arange(activity["moving_time"], dtype=np.float64)
+    speed = activity["distance"] / activity["moving_time"] * np.random.uniform(0.7, 1.3, seconds.size)
+    heartrate = activity["average_heartrate"] + 10 * np.sin(seconds / 300)
+    return {"time": to_array("time", seconds), "distance": to_array("distance", np.cumsum(speed)),
+            "heartrate": to_array("heartrate", heartrate)}
+
+
+def measure(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return result, (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-week", type=int, default=6)
+    parser.add_argument("--streams", type=int, default=300, help="recent activities with stored streams")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(7)
+    np.random.seed(7)
+    history = synthetic_history(args.years, args.per_week, datetime(2020, 1, 1, 7, 0))
+    new_activity = synthetic_history(1, 7, datetime(2030, 1, 1, 7, 0))[0]
+    new_activity["id"] = 99_999_999
+
+    with tempfile.TemporaryDirectory() as root:
+        store = StreamStore(root)
+        for activity in history[-args.streams:] if args.streams else []:
+            store.save("bench", activity["id"], synthetic_streams(activity))
+        loader = lambda activity_id: store.load("bench", activity_id, ("time", "heartrate", "distance"))  # noqa: E731
+
+        state, full_ms = measure(lambda: compute_state(history, loader), args.iterations)
+        _, update_ms = measure(lambda: update_state(state, [new_activity], loader), args.iterations * 20)
+        _, report_ms = measure(lambda: analytics_report(state), args.iterations * 20)
+
+    print(f"history: {len(history)} activities over {args.years} years, {args.streams} with streams")
+    print(f"{'operation':<22}{'ms':>10}")
+    print(f"{'full recompute':<22}{full_ms:>10.1f}")
+    print(f"{'incremental update':<22}{update_ms:>10.2f}")
+    print(f"{'report':<22}{report_ms:>10.3f}")
+    print(f"incremental update is {full_ms / update_ms:.0f}x cheaper than a recompute")
+
+
+if __name__ == "__main__":
+    main()
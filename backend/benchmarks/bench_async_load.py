@@ -0,0 +1,107 @@
+"""
+Load benchmark for the Strava request path against a local stub server.
+
+Compares the previous request path (blocking `requests` calls without a
+Session, run on the AnyIO threadpool) with the shared keep-alive
+`httpx.AsyncClient` used by `app.clients.strava_client`.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_async_load --requests 400 --concurrency 100 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import anyio
+import requests
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_strava(latency: float) -> str:
+    """
+    Starts a stub Strava API in a background thread and returns its base URL.
+    """
+    stub = FastAPI()
+
+    @stub.get("/athlete/activities")
+    async def activities(per_page: int = 5, page: int = 1):
+        await asyncio.sleep(latency)
+        return [{"id": i, "name": f"Run {i}", "distance": 5000 + i} for i in range(per_page)]
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_legacy(base_url: str, total: int, concurrency: int) -> float:
+    def fetch():
+        response = requests.get(f"{base_url}/athlete/activities",
+                                headers={"Authorization": "Bearer bench"},
+                                params={"per_page": 5, "page": 1})
+        response.raise_for_status()
+        return response.json()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await anyio.to_thread.run_sync(fetch)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_async(total: int, concurrency: int) -> float:
+    from app.clients import strava_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await strava_client.get_activities(access_token="bench", per_page=5)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await strava_client.close_http_client()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub upstream latency in seconds")
+    args = parser.parse_args()
+
+    base_url = start_stub_strava(args.latency)
+    os.environ["STRAVA_API_BASE_URL"] = base_url
+
+    legacy = asyncio.run(run_legacy(base_url, args.requests, args.concurrency))
+    pooled = asyncio.run(run_async(args.requests, args.concurrency))
+
+    print(f"{'mode':<28}{'seconds':>10}{'req/s':>10}")
+    print(f"{'sync requests + threadpool':<28}{legacy:>10.2f}{args.requests / legacy:>10.1f}")
+    print(f"{'async pooled httpx':<28}{pooled:>10.2f}{args.requests / pooled:>10.1f}")
+    print(f"speedup: {legacy / pooled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-request overhead of `get_current_user`, with and without the verified-token cache.
+
+Tokens are RS256 JWTs signed by a locally generated key, and verification runs through
+the same google-auth code path the Firebase Admin SDK uses. The signing certificates
+are served from memory, as the SDK's cache-control-aware certificate cache serves them
+between refreshes, so the numbers isolate the crypto and claim checks from the network.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_auth --requests 2000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import google.auth.crypt
+import google.auth.transport
+import google.auth.jwt
+import google.oauth2.id_token
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import auth as app_auth  # noqa: E402
+
+PROJECT_ID = "versionsup-bench"
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+
+def make_signer_and_certs():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    pem_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+    signer = google.auth.crypt.RSASigner.from_string(pem_key, key_id="bench-key")
+    certs = {"bench-key": cert.public_bytes(serialization.Encoding.PEM).decode()}
+    return signer, certs
+
+
+def mint_token(signer, uid):
+    now = int(time.time())
+    payload = {"iss": f"https://securetoken.google.com/{PROJECT_ID}", "aud": PROJECT_ID,
+               "auth_time": now, "sub": uid, "iat": now, "exp": now + 3600}
+    return google.auth.jwt.encode(signer, payload).decode()
+
+
+class CertResponse(google.auth.transport.Response):
+    def __init__(self, data: bytes):
+        self._data = data
+
+    @property
+    def status(self):
+        return 200
+
+    @property
+    def headers(self):
+        return {}
+
+    @property
+    def data(self):
+        return self._data
+
+
+class InMemoryCerts:
+    def __init__(self, certs):
+        self.response = CertResponse(json.dumps(certs).encode())
+
+    def __call__(self, url, method="GET", **kwargs):
+        return self.response
+
+
+async def run(tokens, requests_per_token):
+    start = time.perf_counter()
+    for token in tokens:
+        for _ in range(requests_per_token):
+            await app_auth.get_current_user(token)
+    return (time.perf_counter() - start) / (len(tokens) * requests_per_token) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    signer, certs = make_signer_and_certs()
+    cert_request = InMemoryCerts(certs)
+
+    def verify_id_token(token):
+        claims = google.oauth2.id_token.verify_token(
+            token, request=cert_request, audience=PROJECT_ID,
+            certs_url=ID_TOKEN_CERT_URI)
+        claims["uid"] = claims["sub"]
+        return claims
+
+    tokens = [mint_token(signer, f"user-{i}") for i in range(args.users)]
+    per_token = max(args.requests // args.users, 1)
+
+    with patch.object(app_auth.auth, "verify_id_token", side_effect=verify_id_token):
+        with patch.object(app_auth.token_cache, "max_entries", 0):
+            uncached = asyncio.run(run(tokens, per_token))
+        app_auth.token_cache.clear()
+        app_auth.token_cache.hits = app_auth.token_cache.misses = 0
+        cached = asyncio.run(run(tokens, per_token))
+
+    print(f"{'mode':<20}{'us/request':>12}")
+    print(f"{'verify every call':<20}{uncached:>12.1f}")
+    print(f"{'verified-token cache':<20}{cached:>12.1f}")
+    print(f"{per_token} requests per token, cache hit rate "
+          f"{app_auth.token_cache.hits / (app_auth.token_cache.hits + app_auth.token_cache.misses):.0%}")
+
+
+if __name__ == "__main__":
+    main()
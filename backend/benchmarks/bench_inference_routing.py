@@ -0,0 +1,97 @@
+"""
+Completion latency through `InferenceRouter` with one backend, two backends routed by
+latency alone, and two backends with hedged requests.
+
+Backends are simulated in process: each completion takes a log-normally distributed
+time around `--latency`, and a `--tail-rate` share of them takes `--tail-factor` times
+longer, as a loaded or cold model server does. The second backend is `--second-factor`
+times slower at the median. Reported are the latency percentiles, how many calls were
+hedged, and the extra load the hedges put on the backends.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_inference_routing --requests 400 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import inference  # noqa: E402
+from app.inference import InferenceBackend, InferenceRouter  # noqa: E402
+
+
+class SimulatedBackend(InferenceBackend):
+    def __init__(self, name: str, latency: float, tail_rate: float, tail_factor: float, seed: int):
+        super().__init__(name, f"simulated-{name}")
+        self.latency = latency
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.random = random.Random(seed)
+        self.started = 0
+
+    async def chat_completion(self, messages, stream=False, **options):
+        self.started += 1
+        seconds = self.latency * self.random.lognormvariate(0, 0.25)
+        if self.random.random() < self.tail_rate:
+            seconds *= self.tail_factor
+        await asyncio.sleep(seconds)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Plan"))])
+
+
+def percentile(values, quantile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+async def drive(router: InferenceRouter, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            started = time.perf_counter()
+            await router.chat_completion([{"role": "user", "content": "Plan"}])
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(call() for _ in range(requests)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="median completion time in seconds")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="share of completions in the slow tail")
+    parser.add_argument("--tail-factor", type=float, default=10.0)
+    parser.add_argument("--second-factor", type=float, default=1.3, help="median of the second backend, relative")
+    args = parser.parse_args()
+
+    # Budgets from the start of the run, rather than the production default
+    inference.AI_HEDGE_MIN_SAMPLES = 10
+    inference.AI_HEDGE_DEFAULT_SECONDS = args.latency * 3
+
+    def backends():
+        return [SimulatedBackend("primary", args.latency, args.tail_rate, args.tail_factor, seed=1),
+                SimulatedBackend("secondary", args.latency * args.second_factor, args.tail_rate, args.tail_factor,
+                                 seed=2)]
+
+    print(f"{args.requests} completions, {args.concurrency} concurrent, median {args.latency * 1000:.0f} ms, "
+          f"{args.tail_rate:.0%} at {args.tail_factor:g}x")
+    for label, router in (("single", InferenceRouter(backends()[:1], hedge=False)),
+                          ("routed", InferenceRouter(backends(), hedge=False)),
+                          ("hedged", InferenceRouter(backends()))):
+        latencies = asyncio.run(drive(router, args.requests, args.concurrency))
+        started = sum(backend.started for backend in router.backends)
+        print(f"  {label:<8} p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+              f"hedged {router.hedges:>4}  backend calls +{started / args.requests - 1:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Load test of the main user journeys against local stand-ins for Strava, the AI service
+and Firestore, see `benchmarks.fakes` and `benchmarks.load_app`.
+
+Each virtual user signs in, connects Strava, lists their activities, asks for a workout
+suggestion, saves it and lists their saved workouts, as the frontend does, every journey
+as a new user. Virtual users run concurrently at each level of `--concurrency`. The app
+and the fake upstreams run in their own processes, so the load generator does not share
+an event loop or the GIL with the server it measures. Between levels the harness waits
+until the background work the journeys started (history backfill, streams) has drained.
+
+Latency percentiles and throughput are reported per endpoint and concurrency level.
+`--save-baseline` stores the report as the baseline, later runs are compared against it
+and exit with status 1 when an endpoint got slower, failed more often or lost throughput
+beyond `--tolerance`. Baselines only compare on the machine and settings they were
+recorded with.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_load --concurrency 1,5,10,25 --save-baseline
+    python -m benchmarks.bench_load --concurrency 1,5,10,25
+    python -m benchmarks.bench_load --error-rate 0.02 --throttle-rate 0.02 --output /tmp/faults.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fakes import add_arguments  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "load_baseline.json")
+API_PREFIX = "/api/v1"
+
+# The app refuses to start without these, the fakes accept any value
+REQUIRED_ENV = {
+    "AI_API_KEY": "bench",
+    "STRAVA_CLIENT_ID": "bench",
+    "STRAVA_CLIENT_SECRET": "bench",
+    "STRAVA_REDIRECT_URI": "http://localhost/redirect",
+}
+
+# Requests an endpoint needs before its percentile is compared, the p99 of fewer is about its maximum
+MIN_SAMPLES = {"p50_ms": 1, "p95_ms": 20, "p99_ms": 100}
+
+GOALS = ("Build Endurance", "Run a faster 10k", "Lose weight", "Prepare for a half marathon", "Recover from a race")
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    seconds: float
+    status: int
+
+
+# --- Processes ---
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    started = time.perf_counter()
+    with httpx.Client(timeout=1.0) as http:
+        while time.perf_counter() - started < timeout:
+            try:
+                http.get(url)
+                return
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"{process.args[2]} exited with code {process.returncode}")
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+
+
+def fake_arguments(args: argparse.Namespace) -> List[str]:
+    return [
+        "--strava-latency", str(args.strava_latency), "--strava-short-limit", str(args.strava_short_limit),
+        "--strava-daily-limit", str(args.strava_daily_limit), "--activities", str(args.activities),
+        "--ai-latency", str(args.ai_latency), "--ai-tokens", str(args.ai_tokens),
+        "--ai-tokens-per-second", str(args.ai_tokens_per_second), "--ai-rpm", str(args.ai_rpm),
+        "--latency-sigma", str(args.latency_sigma), "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate),
+    ] + (["--seed", str(args.seed)] if args.seed is not None else [])
+
+
+def start_fakes(args: argparse.Namespace, strava_port: int, ai_port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fakes", "--strava-port", str(strava_port), "--ai-port", str(ai_port)]
+        + fake_arguments(args), cwd=BACKEND_DIR)
+    wait_until_up(f"http://127.0.0.1:{strava_port}/_stats", process)
+    wait_until_up(f"http://127.0.0.1:{ai_port}/_stats", process)
+    return process
+
+
+def start_app(args: argparse.Namespace, port: int, strava_port: int, ai_port: int,
+              streams_dir: str) -> subprocess.Popen:
+    env = {**os.environ, **REQUIRED_ENV,
+           "STRAVA_API_BASE_URL": f"http://127.0.0.1:{strava_port}/api/v3",
+           "STRAVA_OAUTH_URL": f"http://127.0.0.1:{strava_port}/oauth",
+           "AI_BASE_URL": f"http://127.0.0.1:{ai_port}",
+           "BENCH_FIRESTORE_LATENCY": str(args.firestore_latency),
+           "STRAVA_STREAMS_DIR": streams_dir,
+           "LOG_LEVEL": "WARNING"}
+    env.pop("K_SERVICE", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"], cwd=BACKEND_DIR, env=env)
+    wait_until_up(f"http://127.0.0.1:{port}{API_PREFIX}/", process)
+    return process
+
+
+def stop(process: Optional[subprocess.Popen]) -> None:
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# --- Journeys ---
+
+async def journey(http: httpx.AsyncClient, uid: str, samples: List[Sample]) -> None:
+    headers = {"Authorization": f"Bearer bench:{uid}"}
+
+    async def call(method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, API_PREFIX + path, headers=headers, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        samples.append(Sample(f"{method} {path}", time.perf_counter() - started, status))
+        return response
+
+    # Sign in: the frontend loads the profile and the Strava status with the new ID token
+    await asyncio.gather(call("GET", "/user/profile"), call("GET", "/strava/status"))
+    # Connect Strava: Strava's OAuth page redirects back with a code
+    await call("GET", "/strava/auth_url")
+    await call("GET", "/strava/exchange_token", params={"code": uid})
+    await call("GET", "/strava/activities", params={"per_page": 15})
+
+    goal = GOALS[int(hashlib.sha256(uid.encode()).hexdigest(), 16) % len(GOALS)]
+    response = await call("POST", "/ai/suggest_workout", json={"goal": goal, "time": 45, "equipment": "None"})
+    suggestion = response.json()["suggestion"] if response is not None and response.status_code == 200 else goal
+    await call("POST", "/save_workout", json={"suggestion": suggestion})
+    await call("GET", "/get_workouts", params={"limit": 20})
+
+
+async def upstream_stats(http: httpx.AsyncClient, strava_url: str, ai_url: str) -> Dict[str, Dict[str, int]]:
+    strava, ai = await asyncio.gather(http.get(f"{strava_url}/_stats"), http.get(f"{ai_url}/_stats"))
+    return {"strava": strava.json(), "ai": ai.json()}
+
+
+async def wait_for_idle(http: httpx.AsyncClient, strava_url: str, quiet: float, timeout: float) -> None:
+    """
+    Waits until the Strava fake has seen no request for `quiet` seconds, the journeys'
+    background backfills and stream syncs all call Strava.
+    """
+    deadline = time.perf_counter() + timeout
+    last = None
+    while time.perf_counter() < deadline:
+        requests = (await http.get(f"{strava_url}/_stats")).json()["requests"]
+        if requests == last:
+            return
+        last = requests
+        await asyncio.sleep(quiet)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Linear interpolation between the closest ranks, as numpy's default.
+    """
+    if len(values) == 1:
+        return values[0]
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint in dict.fromkeys(sample.endpoint for sample in samples):
+        selected = [sample for sample in samples if sample.endpoint == endpoint]
+        latencies = sorted(sample.seconds * 1000 for sample in selected)
+        errors = sum(1 for sample in selected if not 200 <= sample.status < 400)
+        endpoints[endpoint] = {
+            "requests": len(selected),
+            "errors": errors,
+            "error_rate": round(errors / len(selected), 4),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "throughput_rps": round(len(selected) / seconds, 2),
+        }
+    return {"seconds": round(seconds, 3), "requests": len(samples),
+            "throughput_rps": round(len(samples) / seconds, 2), "endpoints": endpoints}
+
+
+async def run_level(base_url: str, strava_url: str, ai_url: str, concurrency: int, journeys: int,
+                    warmup: int, args: argparse.Namespace) -> Dict[str, Any]:
+    # Idle connections are dropped before uvicorn's 5s keep-alive closes them, as Cloud Run's front end does
+    limits = httpx.Limits(max_connections=concurrency + 2, max_keepalive_connections=concurrency + 2,
+                          keepalive_expiry=2.0)
+    run_id = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as http:
+        await asyncio.gather(*(journey(http, f"warmup-{run_id}-{index}", []) for index in range(warmup)))
+        await wait_for_idle(http, strava_url, args.settle, args.settle_timeout)
+        before = await upstream_stats(http, strava_url, ai_url)
+
+        samples: List[Sample] = []
+        remaining = iter(range(journeys))
+
+        async def virtual_user():
+            for index in remaining:
+                await journey(http, f"{run_id}-c{concurrency}-{index}", samples)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+
+        await wait_for_idle(http, strava_url, args.settle, args.settle_timeout)
+        after = await upstream_stats(http, strava_url, ai_url)
+
+    report = summarize(samples, seconds)
+    report["journeys"] = journeys
+    report["journeys_per_second"] = round(journeys / seconds, 3)
+    report["upstreams"] = {name: {key: after[name][key] - before[name][key]
+                                  for key in ("requests", "errors", "throttled")}
+                           for name in after}
+    return report
+
+
+# --- Baseline ---
+
+def settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    What a run's numbers depend on besides the code, two reports only compare if these match.
+    """
+    return {
+        "concurrency": args.concurrency,
+        "journeys_per_user": args.journeys_per_user,
+        "min_journeys": args.min_journeys,
+        "firestore_latency": args.firestore_latency,
+        "upstreams": fake_arguments(args),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float,
+            min_delta_ms: float, error_tolerance: float) -> List[str]:
+    """
+    Returns a line per regression of `current` against `baseline`.
+    Latency regresses when it grew by more than `tolerance` and `min_delta_ms`, so
+    jitter on millisecond endpoints is not reported, and percentiles are only compared
+    over enough requests to be stable.
+    """
+    regressions = []
+    for level, base_level in baseline["levels"].items():
+        level_report = current["levels"].get(level)
+        if level_report is None:
+            continue
+        if level_report["journeys_per_second"] < base_level["journeys_per_second"] * (1 - tolerance):
+            regressions.append(f"c={level} journeys/s {level_report['journeys_per_second']:.2f} "
+                               f"< {base_level['journeys_per_second']:.2f}")
+        for endpoint, base in base_level["endpoints"].items():
+            stats = level_report["endpoints"].get(endpoint)
+            if stats is None:
+                continue
+            for key, min_samples in MIN_SAMPLES.items():
+                if min(stats["requests"], base["requests"]) < min_samples:
+                    continue
+                if stats[key] > base[key] * (1 + tolerance) and stats[key] - base[key] > min_delta_ms:
+                    regressions.append(f"c={level} {endpoint} {key[:3]} {stats[key]:.1f} ms "
+                                       f"> {base[key]:.1f} ms (+{stats[key] / base[key] - 1:.0%})")
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"c={level} {endpoint} throughput {stats['throughput_rps']:.2f} "
+                                   f"< {base['throughput_rps']:.2f} req/s")
+            if stats["error_rate"] > base["error_rate"] + error_tolerance:
+                regressions.append(f"c={level} {endpoint} error rate {stats['error_rate']:.1%} "
+                                   f"> {base['error_rate']:.1%}")
+    return regressions
+
+
+def print_level(concurrency: int, report: Dict[str, Any]) -> None:
+    upstreams = report["upstreams"]
+    print(f"\nconcurrency {concurrency}: {report['journeys']} journeys in {report['seconds']:.1f}s, "
+          f"{report['journeys_per_second']:.2f} journeys/s, {report['throughput_rps']:.1f} req/s "
+          f"(Strava {upstreams['strava']['requests']} calls, {upstreams['strava']['throttled']} throttled; "
+          f"AI {upstreams['ai']['requests']} calls)")
+    print(f"  {'endpoint':<34}{'req':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"  {endpoint:<34}{stats['requests']:>6}{stats['errors']:>6}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['throughput_rps']:>9.2f}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    strava_port, ai_port, app_port = free_port(), free_port(), free_port()
+    strava_url, ai_url = f"http://127.0.0.1:{strava_port}", f"http://127.0.0.1:{ai_port}"
+    fakes = app = None
+    with tempfile.TemporaryDirectory() as streams_dir:
+        try:
+            fakes = start_fakes(args, strava_port, ai_port)
+            app = start_app(args, app_port, strava_port, ai_port, streams_dir)
+            levels = {}
+            for index, concurrency in enumerate(args.concurrency):
+                journeys = max(concurrency * args.journeys_per_user, args.min_journeys)
+                report = await run_level(f"http://127.0.0.1:{app_port}", strava_url, ai_url, concurrency,
+                                         journeys, args.warmup if index == 0 else 0, args)
+                print_level(concurrency, report)
+                levels[str(concurrency)] = report
+        finally:
+            stop(app)
+            stop(fakes)
+    return {"recorded_at": datetime.now(timezone.utc).isoformat(), "settings": settings(args), "levels": levels}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=lambda value: [int(part) for part in value.split(",")],
+                        default=[1, 5, 10, 25], help="comma-separated virtual user counts, one level each")
+    parser.add_argument("--journeys-per-user", type=int, default=3)
+    parser.add_argument("--min-journeys", type=int, default=10, help="journeys of the smallest levels")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured journeys before the first level")
+    parser.add_argument("--firestore-latency", type=float, default=0.01, help="seconds per Firestore call")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before a request counts as failed")
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="seconds without upstream calls after which the app counts as idle")
+    parser.add_argument("--settle-timeout", type=float, default=120.0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--output", help="also write this run's report to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative latency growth and throughput loss")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="latency growth always tolerated")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="allowed error rate growth")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["settings"] != report["settings"]:
+        print(f"\nThe baseline at {args.baseline} was recorded with other settings, not comparing")
+        sys.exit(2)
+    regressions = compare(baseline, report, args.tolerance, args.min_delta_ms, args.error_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against the baseline of {baseline['recorded_at']}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against the baseline of {baseline['recorded_at']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Serialization time and bytes on the wire of `/strava/activities` and `/get_workouts`.
+
+Each endpoint is a one-route FastAPI app returning a prebuilt page, driven straight
+through the ASGI interface, so the time is the framework's serialization path alone:
+- default: plain dicts through `jsonable_encoder` and the standard `JSONResponse`,
+  as the routes were served before,
+- validated: the response model, FastAPI validates every item before pydantic
+  serializes it to JSON bytes,
+- fast: the page returned as a `FastJSONResponse`, as the routes are served now,
+  the response model only documents it.
+Body sizes are reported uncompressed and as `CompressionMiddleware` sends them for
+gzip and, when the brotli package is installed, br; compression time is reported
+separately from serialization.
+
+Activities are the fake Strava history with the map and athlete fields Strava adds,
+workouts are saved plans as the store serves them.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_serialization --page-size 100 --requests 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import compression  # noqa: E402
+from app.compression import CompressionMiddleware  # noqa: E402
+from app.models.activity import Activity  # noqa: E402
+from app.models.saved_workout import SavedWorkout  # noqa: E402
+from app.models.workout_plan import WorkoutPlan  # noqa: E402
+from app.responses import FastJSONResponse  # noqa: E402
+from benchmarks.fakes import FakeStrava  # noqa: E402
+from services.workout_plans import compact_plan, workout_view  # noqa: E402
+
+EXERCISES = ["Squats", "Push-Ups", "Plank", "Lunges", "Dumbbell Rows", "Burpees", "Deadlifts", "Mountain Climbers"]
+MUSCLES = ["Legs", "Glutes", "Chest", "Shoulders", "Triceps", "Core", "Back", "Biceps"]
+
+
+def build_activities(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    activities = FakeStrava(activities_per_athlete=count).history("bench")
+    for activity in activities:
+        activity.update({
+            "resource_state": 2,
+            "athlete": {"id": 1234567, "resource_state": 1},
+            # An encoded polyline, a few hundred characters that compress poorly
+            "map": {"id": f"a{activity['id']}", "resource_state": 2,
+                    "summary_polyline": "".join(rng.choices(string.ascii_letters + "_@?^`~", k=600))},
+            "timezone": "(GMT+09:00) Asia/Tokyo", "utc_offset": 32400.0, "location_country": "Japan",
+            "achievement_count": rng.randint(0, 5), "kudos_count": rng.randint(0, 20), "comment_count": 0,
+            "trainer": False, "commute": False, "manual": False, "private": False, "visibility": "everyone",
+            "flagged": False, "gear_id": "g123456", "start_latlng": [35.68, 139.76], "end_latlng": [35.68, 139.77],
+            "max_speed": round(activity["average_speed"] * 1.6, 3), "has_heartrate": True,
+            "elev_high": 60.2, "elev_low": 12.4, "pr_count": 0, "has_kudoed": False,
+        })
+    return activities
+
+
+def build_workouts(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(11)
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    workouts = []
+    for index in range(count):
+        plan = WorkoutPlan.model_validate({
+            "summary": "This plan builds endurance with progressive full-body conditioning.",
+            "warm_up": "5 minutes of dynamic stretching: arm circles, lunges and hip rotations.",
+            "days": [{"title": f"Day {day} – Strength & Conditioning", "exercises": [
+                {"name": name, "sets": rng.randint(2, 5), "reps": str(rng.choice((8, 10, 12, 15))),
+                 "muscles": rng.sample(MUSCLES, 3), "purpose": f"{name} build strength and stability."}
+                for name in rng.sample(EXERCISES, 5)]} for day in range(1, 4)],
+            "cool_down": "Light stretching to relax the muscles and improve recovery.",
+            "tips": ["Stay hydrated.", "Focus on controlled movement and steady breathing."],
+        })
+        workouts.append({**workout_view({**compact_plan(plan), "created_at": created_at - timedelta(days=index)}),
+                         "id": f"w{index:05d}"})
+    return workouts
+
+
+def build_app(variant: str, model, items: List[Dict[str, Any]]) -> FastAPI:
+    if variant == "default":
+        app = FastAPI()
+
+        @app.get("/items")
+        async def get_default():
+            return items
+    elif variant == "validated":
+        app = FastAPI()
+
+        @app.get("/items", response_model=List[model])
+        async def get_validated():
+            return items
+    else:
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/items", response_model=List[model])
+        async def get_fast():
+            return FastJSONResponse(items)
+    app.add_middleware(CompressionMiddleware)
+    return app
+
+
+async def drive(app, requests: int, accept_encoding: str):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/items", "raw_path": b"/items", "root_path": "", "query_string": b"",
+             "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    body = bytearray()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    for _ in range(20):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        body.clear()
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100, help="Activities or workouts per response")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    endpoints = [("/strava/activities", Activity, build_activities(args.page_size)),
+                 ("/get_workouts", SavedWorkout, build_workouts(args.page_size))]
+    for path, model, items in endpoints:
+        print(f"{path}, {args.page_size} per page, {args.requests} requests")
+        for variant in ("default", "validated", "fast"):
+            app = build_app(variant, model, items)
+            plain, size = asyncio.run(drive(app, args.requests, "identity"))
+            print(f"  {variant:<10} {plain * 1000:7.3f} ms/request  {size:>8} bytes")
+            if variant != "fast":
+                continue
+            for encoding in encodings[1:]:
+                elapsed, compressed = asyncio.run(drive(app, args.requests, encoding))
+                print(f"    {encoding:<8} +{(elapsed - plain) * 1000:6.3f} ms        {compressed:>8} bytes "
+                      f"({compressed / size:.0%})")
+        if compression.brotli is None:
+            print("    br       skipped, the brotli package is not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold start of the API: time from process spawn to the first response.
+
+Each run starts uvicorn in a fresh process on a copy of the backend sources and polls
+`GET /api/v1/` until it answers, which is what Cloud Run waits for before routing traffic
+to a new instance. The import time of `app.main` is measured in a separate fresh process.
+
+Runs are repeated with and without precompiled bytecode for the app's own modules.
+The installed packages keep their bytecode either way, as in the Docker image where pip
+compiles them, so "source" matches an image built with PYTHONDONTWRITEBYTECODE and no
+compile step, and "bytecode" one built with the compileall step.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import compileall
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# The app refuses to start without these, none of them is used before the first request
+REQUIRED_ENV = {
+    "AI_API_KEY": "bench",
+    "STRAVA_CLIENT_ID": "bench",
+    "STRAVA_CLIENT_SECRET": "bench",
+    "STRAVA_REDIRECT_URI": "http://localhost/redirect",
+}
+
+IMPORT_SCRIPT = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def copy_sources(target: str, precompile: bool) -> str:
+    source_dir = os.path.join(target, "backend")
+    shutil.copytree(BACKEND_DIR, source_dir,
+                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc", "test", "benchmarks", ".pytest_cache"))
+    if precompile:
+        compileall.compile_dir(source_dir, quiet=1, workers=0,
+                               invalidation_mode=compileall.py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    return source_dir
+
+
+def child_env() -> dict:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    for name, value in REQUIRED_ENV.items():
+        env.setdefault(name, value)
+    env.pop("K_SERVICE", None)
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(source_dir: str) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=source_dir, env=child_env(),
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_response(source_dir: str, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=source_dir, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(timeout=1.0) as http:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if http.get(f"http://127.0.0.1:{port}/api/v1/").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+                time.sleep(0.005)
+        raise RuntimeError(f"No response within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(label: str, samples: list) -> None:
+    milliseconds = [sample * 1000 for sample in samples]
+    print(f"  {label:<16} median {statistics.median(milliseconds):7.0f} ms   "
+          f"min {min(milliseconds):7.0f} ms   max {max(milliseconds):7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the first response")
+    args = parser.parse_args()
+
+    for precompile in (False, True):
+        with tempfile.TemporaryDirectory() as target:
+            source_dir = copy_sources(target, precompile)
+            imports = [time_import(source_dir) for _ in range(args.runs)]
+            responses = [time_first_response(source_dir, args.timeout) for _ in range(args.runs)]
+        print(f"{'bytecode' if precompile else 'source'} ({args.runs} runs)")
+        report("import app.main", imports)
+        report("first response", responses)
+
+
+if __name__ == "__main__":
+    main()
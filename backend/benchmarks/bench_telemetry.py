@@ -0,0 +1,94 @@
+"""
+Per-request cost of the telemetry middleware and of an upstream span.
+
+Requests are driven straight through the ASGI interface of a one-route FastAPI app,
+with and without `TelemetryMiddleware`, so the difference is the middleware alone:
+request id, histogram observation and, when enabled, the JSON access log line
+(formatted, then written to a null stream).
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_telemetry --requests 20000
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI  # noqa: E402
+
+from app import telemetry  # noqa: E402
+from app.telemetry import JsonFormatter, TelemetryMiddleware, span  # noqa: E402
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(TelemetryMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/items/7", "raw_path": b"/items/7", "root_path": "", "query_string": b"",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up routing and the app's middleware stack
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def time_spans(count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        with span("firestore", "bench.get"):
+            pass
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(JsonFormatter())
+    logging.getLogger("versionup.access").addHandler(handler)
+    logging.getLogger("versionup.access").propagate = False
+    logging.getLogger("versionup.access").setLevel(logging.INFO)
+
+    baseline = asyncio.run(drive(build_app(False), args.requests))
+    telemetry.LOG_REQUESTS = False
+    metrics_only = asyncio.run(drive(build_app(True), args.requests))
+    telemetry.LOG_REQUESTS = True
+    with_logs = asyncio.run(drive(build_app(True), args.requests))
+    per_span = time_spans(args.requests * 10)
+
+    print(f"{args.requests} requests through the ASGI app")
+    print(f"  without middleware        {baseline * 1e6:7.1f} us/request")
+    print(f"  metrics                   {metrics_only * 1e6:7.1f} us/request  (+{(metrics_only - baseline) * 1e6:.1f} us)")
+    print(f"  metrics and access log    {with_logs * 1e6:7.1f} us/request  (+{(with_logs - baseline) * 1e6:.1f} us)")
+    print(f"  span                      {per_span * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
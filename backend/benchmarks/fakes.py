@@ -0,0 +1,396 @@
+"""
+Local stand-ins for the Strava API and the Hugging Face inference API, for load tests.
+
+Every response waits a log-normally distributed latency around a median, and a share
+of requests can be failed with a 503 or throttled with a 429. The Strava fake also
+keeps Strava's application quota: a 15 minute and a daily request budget, reported in
+the X-RateLimit headers and answered with 429 once spent, so the app's rate limiter,
+retries and backoff run as they do in production. The inference fake caps requests per
+minute the same way and streams completions token by token at a configurable rate.
+A completion asked for with a JSON `response_format` is a valid workout plan.
+
+Each athlete's history is generated from their access token, so it is the same
+across runs. GET /_stats on either server returns its request, error and 429 counts.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.fakes --strava-port 8101 --ai-port 8102 --strava-latency 0.08 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+SHORT_WINDOW_SECONDS = 15 * 60
+DAY_SECONDS = 24 * 3600
+
+WORKOUT_WORDS = ("Warm up with 10 minutes of easy jogging, then 6 x 800m at threshold pace with 2 minutes "
+                 "of recovery jog between repeats. Keep the effort controlled and the cadence high. Finish "
+                 "with a 10 minute cool down and light mobility work for hips and calves.").split()
+
+
+class FakeUpstream:
+    """
+    Latency, failure and throttling shared by the fake servers.
+    """
+
+    def __init__(self, latency: float = 0.05, latency_sigma: float = 0.3, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = FastAPI()
+        self.app.add_api_route("/_stats", self.stats)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                "max_in_flight": self.max_in_flight}
+
+    async def wait(self, scale: float = 1.0) -> None:
+        if self.latency > 0:
+            await asyncio.sleep(scale * self.latency * self.random.lognormvariate(0, self.latency_sigma))
+
+    def over_quota(self) -> bool:
+        return False
+
+    def fault(self) -> Optional[int]:
+        """
+        Counts a request and returns the status to fail it with, if any.
+        """
+        self.requests += 1
+        if self.over_quota() or self.random.random() < self.throttle_rate:
+            self.throttled += 1
+            return 429
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return 503
+        return None
+
+    async def reply(self, body: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+                    scale: float = 1.0) -> Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.wait(scale)
+        finally:
+            self.in_flight -= 1
+        return JSONResponse(body, status_code=status_code, headers=headers)
+
+
+class FakeStrava(FakeUpstream):
+    """
+    The Strava endpoints the app calls: OAuth token exchange and refresh, the athlete's
+    activities with paging, `after`/`before` and ETags, single activities and streams.
+    """
+
+    def __init__(self, activities_per_athlete: int = 30, short_limit: int = 100_000,
+                 daily_limit: int = 1_000_000, **behavior):
+        super().__init__(**behavior)
+        self.activities_per_athlete = activities_per_athlete
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.short_usage = 0
+        self.daily_usage = 0
+        self._short_window = self._daily_window = None
+        self._histories: Dict[str, List[Dict[str, Any]]] = {}
+        self.app.add_api_route("/oauth/token", self.token, methods=["POST"])
+        self.app.add_api_route("/api/v3/athlete/activities", self.activities)
+        self.app.add_api_route("/api/v3/activities/{activity_id}", self.activity)
+        self.app.add_api_route("/api/v3/activities/{activity_id}/streams", self.streams)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "short_usage": self.short_usage, "daily_usage": self.daily_usage}
+
+    def over_quota(self) -> bool:
+        # Strava's windows start at the quarter hour and at midnight UTC
+        now = time.time()
+        short_window, daily_window = int(now // SHORT_WINDOW_SECONDS), int(now // DAY_SECONDS)
+        if short_window != self._short_window:
+            self._short_window, self.short_usage = short_window, 0
+        if daily_window != self._daily_window:
+            self._daily_window, self.daily_usage = daily_window, 0
+        if self.short_usage >= self.short_limit or self.daily_usage >= self.daily_limit:
+            return True
+        self.short_usage += 1
+        self.daily_usage += 1
+        return False
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": f"{self.short_limit},{self.daily_limit}",
+            "X-RateLimit-Usage": f"{self.short_usage},{self.daily_usage}",
+        }
+
+    async def _api_reply(self, body: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+        status_code = self.fault()
+        if status_code is not None:
+            body = {"message": "Rate Limit Exceeded" if status_code == 429 else "Service Unavailable", "errors": []}
+        return await self.reply(body, status_code or 200, {**self._headers(), **(headers or {})})
+
+    def history(self, access_token: str) -> List[Dict[str, Any]]:
+        """
+        The athlete's activities, newest first, one every day or two going back from today.
+        """
+        history = self._histories.get(access_token)
+        if history is None:
+            seed = int(hashlib.sha256(access_token.encode()).hexdigest()[:12], 16)
+            rng = random.Random(seed)
+            start = datetime.now(timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+            history = []
+            for index in range(self.activities_per_athlete):
+                start -= timedelta(days=rng.choice((1, 1, 2)), minutes=rng.randint(-60, 60))
+                sport = rng.choice(("Run", "Run", "Run", "Ride", "Swim"))
+                moving_time = rng.randint(1500, 5400)
+                speed = {"Run": 3.2, "Ride": 8.0, "Swim": 0.9}[sport] * rng.uniform(0.85, 1.15)
+                history.append({
+                    "id": seed % 10 ** 9 * 10 ** 4 + index,
+                    "name": f"{'Morning' if start.hour < 12 else 'Evening'} {sport}",
+                    "type": sport,
+                    "sport_type": sport,
+                    "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "start_date_local": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "distance": round(moving_time * speed, 1),
+                    "moving_time": moving_time,
+                    "elapsed_time": moving_time + rng.randint(0, 600),
+                    "total_elevation_gain": round(rng.uniform(0, 300), 1),
+                    "average_speed": round(speed, 3),
+                    "average_heartrate": round(rng.uniform(125, 165), 1),
+                    "max_heartrate": rng.randint(165, 190),
+                })
+            self._histories[access_token] = history
+        return history
+
+    @staticmethod
+    def _access_token(request: Request) -> str:
+        return request.headers.get("Authorization", "").removeprefix("Bearer ")
+
+    async def token(self, request: Request):
+        form = await request.form()
+        grant = form.get("code") or form.get("refresh_token") or uuid.uuid4().hex
+        status_code = self.fault()
+        if status_code is not None:
+            return await self.reply({"message": "Bad Request", "errors": []}, status_code)
+        return await self.reply({
+            "token_type": "Bearer",
+            "access_token": f"access-{grant}",
+            "refresh_token": f"refresh-{grant}",
+            "expires_at": int(time.time()) + 6 * 3600,
+            "expires_in": 6 * 3600,
+            "athlete": {"id": int(hashlib.sha256(grant.encode()).hexdigest()[:8], 16)},
+        })
+
+    async def activities(self, request: Request, page: int = 1, per_page: int = 30,
+                         after: Optional[int] = None, before: Optional[int] = None):
+        activities = self.history(self._access_token(request))
+        if after is not None or before is not None:
+            activities = [activity for activity in activities
+                          if (after is None or _epoch(activity) > after) and (before is None or _epoch(activity) < before)]
+        # Strava returns `after` queries oldest first
+        if after is not None:
+            activities = activities[::-1]
+        body = activities[(page - 1) * per_page:page * per_page]
+        etag = '"' + hashlib.sha1(json.dumps(body).encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            if self.fault() is None:
+                await self.wait()
+                return Response(status_code=304, headers={**self._headers(), "ETag": etag})
+            return await self.reply({"message": "Service Unavailable", "errors": []}, 503, self._headers())
+        return await self._api_reply(body, {"ETag": etag})
+
+    async def activity(self, request: Request, activity_id: int):
+        for activity in self.history(self._access_token(request)):
+            if activity["id"] == activity_id:
+                return await self._api_reply(activity)
+        return await self.reply({"message": "Record Not Found", "errors": []}, 404, self._headers())
+
+    async def streams(self, request: Request, activity_id: int, keys: str = "time"):
+        activity = next((activity for activity in self.history(self._access_token(request))
+                         if activity["id"] == activity_id), None)
+        points = (activity or {}).get("moving_time", 1800) // 5
+        rng = random.Random(activity_id)
+        heartrate = [int(130 + 20 * math.sin(i / 60) + rng.uniform(-5, 5)) for i in range(points)]
+        generators = {
+            "time": lambda: [5 * i for i in range(points)],
+            "distance": lambda: [round(15.5 * i, 1) for i in range(points)],
+            "heartrate": lambda: heartrate,
+            "velocity_smooth": lambda: [round(3.1 + rng.uniform(-0.3, 0.3), 2) for _ in range(points)],
+            "altitude": lambda: [round(40 + 10 * math.sin(i / 90), 1) for i in range(points)],
+            "cadence": lambda: [rng.randint(82, 92) for _ in range(points)],
+            "latlng": lambda: [[48.85 + i * 1e-5, 2.35 + i * 1e-5] for i in range(points)],
+        }
+        body = {key: {"data": generators[key](), "series_type": "time", "original_size": points,
+                      "resolution": "high"}
+                for key in keys.split(",") if key in generators}
+        return await self._api_reply(body, {})
+
+
+def _epoch(activity: Dict[str, Any]) -> int:
+    return int(datetime.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ")
+               .replace(tzinfo=timezone.utc).timestamp())
+
+
+class FakeInference(FakeUpstream):
+    """
+    An OpenAI-compatible chat completions endpoint, as served by Inference Endpoints and TGI.
+    `latency` is the time to the first token, the rest of the completion takes
+    `completion_tokens / tokens_per_second`.
+    """
+
+    def __init__(self, completion_tokens: int = 150, tokens_per_second: float = 200.0,
+                 requests_per_minute: int = 0, **behavior):
+        super().__init__(**behavior)
+        self.completion_tokens = completion_tokens
+        self.tokens_per_second = tokens_per_second
+        self.requests_per_minute = requests_per_minute
+        self._recent = deque()
+        self.app.add_api_route("/v1/chat/completions", self.chat_completions, methods=["POST"])
+
+    def over_quota(self) -> bool:
+        if not self.requests_per_minute:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.requests_per_minute:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _tokens(self) -> List[str]:
+        return [WORKOUT_WORDS[i % len(WORKOUT_WORDS)] + " " for i in range(self.completion_tokens)]
+
+    def _plan(self) -> str:
+        """
+        A workout plan in the app's WorkoutPlan schema, as a model constrained to it
+        returns, about `completion_tokens` long.
+        """
+        words = itertools.cycle(WORKOUT_WORDS)
+
+        def text(count: int) -> str:
+            return " ".join(next(words) for _ in range(count))
+
+        days = [{"title": f"Day {day}",
+                 "exercises": [{"name": text(2), "sets": 3, "reps": "10", "muscles": ["Legs"], "purpose": text(8)}
+                               for _ in range(3)]}
+                for day in range(1, max(1, min(7, self.completion_tokens // 50)) + 1)]
+        return json.dumps({"summary": text(20), "warm_up": text(8), "days": days, "cool_down": text(8),
+                           "tips": [text(8)]})
+
+    async def chat_completions(self, request: Request):
+        payload = await request.json()
+        status_code = self.fault()
+        if status_code is not None:
+            message = "Rate limit reached" if status_code == 429 else "Model is overloaded"
+            return await self.reply({"error": message}, status_code)
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in payload["messages"])
+        created = int(time.time())
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        tokens = self._tokens()
+        generation = len(tokens) / self.tokens_per_second
+        # huggingface_hub sends a json_schema format on as TGI's `json_object` with the schema as its value
+        structured = (payload.get("response_format") or {}).get("type") in ("json_schema", "json_object")
+
+        if payload.get("stream"):
+            async def chunks():
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    await self.wait()
+                    for token in tokens:
+                        await asyncio.sleep(1 / self.tokens_per_second)
+                        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                                 "model": payload.get("model"),
+                                 "choices": [{"index": 0, "delta": {"role": "assistant", "content": token},
+                                              "finish_reason": None}]}
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    self.in_flight -= 1
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.wait()
+            await asyncio.sleep(generation)
+        finally:
+            self.in_flight -= 1
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant",
+                                                 "content": self._plan() if structured else "".join(tokens).strip()},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                      "total_tokens": prompt_tokens + len(tokens)},
+        })
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--strava-latency", type=float, default=0.08, help="median Strava latency in seconds")
+    parser.add_argument("--strava-short-limit", type=int, default=100_000, help="Strava requests per 15 minutes")
+    parser.add_argument("--strava-daily-limit", type=int, default=1_000_000, help="Strava requests per day")
+    parser.add_argument("--activities", type=int, default=30, help="activities in each athlete's history")
+    parser.add_argument("--ai-latency", type=float, default=0.3, help="median time to first token in seconds")
+    parser.add_argument("--ai-tokens", type=int, default=150, help="tokens per completion")
+    parser.add_argument("--ai-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--ai-rpm", type=int, default=0, help="AI requests per minute, 0 for no limit")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="spread of the log-normal latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests failed with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of upstream requests answered 429")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def build_fakes(args: argparse.Namespace):
+    behavior = dict(latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                    throttle_rate=args.throttle_rate, seed=args.seed)
+    strava = FakeStrava(activities_per_athlete=args.activities, short_limit=args.strava_short_limit,
+                        daily_limit=args.strava_daily_limit, latency=args.strava_latency, **behavior)
+    inference = FakeInference(completion_tokens=args.ai_tokens, tokens_per_second=args.ai_tokens_per_second,
+                              requests_per_minute=args.ai_rpm, latency=args.ai_latency, **behavior)
+    return strava, inference
+
+
+async def serve(strava: FakeStrava, inference: FakeInference, strava_port: int, ai_port: int) -> None:
+    # Keep idle connections open like Strava's and Hugging Face's load balancers, uvicorn's 5s
+    # default races the clients' pools and resets connections they are about to reuse
+    servers = [uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=port, log_level="warning",
+                                             timeout_keep_alive=120))
+               for fake, port in ((strava, strava_port), (inference, ai_port))]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strava-port", type=int, default=8101)
+    parser.add_argument("--ai-port", type=int, default=8102)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    strava, inference = build_fakes(args)
+    asyncio.run(serve(strava, inference, args.strava_port, args.ai_port))
+
+
+if __name__ == "__main__":
+    main()
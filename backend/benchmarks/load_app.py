@@ -0,0 +1,54 @@
+"""
+The API wired to local stand-ins for load tests, with nothing leaving the machine.
+
+- Firestore is the in-process fake of the test suite, with BENCH_FIRESTORE_LATENCY
+  seconds per call, or the Firestore emulator when FIRESTORE_EMULATOR_HOST is set.
+- Firebase ID tokens of the form "bench:<uid>" are accepted without a signature check.
+- Strava and the AI service are whatever STRAVA_API_BASE_URL, STRAVA_OAUTH_URL and
+  AI_BASE_URL point at, normally the servers of `benchmarks.fakes`.
+
+Started by `benchmarks.bench_load`, or by hand (from the `backend` directory):
+    uvicorn benchmarks.load_app:app --port 8100
+"""
+import os
+import sys
+import time
+
+import firebase_admin
+from firebase_admin import auth
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'test')))
+
+from app import firebase_setup  # noqa: E402
+
+BENCH_FIRESTORE_LATENCY = float(os.getenv("BENCH_FIRESTORE_LATENCY", "0.01"))
+BENCH_PROJECT_ID = os.getenv("BENCH_PROJECT_ID", "versionup-bench")
+BENCH_TOKEN_PREFIX = "bench:"
+
+
+def create_firestore():
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore
+        return firestore.Client(project=BENCH_PROJECT_ID, credentials=AnonymousCredentials())
+    from fake_firestore import FakeFirestore
+    return FakeFirestore(latency=BENCH_FIRESTORE_LATENCY)
+
+
+def verify_bench_token(token: str, *args, **kwargs) -> dict:
+    if not token.startswith(BENCH_TOKEN_PREFIX):
+        raise auth.InvalidIdTokenError("Not a benchmark token.")
+    now = int(time.time())
+    return {"uid": token[len(BENCH_TOKEN_PREFIX):], "iat": now, "exp": now + 3600}
+
+
+# An app without credentials, token verification is the only Firebase feature in use and it is replaced
+if not firebase_admin._apps:
+    firebase_admin.initialize_app(options={"projectId": BENCH_PROJECT_ID})
+auth.verify_id_token = verify_bench_token
+firebase_setup._db = create_firestore()
+
+from app import main  # noqa: E402
+
+app = main.app
@@ -0,0 +1,68 @@
+"""
+Nightly pre-generation of next-day workout suggestions.
+
+Users who asked for a suggestion in the last `--active-days` days get one generated
+for their last request, from their synced activities and training metrics, and
+stored in their ready slot, which /ai/suggest_workout serves at once while it is
+fresh. Requests go through a pool of `--workers` under `--requests-per-minute`,
+kept below the inference provider's limit since the interactive endpoint shares it.
+
+The batch of a day is checkpointed in Firestore after every page of users: running
+the job again with the same `--batch-id` resumes it, `--restart` starts it over.
+Progress and throughput are logged every BATCH_PROGRESS_SECONDS, and printed as
+a summary at the end.
+
+Usage (from the `backend` directory, or as the command of a Cloud Run job):
+    python -m jobs.pregenerate_suggestions --workers 4 --requests-per-minute 30
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.telemetry import configure_logging  # noqa: E402
+from services.suggestion_batch import (BATCH_ACTIVE_DAYS, BATCH_REQUESTS_PER_MINUTE,  # noqa: E402
+                                       BATCH_WORKERS, SuggestionBatch)
+
+
+async def run(args) -> int:
+    # Imported here so --help works without the app's environment
+    from app import main
+    from app.firebase_setup import initialize_firebase
+
+    initialize_firebase()
+
+    async def generate(request, is_strava_connected, activities, metrics_str):
+        content, _, _ = await main.complete_suggestion(request, is_strava_connected, activities, metrics_str)
+        return content
+
+    batch = SuggestionBatch(main.firestore_db, main.activity_store, main.ready_suggestions, generate,
+                            main.load_suggestion_metrics, activities_per_user=main.NBR_OF_ACTIVITIES,
+                            workers=args.workers, requests_per_minute=args.requests_per_minute,
+                            active_days=args.active_days)
+    progress = await batch.run(batch_id=args.batch_id, resume=not args.restart, max_users=args.max_users)
+    print(f"Batch {progress.batch_id} {progress.status}: {progress.processed} users, "
+          f"{progress.generated} generated, {progress.skipped} skipped, {progress.failed} failed, "
+          f"{progress.throttled} throttled in {progress.elapsed_seconds:.0f} s "
+          f"({progress.per_minute:.1f} suggestions/min)")
+    return 1 if progress.failed and not progress.generated else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-id", help="Batch to run or resume, the current UTC date by default")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of the batch")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--requests-per-minute", type=float, default=BATCH_REQUESTS_PER_MINUTE)
+    parser.add_argument("--active-days", type=int, default=BATCH_ACTIVE_DAYS)
+    parser.add_argument("--max-users", type=int, help="Stop after this many users, the next run resumes")
+    args = parser.parse_args()
+
+    configure_logging()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from app.clients import strava_client
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+STRAVA_CACHE_TTL_SECONDS = float(os.getenv("STRAVA_CACHE_TTL_SECONDS", "300"))
+STRAVA_CACHE_MAX_BYTES = int(os.getenv("STRAVA_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+STRAVA_CACHE_FIRESTORE = os.getenv("STRAVA_CACHE_FIRESTORE", "false").lower() in ("1", "true", "yes")
+STRAVA_CACHE_COLLECTION = "strava_activity_cache"
+
+
+@dataclass
+class CacheEntry:
+    activities: List[Dict[str, Any]]
+    etag: Optional[str]
+    fetched_at: float
+    size: int
+
+
+def athlete_cache_key(user_uid: str, strava_tokens: Dict[str, Any]) -> str:
+    """
+    Keys the cache by Strava athlete id, falling back to the Firebase uid.
+    """
+    athlete_id = (strava_tokens.get("athlete") or {}).get("id")
+    return f"athlete-{athlete_id}" if athlete_id else f"user-{user_uid}"
+
+
+class ActivityCache:
+    """
+    Per-athlete cache in front of the Strava activities endpoint.
+
+    Fresh entries are served without calling Strava. Stale entries are revalidated
+    with their ETag, so an unchanged list costs a 304 instead of a full payload.
+    The in-memory tier is an LRU bounded by the approximate JSON size of the
+    cached activities; the optional Firestore tier survives instance restarts.
+    Registered as an ActivityStore listener, a user's entries are dropped as soon
+    as their stored activities change.
+    """
+
+    def __init__(self, ttl_seconds: float = STRAVA_CACHE_TTL_SECONDS,
+                 max_bytes: int = STRAVA_CACHE_MAX_BYTES, firestore_db=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.firestore_db = firestore_db
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._size = 0
+        # Firebase uid to the athlete key its entries are cached under
+        self._athletes: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(athlete_key: str, per_page: int) -> str:
+        return f"{athlete_key}:{per_page}"
+
+    async def get_activities(self, athlete_key: str, access_token: str, per_page: int,
+                             user_uid: Optional[str] = None) -> List[Dict[str, Any]]:
+        if user_uid is not None:
+            self._athletes[user_uid] = athlete_key
+        key = self._key(athlete_key, per_page)
+        entry = self._entries.get(key)
+        if entry is None and self.firestore_db is not None:
+            entry = await self._load_persisted(key)
+            if entry is not None:
+                self._store(key, entry)
+
+        if entry is not None and time.time() - entry.fetched_at < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.activities
+
+        self.misses += 1
+        activities, etag = await strava_client.get_activities_if_modified(
+            access_token=access_token, per_page=per_page,
+            etag=entry.etag if entry is not None else None)
+
+        if activities is None:
+            # 304 Not Modified: the cached list is still current
+            self.revalidations += 1
+            activities = entry.activities
+            etag = entry.etag
+
+        entry = CacheEntry(activities=activities, etag=etag, fetched_at=time.time(),
+                           size=len(json.dumps(activities, separators=(",", ":"))))
+        self._store(key, entry)
+        if self.firestore_db is not None:
+            await self._persist(key, entry)
+        return activities
+
+    def invalidate(self, athlete_key: str) -> List[str]:
+        """
+        Drops the athlete's in-memory entries. Returns their keys.
+        """
+        prefix = f"{athlete_key}:"
+        keys = [k for k in self._entries if k.startswith(prefix)]
+        for key in keys:
+            self._size -= self._entries.pop(key).size
+        return keys
+
+    async def on_activities(self, user_uid: str, activities: List[Dict[str, Any]]) -> None:
+        await self._invalidate_user(user_uid)
+
+    async def on_activities_deleted(self, user_uid: str, activity_ids: List[int]) -> None:
+        await self._invalidate_user(user_uid)
+
+    async def _invalidate_user(self, user_uid: str) -> None:
+        keys = self.invalidate(self._athletes.get(user_uid, f"user-{user_uid}"))
+        if self.firestore_db is not None:
+            # Otherwise the persisted copy would be served again as fresh
+            for key in keys:
+                await self._forget_persisted(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous.size
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self.evictions += 1
+
+    async def _load_persisted(self, key: str) -> Optional[CacheEntry]:
+        try:
+            doc_ref = self.firestore_db.collection(STRAVA_CACHE_COLLECTION).document(key)
+            with span("firestore", "activity_cache.get"):
+                doc = await run_in_threadpool(doc_ref.get)
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            return CacheEntry(activities=data["activities"], etag=data.get("etag"),
+                              fetched_at=data["fetched_at"], size=data.get("size", 0))
+        except Exception as e:
+            logger.error(f"Error reading activity cache from Firestore: {e}")
+            return None
+
+    async def _forget_persisted(self, key: str) -> None:
+        try:
+            doc_ref = self.firestore_db.collection(STRAVA_CACHE_COLLECTION).document(key)
+            with span("firestore", "activity_cache.delete"):
+                await run_in_threadpool(doc_ref.delete)
+        except Exception as e:
+            logger.error(f"Error deleting activity cache from Firestore: {e}")
+
+    async def _persist(self, key: str, entry: CacheEntry) -> None:
+        try:
+            doc_ref = self.firestore_db.collection(STRAVA_CACHE_COLLECTION).document(key)
+            with span("firestore", "activity_cache.set"):
+                await run_in_threadpool(doc_ref.set, {
+                    "activities": entry.activities,
+                    "etag": entry.etag,
+                    "fetched_at": entry.fetched_at,
+                    "size": entry.size,
+                })
+        except Exception as e:
+            logger.error(f"Error writing activity cache to Firestore: {e}")
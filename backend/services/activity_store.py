@@ -0,0 +1,206 @@
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Firestore caps a batched write at 500 operations
+MAX_BATCH_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_activity_cursor(key: Tuple[int, str]) -> str:
+    """
+    Opaque page cursor holding the (start_ts, id) sort key of the last activity on a page.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_activity_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        start_ts, activity_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(start_ts), str(activity_id)
+    except Exception:
+        raise InvalidCursor(cursor)
+
+
+def activity_start_ts(activity: Dict[str, Any]) -> int:
+    """
+    Returns the start time of a Strava activity as an epoch timestamp.
+    """
+    start_date = activity.get("start_date")
+    if not start_date:
+        return 0
+    return int(datetime.fromisoformat(start_date.replace("Z", "+00:00")).timestamp())
+
+
+class ActivityStore:
+    """
+    Stores synced Strava activities under users/{uid}/activities/{activity_id},
+    with the sync progress kept in the `strava_sync` field of the user document.
+    """
+
+    def __init__(self, firestore_db):
+        self.firestore_db = firestore_db
+        self._listeners: List[Callable[[str, List[Dict[str, Any]]], Awaitable[None]]] = []
+        self._delete_listeners: List[Callable[[str, List[int]], Awaitable[None]]] = []
+        self._sync_listeners: List[Callable[[str, Dict[str, Any]], Awaitable[None]]] = []
+        self._notifications = set()
+
+    def add_listener(self, listener: Callable[[str, List[Dict[str, Any]]], Awaitable[None]]) -> None:
+        """
+        Registers a coroutine called in the background with (uid, activities) after every upsert.
+        """
+        self._listeners.append(listener)
+
+    def add_delete_listener(self, listener: Callable[[str, List[int]], Awaitable[None]]) -> None:
+        """
+        Registers a coroutine called in the background with (uid, activity ids) after every delete.
+        """
+        self._delete_listeners.append(listener)
+
+    def add_sync_listener(self, listener: Callable[[str, Dict[str, Any]], Awaitable[None]]) -> None:
+        """
+        Registers a coroutine called in the background with (uid, updated fields) after every
+        update of the sync progress.
+        """
+        self._sync_listeners.append(listener)
+
+    async def _notify(self, listener, user_uid: str, payload) -> None:
+        try:
+            await listener(user_uid, payload)
+        except Exception as e:
+            logger.error(f"Error notifying activity listener: {e}")
+
+    def _notify_all(self, listeners, user_uid: str, payload) -> None:
+        # Keep writers fast, listeners such as analytics run after the write returns
+        for listener in listeners:
+            task = asyncio.create_task(self._notify(listener, user_uid, payload))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
+
+    def _user_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid)
+
+    def _activities_ref(self, user_uid: str):
+        return self._user_ref(user_uid).collection('activities')
+
+    async def find_user_by_athlete(self, athlete_id: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Returns (uid, user data) of the user connected to the given Strava athlete.
+        """
+        query = (self.firestore_db.collection('users')
+                 .where('strava_tokens.athlete.id', '==', athlete_id)
+                 .limit(1))
+
+        def read():
+            for doc in query.stream():
+                return doc.id, doc.to_dict()
+            return None
+
+        with span("firestore", "users.query"):
+            return await run_in_threadpool(read)
+
+    async def list_activities_after(self, user_uid: str, limit: int,
+                                    after: Optional[Tuple[int, str]] = None
+                                    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, str]]]:
+        """
+        Keyset-paginated read for full scans, resuming after the (start_ts, id) of the previous page.
+        Returns the page and the key to resume from, None on the last page.
+        """
+        query = (self._activities_ref(user_uid)
+                 .order_by('start_ts', direction='DESCENDING')
+                 .order_by('__name__', direction='DESCENDING')
+                 .limit(limit))
+        if after is not None:
+            query = query.start_after(list(after))
+
+        def read():
+            activities, last_key = [], None
+            for doc in query.stream():
+                activity = doc.to_dict()
+                last_key = (activity.pop('start_ts', 0), doc.id)
+                activities.append(activity)
+            return activities, last_key
+
+        with span("firestore", "activities.query"):
+            activities, last_key = await run_in_threadpool(read)
+        return activities, last_key if len(activities) == limit else None
+
+    async def get_sync_state(self, user_uid: str) -> Dict[str, Any]:
+        with span("firestore", "users.get"):
+            user_doc = await run_in_threadpool(self._user_ref(user_uid).get)
+        if not user_doc.exists:
+            return {}
+        return (user_doc.to_dict() or {}).get('strava_sync', {})
+
+    async def update_sync_state(self, user_uid: str, **state) -> None:
+        with span("firestore", "users.set"):
+            await run_in_threadpool(self._user_ref(user_uid).set, {'strava_sync': state}, merge=True)
+        self._notify_all(self._sync_listeners, user_uid, state)
+
+    async def clear_strava_tokens(self, user_uid: str) -> None:
+        with span("firestore", "users.set"):
+            await run_in_threadpool(self._user_ref(user_uid).set, {'strava_tokens': None}, merge=True)
+
+    async def upsert_activities(self, user_uid: str, activities: Iterable[Dict[str, Any]]) -> int:
+        activities = list(activities)
+
+        def write():
+            activities_ref = self._activities_ref(user_uid)
+            for start in range(0, len(activities), MAX_BATCH_SIZE):
+                batch = self.firestore_db.batch()
+                for activity in activities[start:start + MAX_BATCH_SIZE]:
+                    batch.set(activities_ref.document(str(activity['id'])),
+                              {**activity, 'start_ts': activity_start_ts(activity)})
+                batch.commit()
+
+        if activities:
+            with span("firestore", "activities.write"):
+                await run_in_threadpool(write)
+            self._notify_all(self._listeners, user_uid, activities)
+        return len(activities)
+
+    async def delete_activity(self, user_uid: str, activity_id: int) -> None:
+        with span("firestore", "activities.delete"):
+            await run_in_threadpool(self._activities_ref(user_uid).document(str(activity_id)).delete)
+        self._notify_all(self._delete_listeners, user_uid, [activity_id])
+
+    async def list_activities(self, user_uid: str, per_page: int,
+                              cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns a page of activities, newest first, and the cursor of the next page, None on the last page.
+        Pages resume after the previous page's sort key, Firestore would bill every document an offset skips.
+        """
+        after = decode_activity_cursor(cursor) if cursor is not None else None
+        # One extra document tells whether another page follows
+        query = (self._activities_ref(user_uid)
+                 .order_by('start_ts', direction='DESCENDING')
+                 .order_by('__name__', direction='DESCENDING')
+                 .limit(per_page + 1))
+        if after is not None:
+            query = query.start_after(list(after))
+
+        def read():
+            activities, keys = [], []
+            for doc in query.stream():
+                activity = doc.to_dict()
+                keys.append((activity.pop('start_ts', 0), doc.id))
+                activities.append(activity)
+            return activities, keys
+
+        with span("firestore", "activities.query"):
+            activities, keys = await run_in_threadpool(read)
+        if len(activities) <= per_page:
+            return activities, None
+        return activities[:per_page], encode_activity_cursor(keys[per_page - 1])
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.clients import strava_client
+
+logger = logging.getLogger(__name__)
+
+STRAVA_STREAMS_DIR = os.getenv("STRAVA_STREAMS_DIR", os.path.join(tempfile.gettempdir(), "versionup-streams"))
+# Bytes of streams kept on disk, least recently used activities are evicted past it.
+# The default directory is in memory on Cloud Run, the budget bounds what it takes.
+STRAVA_STREAMS_MAX_BYTES = int(os.getenv("STRAVA_STREAMS_MAX_BYTES", str(256 * 1024 * 1024)))
+STRAVA_STREAMS_CONCURRENCY = int(os.getenv("STRAVA_STREAMS_CONCURRENCY", "4"))
+# Activities whose streams are fetched per sync, newest first
+STRAVA_STREAMS_SYNC_LIMIT = int(os.getenv("STRAVA_STREAMS_SYNC_LIMIT", "200"))
+
+# Stream type -> storage dtype, the narrowest type that holds Strava's values
+STREAM_DTYPES = {
+    "time": np.int32,
+    "distance": np.float32,
+    "altitude": np.float32,
+    "velocity_smooth": np.float32,
+    "grade_smooth": np.float32,
+    "heartrate": np.int16,
+    "cadence": np.int16,
+    "watts": np.int16,
+    "temp": np.int8,
+    "moving": np.bool_,
+    "latlng": np.float32,
+}
+
+
+def to_array(stream_type: str, data: List[Any]) -> np.ndarray:
+    """
+    Converts a stream's JSON values to its storage dtype, gaps become 0.
+    """
+    dtype = STREAM_DTYPES[stream_type]
+    if dtype is np.bool_:
+        return np.asarray(data, dtype=np.bool_)
+    values = np.asarray(data, dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        values = np.nan_to_num(values).round()
+    return values.astype(dtype)
+
+
+class StreamStore:
+    """
+    Activity streams on disk, one .npy file per stream under {root}/{uid}/{activity_id}/.
+    Loads memory-map the files, so metrics over a long history only page in what they read.
+
+    The stored activities and their sizes are indexed in memory, read from disk on first
+    use. Past `max_bytes` the least recently saved or loaded activities are deleted, an
+    evicted activity's streams are fetched again by the next sync that needs them.
+    """
+
+    def __init__(self, root: str = STRAVA_STREAMS_DIR, max_bytes: int = STRAVA_STREAMS_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._sizes: Optional["OrderedDict[Tuple[str, int], int]"] = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _activity_dir(self, user_uid: str, activity_id: int) -> str:
+        return os.path.join(self.root, user_uid, str(activity_id))
+
+    @staticmethod
+    def _dir_bytes(directory: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _index(self) -> "OrderedDict[Tuple[str, int], int]":
+        # Called with the lock held. Oldest first, by modification time
+        if self._sizes is None:
+            found = []
+            if os.path.isdir(self.root):
+                for user_uid in os.listdir(self.root):
+                    user_dir = os.path.join(self.root, user_uid)
+                    if not os.path.isdir(user_dir):
+                        continue
+                    for name in os.listdir(user_dir):
+                        directory = os.path.join(user_dir, name)
+                        if name.isdigit() and os.path.isdir(directory):
+                            found.append((os.path.getmtime(directory), (user_uid, int(name)),
+                                          self._dir_bytes(directory)))
+            self._sizes = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._bytes = sum(self._sizes.values())
+        return self._sizes
+
+    def _touch(self, user_uid: str, activity_id: int) -> None:
+        with self._lock:
+            sizes = self._index()
+            if (user_uid, activity_id) in sizes:
+                sizes.move_to_end((user_uid, activity_id))
+
+    def _record(self, user_uid: str, activity_id: int, size: int) -> None:
+        with self._lock:
+            sizes = self._index()
+            self._bytes += size - sizes.pop((user_uid, activity_id), 0)
+            sizes[(user_uid, activity_id)] = size
+            while self._bytes > self.max_bytes and len(sizes) > 1:
+                (evicted_uid, evicted_id), evicted_size = sizes.popitem(last=False)
+                shutil.rmtree(self._activity_dir(evicted_uid, evicted_id), ignore_errors=True)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stored_bytes(self) -> int:
+        with self._lock:
+            self._index()
+            return self._bytes
+
+    def has(self, user_uid: str, activity_id: int) -> bool:
+        with self._lock:
+            return (user_uid, activity_id) in self._index()
+
+    def save(self, user_uid: str, activity_id: int, streams: Dict[str, np.ndarray]) -> None:
+        target = self._activity_dir(user_uid, activity_id)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write next to the target and rename, readers never see a half-written activity
+        staging = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".staging-")
+        try:
+            for stream_type, values in streams.items():
+                np.save(os.path.join(staging, f"{stream_type}.npy"), values, allow_pickle=False)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self._record(user_uid, activity_id, self._dir_bytes(target))
+
+    def load(self, user_uid: str, activity_id: int,
+             stream_types: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns read-only memory maps of the activity's streams, empty when none are stored.
+        """
+        directory = self._activity_dir(user_uid, activity_id)
+        if not os.path.isdir(directory):
+            return {}
+        self._touch(user_uid, activity_id)
+        available = {name[:-4] for name in os.listdir(directory) if name.endswith(".npy")}
+        wanted = available if stream_types is None else available & set(stream_types)
+        return {stream_type: np.load(os.path.join(directory, f"{stream_type}.npy"), mmap_mode="r")
+                for stream_type in sorted(wanted)}
+
+    def activity_ids(self, user_uid: str) -> List[int]:
+        directory = os.path.join(self.root, user_uid)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name) for name in os.listdir(directory) if name.isdigit())
+
+
+class ActivityStreamService:
+    """
+    Fetches activity streams from Strava and keeps them in the StreamStore.
+    Fetches run concurrently on the background rate-limit lane, so they only
+    use quota interactive requests leave over.
+    """
+
+    def __init__(self, store: StreamStore, concurrency: int = STRAVA_STREAMS_CONCURRENCY):
+        self.store = store
+        self.concurrency = concurrency
+
+    async def fetch(self, user_uid: str, access_token: str, activity_id: int) -> bool:
+        streams = await strava_client.get_activity_streams(access_token, activity_id, list(STREAM_DTYPES))
+        arrays = {stream_type: to_array(stream_type, stream["data"])
+                  for stream_type, stream in streams.items() if stream_type in STREAM_DTYPES}
+        # Saved even when empty, so activities without streams are not fetched again
+        await run_in_threadpool(self.store.save, user_uid, activity_id, arrays)
+        return bool(arrays)
+
+    async def fetch_missing(self, user_uid: str, access_token: str, activity_ids: Iterable[int]) -> int:
+        """
+        Fetches the streams of the given activities that are not stored yet.
+        Returns the number of activities fetched.
+        """
+        missing = [activity_id for activity_id in activity_ids if not self.store.has(user_uid, activity_id)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(activity_id):
+            async with semaphore:
+                try:
+                    await self.fetch(user_uid, access_token, activity_id)
+                    return True
+                except Exception as e:
+                    logger.error(f"Error fetching streams of activity {activity_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(fetch_one(activity_id) for activity_id in missing))
+        return sum(results)
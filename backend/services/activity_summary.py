@@ -0,0 +1,110 @@
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+
+# pandas is imported by the functions that use it, keeping it out of the app's cold start
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Strava activity fields kept for the prompt, renamed to what the coach needs
+SUMMARY_FIELDS = {
+    "sport_type": "sport",
+    "start_date_local": "date",
+    "distance": "distance_m",
+    "moving_time": "moving_s",
+    "total_elevation_gain": "elevation_m",
+    "average_heartrate": "avg_hr",
+    "max_heartrate": "max_hr",
+}
+
+# Heart rate used to scale training load when an activity has no HR data
+REFERENCE_HR = 140.0
+
+
+def training_load(moving_min, avg_hr):
+    """
+    Duration weighted by relative heart rate, a TRIMP-style load that degrades gracefully without HR.
+    """
+    return moving_min * (avg_hr.fillna(REFERENCE_HR) / REFERENCE_HR) ** 2
+
+
+def summarize_activities(activities: List[Dict[str, Any]]) -> "pd.DataFrame":
+    """
+    Reduces raw Strava activities to a few typed columns, newest first.
+    """
+    import pandas as pd
+
+    # Only pick the needed fields, raw activities carry dozens of columns and polylines
+    frame = pd.DataFrame(
+        {name: [a.get(field) for a in activities] for field, name in SUMMARY_FIELDS.items()})
+    frame["sport"] = frame["sport"].fillna(pd.Series([a.get("type") for a in activities], dtype=object))
+
+    frame["sport"] = frame["sport"].fillna("Workout").astype(str)
+    frame["date"] = pd.to_datetime(frame["date"], utc=True, errors="coerce").dt.tz_localize(None)
+    for column in ("distance_m", "moving_s", "elevation_m", "avg_hr", "max_hr"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+
+    frame["distance_km"] = frame["distance_m"].fillna(0) / 1000
+    frame["moving_min"] = frame["moving_s"].fillna(0) / 60
+    frame["load"] = training_load(frame["moving_min"], frame["avg_hr"])
+    frame = frame.drop(columns=["distance_m", "moving_s"])
+    return frame.sort_values("date", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def summarize_history(summary: "pd.DataFrame", weeks: int = 4) -> Dict[str, Any]:
+    """
+    Aggregates the summarized history: weekly volume, training load and a load trend.
+    """
+    dated = summary.dropna(subset=["date"])
+    if dated.empty:
+        return {"activities": int(len(summary)), "weekly": [], "load_trend_pct": None}
+
+    weekly = (dated.set_index("date")[["distance_km", "moving_min", "load", "sport"]]
+              .resample("W-MON", label="left", closed="left")
+              .agg({"distance_km": "sum", "moving_min": "sum", "load": "sum", "sport": "count"})
+              .tail(weeks))
+
+    loads = weekly["load"].to_numpy()
+    half = len(loads) // 2
+    previous, recent = loads[:half].sum(), loads[half:].sum()
+    trend = float((recent - previous) / previous * 100) if half and previous > 0 else None
+
+    return {
+        "activities": int(len(summary)),
+        "sports": dated["sport"].value_counts().to_dict(),
+        "weekly": [
+            {"week": week.strftime("%Y-%m-%d"), "sessions": int(count),
+             "distance_km": round(float(row.distance_km), 1),
+             "moving_min": int(round(row.moving_min)), "load": int(round(row.load))}
+            for week, row, count in zip(weekly.index, weekly.itertuples(), weekly["sport"].to_numpy())
+        ],
+        "load_trend_pct": None if trend is None else round(trend),
+    }
+
+
+def format_activity_context(activities: List[Dict[str, Any]], max_rows: int = 10) -> str:
+    """
+    Renders the activity history as a compact block of text for the LLM prompt.
+    """
+    if not activities:
+        return "No recent activities found."
+
+    summary = summarize_activities(activities)
+    history = summarize_history(summary)
+
+    rows = summary.head(max_rows)
+    dates = rows["date"].dt.strftime("%Y-%m-%d").fillna("unknown")
+    hr = np.where(rows["avg_hr"].notna(), " avg HR " + rows["avg_hr"].round().astype("Int64").astype(str), "")
+    elevation = np.where(rows["elevation_m"].fillna(0) > 0,
+                         " +" + rows["elevation_m"].fillna(0).round().astype(int).astype(str) + "m", "")
+    lines = (dates + " " + rows["sport"] + " " + rows["distance_km"].round(1).astype(str) + "km "
+             + rows["moving_min"].round().astype(int).astype(str) + "min" + elevation + hr)
+
+    weekly = "; ".join(f"{w['week']}: {w['sessions']} sessions, {w['distance_km']}km, "
+                       f"{w['moving_min']}min, load {w['load']}" for w in history["weekly"])
+    trend = history["load_trend_pct"]
+    return "\n".join([
+        *lines.tolist(),
+        f"Weekly volume: {weekly or 'n/a'}",
+        f"Training load trend: {'n/a' if trend is None else f'{trend:+d}%'}",
+    ])
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.clients import strava_client
+from services.activity_store import ActivityStore, activity_start_ts
+
+STRAVA_SYNC_PAGE_SIZE = int(os.getenv("STRAVA_SYNC_PAGE_SIZE", "100"))
+STRAVA_SYNC_MIN_INTERVAL_SECONDS = float(os.getenv("STRAVA_SYNC_MIN_INTERVAL_SECONDS", "60"))
+STRAVA_BACKFILL_CONCURRENCY = int(os.getenv("STRAVA_BACKFILL_CONCURRENCY", "4"))
+
+
+class ActivitySyncService:
+    """
+    Keeps the per-user activity store in step with Strava.
+
+    `sync_recent` only asks Strava for activities started after the newest stored one.
+    `backfill` walks the older history, fetching several pages concurrently.
+    """
+
+    def __init__(self, store: ActivityStore, page_size: int = STRAVA_SYNC_PAGE_SIZE,
+                 min_interval_seconds: float = STRAVA_SYNC_MIN_INTERVAL_SECONDS,
+                 backfill_concurrency: int = STRAVA_BACKFILL_CONCURRENCY):
+        self.store = store
+        self.page_size = page_size
+        self.min_interval_seconds = min_interval_seconds
+        self.backfill_concurrency = backfill_concurrency
+        self._backfilling = set()
+
+    async def sync_recent(self, user_uid: str, access_token: str, force: bool = False) -> int:
+        """
+        Fetches activities newer than the last synced one. Returns the number stored.
+        """
+        state = await self.store.get_sync_state(user_uid)
+        if not force and time.time() - state.get('last_synced_at', 0) < self.min_interval_seconds:
+            return 0
+
+        after_ts = state.get('newest_start_ts')
+        newest_ts = after_ts
+        oldest_ts = None
+        synced = 0
+        page = 1
+        while True:
+            activities = await strava_client.get_activities(
+                access_token=access_token, per_page=self.page_size, page=page, after=after_ts)
+            synced += await self.store.upsert_activities(user_uid, activities)
+            if activities:
+                start_ts = [activity_start_ts(a) for a in activities]
+                newest_ts = max([newest_ts or 0] + start_ts)
+                oldest_ts = min([oldest_ts or newest_ts] + start_ts)
+            # Without a cursor the first page is enough to seed the store, backfill does the rest
+            if after_ts is None or len(activities) < self.page_size:
+                break
+            page += 1
+
+        update: Dict[str, Any] = {'last_synced_at': time.time()}
+        if newest_ts:
+            update['newest_start_ts'] = newest_ts
+        if state.get('backfill_before_ts') is None and newest_ts:
+            # The history older than what this sync stored, the backfill does not fetch it again
+            update['backfill_before_ts'] = oldest_ts or newest_ts + 1
+        await self.store.update_sync_state(user_uid, **update)
+        return synced
+
+    async def backfill(self, user_uid: str, access_token: str) -> Optional[int]:
+        """
+        Pages through the history older than the first sync, `backfill_concurrency`
+        pages at a time, until Strava returns a short page. Returns the number stored,
+        None when the backfill had nothing to do: already complete or running.
+        """
+        if user_uid in self._backfilling:
+            return None
+        self._backfilling.add(user_uid)
+        try:
+            return await self._backfill(user_uid, access_token)
+        finally:
+            self._backfilling.discard(user_uid)
+
+    async def _backfill(self, user_uid: str, access_token: str) -> int:
+        state = await self.store.get_sync_state(user_uid)
+        if state.get('backfill_complete'):
+            return None
+
+        # Anchoring on `before` keeps page numbers stable while new activities arrive
+        before_ts = state.get('backfill_before_ts') or int(time.time())
+        page = state.get('backfill_next_page', 1)
+        synced = 0
+        while True:
+            pages = range(page, page + self.backfill_concurrency)
+            results = await asyncio.gather(*(
+                strava_client.get_activities(access_token=access_token, per_page=self.page_size,
+                                             page=p, before=before_ts,
+                                             priority=strava_client.BACKGROUND)
+                for p in pages))
+            activities = [activity for result in results for activity in result]
+            synced += await self.store.upsert_activities(user_uid, activities)
+            page += self.backfill_concurrency
+            done = any(len(result) < self.page_size for result in results)
+            await self.store.update_sync_state(
+                user_uid, backfill_before_ts=before_ts, backfill_next_page=page, backfill_complete=done)
+            if done:
+                return synced
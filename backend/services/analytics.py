@@ -0,0 +1,335 @@
+import copy
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.activity_summary import training_load
+
+# Imported lazily like in activity_summary, only the analytics computations need pandas
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Time constants of the fitness (chronic) and fatigue (acute) training load averages, in days
+CTL_DAYS = 42
+ATL_DAYS = 7
+
+HR_ZONE_NAMES = ["z1", "z2", "z3", "z4", "z5"]
+# Zone boundaries as a fraction of the highest heart rate seen
+HR_ZONE_BOUNDS = np.array([0.6, 0.7, 0.8, 0.9])
+# Used until an activity reports a max heart rate
+DEFAULT_HR_MAX = 190.0
+
+PACE_ZONE_NAMES = ["fast", "tempo", "steady", "easy", "recovery"]
+# Zone boundaries as a multiple of the median run pace, faster paces are lower
+PACE_ZONE_BOUNDS = np.array([0.86, 0.93, 1.0, 1.15])
+RUN_SPORTS = {"Run", "TrailRun", "VirtualRun"}
+
+BEST_EFFORTS = {"1k": 1000.0, "5k": 5000.0, "10k": 10000.0, "half_marathon": 21097.5, "marathon": 42195.0}
+
+# Stream gaps longer than this are pauses, not time in a zone
+MAX_SAMPLE_SECONDS = 30.0
+WEEKS_KEPT = 104
+MONTHS_KEPT = 36
+
+HISTORY_FIELDS = {
+    "id": "activity_id",
+    "sport_type": "sport",
+    "start_date": "start",
+    "distance": "distance_m",
+    "moving_time": "moving_s",
+    "total_elevation_gain": "elevation_m",
+    "average_heartrate": "avg_hr",
+    "max_heartrate": "max_hr",
+}
+
+StreamsLoader = Callable[[int], Dict[str, np.ndarray]]
+
+
+def history_frame(activities: List[Dict[str, Any]]) -> "pd.DataFrame":
+    """
+    Typed columns of an activity history, oldest first.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {name: pd.Series([a.get(field) for a in activities], dtype=object) for field, name in HISTORY_FIELDS.items()})
+    frame["sport"] = (frame["sport"].fillna(pd.Series([a.get("type") for a in activities], dtype=object))
+                      .fillna("Workout").astype(str))
+    frame["start"] = pd.to_datetime(frame["start"], utc=True, errors="coerce").dt.tz_localize(None)
+    for column in ("distance_m", "moving_s", "elevation_m", "avg_hr", "max_hr"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    frame["moving_s"] = frame["moving_s"].fillna(0)
+    frame["distance_m"] = frame["distance_m"].fillna(0)
+    frame["moving_min"] = frame["moving_s"] / 60
+    frame["load"] = training_load(frame["moving_min"], frame["avg_hr"])
+    return frame.dropna(subset=["start"]).sort_values("start", kind="stable").reset_index(drop=True)
+
+
+def _decay(days: int, time_constant: int) -> float:
+    return (1 - 1 / time_constant) ** days
+
+
+def _zone_minutes(values: np.ndarray, minutes: np.ndarray, bounds: np.ndarray, zones: int) -> np.ndarray:
+    return np.bincount(np.digitize(values, bounds), weights=minutes, minlength=zones)[:zones]
+
+
+def _stream_zone_minutes(streams: Dict[str, np.ndarray], hr_bounds: np.ndarray) -> Optional[np.ndarray]:
+    heartrate, seconds = streams.get("heartrate"), streams.get("time")
+    if heartrate is None or seconds is None or len(heartrate) != len(seconds) or len(seconds) < 2:
+        return None
+    dt = np.diff(np.asarray(seconds, dtype=np.float64), prepend=float(seconds[0]))
+    dt = np.where(dt > MAX_SAMPLE_SECONDS, 0, dt)
+    return _zone_minutes(np.asarray(heartrate), dt / 60, hr_bounds, len(HR_ZONE_NAMES))
+
+
+def best_effort_seconds(distance: np.ndarray, seconds: np.ndarray, target_m: float) -> Optional[float]:
+    """
+    Fastest time to cover `target_m` anywhere in an activity, from its distance and time streams.
+    """
+    if distance is None or seconds is None or len(distance) < 2 or len(distance) != len(seconds):
+        return None
+    covered = np.maximum.accumulate(np.asarray(distance, dtype=np.float64))
+    if covered[-1] - covered[0] < target_m:
+        return None
+    # For every start sample, the first sample at least `target_m` further along
+    end = np.searchsorted(covered, covered + target_m)
+    starts = np.nonzero(end < len(covered))[0]
+    if not starts.size:
+        return None
+    elapsed = np.asarray(seconds, dtype=np.float64)
+    return float((elapsed[end[starts]] - elapsed[starts]).min())
+
+
+def _record(value: float, row) -> Dict[str, Any]:
+    import pandas as pd
+
+    return {"value": round(float(value), 1), "activity_id": None if pd.isna(row.activity_id) else int(row.activity_id),
+            "date": row.start.strftime("%Y-%m-%d")}
+
+
+def _merge_best(current: Optional[Dict[str, Any]], candidate: Optional[Dict[str, Any]], lower: bool = False):
+    if candidate is None:
+        return current
+    if current is None:
+        return candidate
+    better = candidate["value"] < current["value"] if lower else candidate["value"] > current["value"]
+    return candidate if better else current
+
+
+def _add_bucket(buckets: Dict[str, Dict[str, float]], key: str, sessions: int, distance_km: float,
+                moving_min: float, load: float) -> None:
+    bucket = buckets.setdefault(key, {"sessions": 0, "distance_km": 0.0, "moving_min": 0.0, "load": 0.0})
+    bucket["sessions"] += int(sessions)
+    bucket["distance_km"] += float(distance_km)
+    bucket["moving_min"] += float(moving_min)
+    bucket["load"] += float(load)
+
+
+def _trim(buckets: Dict[str, Any], keep: int) -> Dict[str, Any]:
+    return {key: buckets[key] for key in sorted(buckets)[-keep:]}
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "activities": 0, "newest_start": None, "last_day": None, "ctl": 0.0, "atl": 0.0,
+        "hr_max": None, "median_pace_s_per_km": None,
+        "hr_zones_min": [0.0] * len(HR_ZONE_NAMES), "pace_zones_min": [0.0] * len(PACE_ZONE_NAMES),
+        "weekly": {}, "monthly": {}, "personal_bests": {}, "best_efforts": {},
+    }
+
+
+def _apply_frame(state: Dict[str, Any], frame: "pd.DataFrame", streams_loader: Optional[StreamsLoader]) -> None:
+    """
+    Folds activities that all start after `state["newest_start"]` into the state, in place.
+    """
+    import pandas as pd
+
+    if frame.empty:
+        return
+
+    # Fitness and fatigue: exponentially weighted daily load, days without activity decay it
+    daily = frame.set_index("start")["load"].resample("D").sum()
+    ctl, atl = state["ctl"], state["atl"]
+    last_day = pd.Timestamp(state["last_day"]) if state["last_day"] else None
+    for day, load in zip(daily.index, daily.to_numpy()):
+        gap = (day - last_day).days if last_day is not None else 1
+        if gap == 0:
+            # More load on the day already folded in
+            ctl += load / CTL_DAYS
+            atl += load / ATL_DAYS
+        else:
+            ctl = ctl * _decay(gap - 1, CTL_DAYS)
+            atl = atl * _decay(gap - 1, ATL_DAYS)
+            ctl += (load - ctl) / CTL_DAYS
+            atl += (load - atl) / ATL_DAYS
+        last_day = day
+    state["ctl"], state["atl"] = float(ctl), float(atl)
+    state["last_day"] = last_day.strftime("%Y-%m-%d")
+
+    # Volume
+    indexed = frame.set_index("start")
+    for period, key, format_ in (("W-MON", "weekly", "%Y-%m-%d"), ("MS", "monthly", "%Y-%m")):
+        grouped = indexed.resample(period, label="left", closed="left").agg(
+            {"distance_m": "sum", "moving_min": "sum", "load": "sum", "sport": "count"})
+        grouped = grouped[grouped["sport"] > 0]
+        for when, row in zip(grouped.index, grouped.itertuples()):
+            _add_bucket(state[key], when.strftime(format_), row.sport, row.distance_m / 1000, row.moving_min, row.load)
+    state["weekly"] = _trim(state["weekly"], WEEKS_KEPT)
+    state["monthly"] = _trim(state["monthly"], MONTHS_KEPT)
+
+    # Zones, from heart rate streams where stored, else the activity's average heart rate
+    hr_bounds = HR_ZONE_BOUNDS * (state["hr_max"] or DEFAULT_HR_MAX)
+    hr_zones = np.asarray(state["hr_zones_min"], dtype=np.float64)
+    with_hr = frame["avg_hr"].notna().to_numpy()
+    from_streams = np.zeros(len(frame), dtype=bool)
+    loaded = {}
+    if streams_loader is not None:
+        for position, activity_id in enumerate(frame["activity_id"].to_numpy()):
+            if pd.isna(activity_id):
+                continue
+            streams = streams_loader(int(activity_id))
+            if streams:
+                loaded[position] = streams
+            minutes = _stream_zone_minutes(streams, hr_bounds) if streams else None
+            if minutes is not None:
+                hr_zones += minutes
+                from_streams[position] = True
+    averaged = with_hr & ~from_streams
+    hr_zones += _zone_minutes(frame["avg_hr"].to_numpy()[averaged], frame["moving_min"].to_numpy()[averaged],
+                              hr_bounds, len(HR_ZONE_NAMES))
+    state["hr_zones_min"] = hr_zones.tolist()
+
+    runs = frame[frame["sport"].isin(RUN_SPORTS) & (frame["distance_m"] > 0) & (frame["moving_s"] > 0)]
+    if not runs.empty and state["median_pace_s_per_km"]:
+        pace = runs["moving_s"].to_numpy() / (runs["distance_m"].to_numpy() / 1000)
+        state["pace_zones_min"] = (np.asarray(state["pace_zones_min"]) + _zone_minutes(
+            pace, runs["moving_min"].to_numpy(), PACE_ZONE_BOUNDS * state["median_pace_s_per_km"],
+            len(PACE_ZONE_NAMES))).tolist()
+
+    # Personal bests per sport
+    for sport, activities in frame.groupby("sport"):
+        records = state["personal_bests"].setdefault(sport, {})
+        for name, column, scale in (("longest_km", "distance_m", 1 / 1000), ("longest_min", "moving_min", 1),
+                                    ("most_climbing_m", "elevation_m", 1)):
+            values = activities[column]
+            if values.notna().any() and values.max() > 0:
+                row = activities.loc[values.idxmax()]
+                records[name] = _merge_best(records.get(name), _record(row[column] * scale, row))
+
+    # Best running efforts, from distance streams where stored, else the activity's average pace
+    for position, row in zip(range(len(frame)), frame.itertuples()):
+        if row.sport not in RUN_SPORTS or row.distance_m <= 0:
+            continue
+        streams = loaded.get(position, {})
+        for name, target in BEST_EFFORTS.items():
+            seconds = best_effort_seconds(streams.get("distance"), streams.get("time"), target)
+            if seconds is None and row.distance_m >= target and row.moving_s > 0:
+                seconds = row.moving_s * target / row.distance_m
+            if seconds is not None:
+                state["best_efforts"][name] = _merge_best(
+                    state["best_efforts"].get(name), _record(seconds, row), lower=True)
+
+    state["activities"] += len(frame)
+    state["newest_start"] = frame["start"].iloc[-1].isoformat()
+
+
+def compute_state(activities: List[Dict[str, Any]], streams_loader: Optional[StreamsLoader] = None) -> Dict[str, Any]:
+    """
+    Computes the analytics state of a whole activity history.
+    """
+    frame = history_frame(activities)
+    state = empty_state()
+    if frame["max_hr"].notna().any():
+        state["hr_max"] = float(frame["max_hr"].max())
+    runs = frame[frame["sport"].isin(RUN_SPORTS) & (frame["distance_m"] > 0) & (frame["moving_s"] > 0)]
+    if not runs.empty:
+        state["median_pace_s_per_km"] = float((runs["moving_s"] / (runs["distance_m"] / 1000)).median())
+    _apply_frame(state, frame, streams_loader)
+    return state
+
+
+def update_state(state: Dict[str, Any], activities: List[Dict[str, Any]],
+                 streams_loader: Optional[StreamsLoader] = None) -> Optional[Dict[str, Any]]:
+    """
+    Folds new activities into a state without rereading the history.
+    Returns None when that is not possible, because an activity is not newer than the
+    newest one already counted (an edit or a backfilled one) or raises the max heart
+    rate the zones are based on; the state must then be recomputed.
+    """
+    import pandas as pd
+
+    frame = history_frame(activities)
+    if frame.empty:
+        return state
+    if state["newest_start"] and frame["start"].iloc[0] <= pd.Timestamp(state["newest_start"]):
+        return None
+    if frame["max_hr"].notna().any() and frame["max_hr"].max() > (state["hr_max"] or 0):
+        return None
+    updated = copy.deepcopy(state)
+    _apply_frame(updated, frame, streams_loader)
+    return updated
+
+
+def analytics_report(state: Dict[str, Any], today: Optional[datetime] = None, weeks: int = 12,
+                     months: int = 12) -> Dict[str, Any]:
+    """
+    The state as served by /analytics, with fitness and fatigue decayed to today.
+    """
+    import pandas as pd
+
+    today = pd.Timestamp(today or datetime.now(timezone.utc).replace(tzinfo=None)).normalize()
+    ctl, atl = state["ctl"], state["atl"]
+    if state["last_day"]:
+        idle_days = max((today - pd.Timestamp(state["last_day"])).days, 0)
+        ctl *= _decay(idle_days, CTL_DAYS)
+        atl *= _decay(idle_days, ATL_DAYS)
+
+    def rounded(bucket):
+        return {"sessions": bucket["sessions"], "distance_km": round(bucket["distance_km"], 1),
+                "moving_min": int(round(bucket["moving_min"])), "load": int(round(bucket["load"]))}
+
+    return {
+        "activities": state["activities"],
+        "fitness": {"ctl": round(ctl, 1), "atl": round(atl, 1), "tsb": round(ctl - atl, 1),
+                    "as_of": today.strftime("%Y-%m-%d")},
+        "weekly": [{"week": key, **rounded(state["weekly"][key])} for key in sorted(state["weekly"])[-weeks:]],
+        "monthly": [{"month": key, **rounded(state["monthly"][key])} for key in sorted(state["monthly"])[-months:]],
+        "hr_zones_min": {name: int(round(value)) for name, value in zip(HR_ZONE_NAMES, state["hr_zones_min"])},
+        "hr_max": state["hr_max"],
+        "pace_zones_min": {name: int(round(value)) for name, value in zip(PACE_ZONE_NAMES, state["pace_zones_min"])},
+        "median_pace_s_per_km": state["median_pace_s_per_km"],
+        "personal_bests": state["personal_bests"],
+        "best_efforts": state["best_efforts"],
+    }
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_analytics_context(report: Optional[Dict[str, Any]]) -> str:
+    """
+    Renders the analytics report as a few lines for the LLM prompt.
+    """
+    if not report or not report["activities"]:
+        return "No training metrics available."
+    fitness = report["fitness"]
+    lines = [f"Fitness (CTL) {fitness['ctl']:.0f}, fatigue (ATL) {fitness['atl']:.0f}, "
+             f"form (TSB) {fitness['tsb']:+.0f} over {report['activities']} activities"]
+    zone_total = sum(report["hr_zones_min"].values())
+    if zone_total:
+        lines.append("Heart rate zones: " + ", ".join(
+            f"{name} {value / zone_total:.0%}" for name, value in report["hr_zones_min"].items()))
+    if report["weekly"]:
+        recent = report["weekly"][-4:]
+        lines.append(f"Last {len(recent)} weeks average: "
+                     f"{sum(w['distance_km'] for w in recent) / len(recent):.1f}km, "
+                     f"{sum(w['moving_min'] for w in recent) / len(recent):.0f}min, "
+                     f"{sum(w['sessions'] for w in recent) / len(recent):.1f} sessions")
+    if report["best_efforts"]:
+        lines.append("Running bests: " + ", ".join(
+            f"{name} {_format_duration(best['value'])}" for name, best in report["best_efforts"].items()))
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+from services.activity_store import ActivityStore, activity_start_ts
+from services.activity_streams import StreamStore
+from services.analytics import analytics_report, compute_state, update_state
+
+logger = logging.getLogger(__name__)
+
+# Activities read per Firestore page when recomputing a whole history
+ANALYTICS_PAGE_SIZE = 500
+ANALYTICS_STREAM_TYPES = ("time", "heartrate", "distance")
+
+
+class AnalyticsService:
+    """
+    Keeps each user's training analytics in users/{uid}/analytics/state.
+
+    The state is computed once from the whole activity history, then new activities
+    are folded in as the activity store reports them. Edits, deletes and backfilled
+    older activities cannot be folded in and trigger a recompute instead. While a
+    backfill is running, its pages only mark the state for a recompute, run once
+    when the backfill reports itself complete.
+    """
+
+    def __init__(self, activity_store: ActivityStore, firestore_db, stream_store: Optional[StreamStore] = None):
+        self.activity_store = activity_store
+        self.firestore_db = firestore_db
+        self.stream_store = stream_store
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._background: Dict[str, asyncio.Task] = {}
+        self._listeners: List[Callable[[str], Awaitable[None]]] = []
+        self._deferred = set()
+        self.recomputes = 0
+        self.updates = 0
+
+    def add_listener(self, listener: Callable[[str], Awaitable[None]]) -> None:
+        """
+        Registers a coroutine awaited with the uid after every change of a user's state.
+        """
+        self._listeners.append(listener)
+
+    async def _notify(self, user_uid: str) -> None:
+        for listener in self._listeners:
+            try:
+                await listener(user_uid)
+            except Exception as e:
+                logger.error(f"Error notifying analytics listener: {e}")
+
+    def _state_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid).collection('analytics').document('state')
+
+    def _streams_loader(self, user_uid: str):
+        if self.stream_store is None:
+            return None
+        return lambda activity_id: self.stream_store.load(user_uid, activity_id, ANALYTICS_STREAM_TYPES)
+
+    async def _load_state(self, user_uid: str) -> Optional[Dict[str, Any]]:
+        with span("firestore", "analytics.get"):
+            snapshot = await run_in_threadpool(self._state_ref(user_uid).get)
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def _save_state(self, user_uid: str, state: Dict[str, Any]) -> None:
+        with span("firestore", "analytics.set"):
+            await run_in_threadpool(self._state_ref(user_uid).set, state)
+
+    async def _history(self, user_uid: str) -> List[Dict[str, Any]]:
+        activities, after = [], None
+        while True:
+            page, after = await self.activity_store.list_activities_after(user_uid, ANALYTICS_PAGE_SIZE, after)
+            activities.extend(page)
+            if after is None:
+                return activities
+
+    async def recompute(self, user_uid: str) -> Dict[str, Any]:
+        async with self._locks.setdefault(user_uid, asyncio.Lock()):
+            return await self._recompute(user_uid)
+
+    async def _recompute(self, user_uid: str) -> Dict[str, Any]:
+        self._deferred.discard(user_uid)
+        activities = await self._history(user_uid)
+        # pandas work and memory-mapped stream reads, keep them off the event loop
+        state = await run_in_threadpool(compute_state, activities, self._streams_loader(user_uid))
+        await self._save_state(user_uid, state)
+        self.recomputes += 1
+        await self._notify(user_uid)
+        return state
+
+    async def _backfilling(self, user_uid: str, activities: List[Dict[str, Any]]) -> bool:
+        """
+        Whether the activities are backfill pages of a backfill still running: all older
+        than where the backfill started. Edits of recent activities are never deferred.
+        """
+        sync_state = await self.activity_store.get_sync_state(user_uid)
+        before_ts = sync_state.get('backfill_before_ts')
+        if before_ts is None or sync_state.get('backfill_complete'):
+            return False
+        return all(activity_start_ts(activity) < before_ts for activity in activities)
+
+    async def on_activities(self, user_uid: str, activities: List[Dict[str, Any]]) -> None:
+        """
+        ActivityStore listener, folds newly stored activities into the user's state.
+        """
+        async with self._locks.setdefault(user_uid, asyncio.Lock()):
+            state = await self._load_state(user_uid)
+            if state is None:
+                await self._recompute(user_uid)
+                return
+            updated = await run_in_threadpool(update_state, state, activities, self._streams_loader(user_uid))
+            if updated is None:
+                if await self._backfilling(user_uid, activities):
+                    self._deferred.add(user_uid)
+                    return
+                await self._recompute(user_uid)
+                return
+            await self._save_state(user_uid, updated)
+            self.updates += 1
+        await self._notify(user_uid)
+
+    async def on_activities_deleted(self, user_uid: str, activity_ids: List[int]) -> None:
+        """
+        ActivityStore delete listener, a removed activity can only be taken out by a recompute.
+        """
+        async with self._locks.setdefault(user_uid, asyncio.Lock()):
+            await self._recompute(user_uid)
+
+    async def on_sync_state(self, user_uid: str, state: Dict[str, Any]) -> None:
+        """
+        ActivityStore sync listener, runs the recompute deferred during a backfill once it completes.
+        """
+        if not state.get('backfill_complete'):
+            return
+        # Taken after the listener of the last page, which may still be deferring
+        async with self._locks.setdefault(user_uid, asyncio.Lock()):
+            if user_uid in self._deferred:
+                await self._recompute(user_uid)
+
+    async def get_report(self, user_uid: str, compute_missing: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Returns the user's analytics report. Without a stored state it is computed,
+        or with `compute_missing=False` None is returned and it is computed in the background.
+        """
+        state = await self._load_state(user_uid)
+        if state is None:
+            if not compute_missing:
+                if user_uid not in self._background:
+                    task = asyncio.create_task(self.recompute(user_uid))
+                    self._background[user_uid] = task
+                    task.add_done_callback(lambda _: self._background.pop(user_uid, None))
+                return None
+            state = await self.recompute(user_uid)
+        return analytics_report(state)
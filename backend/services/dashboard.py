@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+from services.activity_store import ActivityStore
+from services.analytics_service import AnalyticsService
+from services.workout_store import WorkoutStore
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_ACTIVITIES = int(os.getenv("DASHBOARD_ACTIVITIES", "15"))
+# A dashboard view syncs new activities from Strava at most this often
+DASHBOARD_SYNC_SECONDS = float(os.getenv("DASHBOARD_SYNC_SECONDS", "300"))
+# Fields of each recent activity kept in the dashboard document
+DASHBOARD_ACTIVITY_FIELDS = ("id", "name", "type", "sport_type", "start_date", "start_date_local",
+                             "distance", "moving_time", "total_elevation_gain", "average_heartrate")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def dashboard_version(data: Dict[str, Any]) -> str:
+    """
+    Content hash of the dashboard data, used as its ETag. Rebuilding unchanged inputs keeps the version.
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=_json_default)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:20]
+
+
+def dashboard_metrics(report: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    The headline numbers of the analytics report shown on the dashboard.
+    """
+    if not report:
+        return None
+    return {
+        "activities": report["activities"],
+        "fitness": report["fitness"],
+        "this_week": report["weekly"][-1] if report["weekly"] else None,
+        "weekly": report["weekly"][-4:],
+    }
+
+
+class DashboardService:
+    """
+    Materializes each user's dashboard in users/{uid}/dashboard/current.
+
+    The document holds the recent activities, the key training metrics, the latest
+    workout and the Strava connection status, so the dashboard is served with a single
+    read. It is rebuilt when one of its inputs changes: new activities, an analytics
+    update, a deleted activity, a profile update, a saved workout or a new Strava connection. Changes arriving
+    while a rebuild runs are coalesced into one more rebuild.
+    """
+
+    def __init__(self, firestore_db, activity_store: ActivityStore, workout_store: WorkoutStore,
+                 analytics_service: AnalyticsService, recent_activities: int = DASHBOARD_ACTIVITIES):
+        self.firestore_db = firestore_db
+        self.activity_store = activity_store
+        self.workout_store = workout_store
+        self.analytics_service = analytics_service
+        self.recent_activities = recent_activities
+        self._stale: Set[str] = set()
+        self._rebuilds: Dict[str, asyncio.Task] = {}
+        self.builds = 0
+
+    def _user_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid)
+
+    def _dashboard_ref(self, user_uid: str):
+        return self._user_ref(user_uid).collection('dashboard').document('current')
+
+    async def _read_user(self, user_uid: str) -> Dict[str, Any]:
+        with span("firestore", "users.get"):
+            snapshot = await run_in_threadpool(self._user_ref(user_uid).get)
+        return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+    async def build(self, user_uid: str) -> Dict[str, Any]:
+        """
+        Reads the dashboard's inputs and stores the materialized document.
+        """
+        user_data, (activities, _), latest_workout, report = await asyncio.gather(
+            self._read_user(user_uid),
+            self.activity_store.list_activities(user_uid, per_page=self.recent_activities),
+            self.workout_store.get_latest_workout(user_uid),
+            self.analytics_service.get_report(user_uid, compute_missing=False),
+        )
+        data = {
+            "strava_connected": bool((user_data.get('strava_tokens') or {}).get('access_token')),
+            "profile": user_data.get('profile') or {},
+            "recent_activities": [{field: activity[field] for field in DASHBOARD_ACTIVITY_FIELDS if field in activity}
+                                  for activity in activities],
+            "latest_workout": latest_workout[0] if latest_workout else None,
+            "metrics": dashboard_metrics(report),
+        }
+        # Round-trip through JSON so the stored and served documents hash identically
+        data = json.loads(json.dumps(data, default=_json_default))
+        # When activities were last synced, kept out of the version as it changes without the content
+        synced_at = (user_data.get('strava_sync') or {}).get('last_synced_at')
+        document = {"version": dashboard_version(data), "built_at": datetime.now(timezone.utc).isoformat(),
+                    "synced_at": synced_at, **data}
+        with span("firestore", "dashboard.set"):
+            await run_in_threadpool(self._dashboard_ref(user_uid).set, document)
+        self.builds += 1
+        return document
+
+    async def get(self, user_uid: str) -> Dict[str, Any]:
+        """
+        Returns the stored dashboard, building it when there is none or it was built on an earlier day,
+        as fitness and fatigue decay daily.
+        """
+        with span("firestore", "dashboard.get"):
+            snapshot = await run_in_threadpool(self._dashboard_ref(user_uid).get)
+        document = snapshot.to_dict() if snapshot.exists else None
+        today = datetime.now(timezone.utc).date().isoformat()
+        if document is None or not document.get("built_at", "").startswith(today):
+            document = await self.build(user_uid)
+        return document
+
+    def needs_sync(self, document: Dict[str, Any]) -> bool:
+        """
+        Whether a view of this dashboard should sync new activities from Strava.
+        """
+        return bool(document.get("strava_connected")) and \
+            time.time() - (document.get("synced_at") or 0) >= DASHBOARD_SYNC_SECONDS
+
+    async def mark_synced(self, user_uid: str) -> None:
+        """
+        Records a sync in the stored dashboard, so views within DASHBOARD_SYNC_SECONDS do not start another.
+        """
+        try:
+            with span("firestore", "dashboard.set"):
+                await run_in_threadpool(self._dashboard_ref(user_uid).set, {"synced_at": time.time()}, merge=True)
+        except Exception as e:
+            logger.error(f"Error recording dashboard sync: {e}")
+
+    def invalidate(self, user_uid: str) -> asyncio.Task:
+        """
+        Schedules a rebuild of the user's dashboard. Returns the rebuild task.
+        """
+        self._stale.add(user_uid)
+        task = self._rebuilds.get(user_uid)
+        # A finished rebuild is only dropped by its done callback, it would miss this change
+        if task is None or task.done():
+            task = asyncio.create_task(self._rebuild(user_uid))
+            self._rebuilds[user_uid] = task
+            task.add_done_callback(lambda done: self._forget_rebuild(user_uid, done))
+        return task
+
+    def _forget_rebuild(self, user_uid: str, task: asyncio.Task) -> None:
+        if self._rebuilds.get(user_uid) is task:
+            del self._rebuilds[user_uid]
+
+    async def _rebuild(self, user_uid: str) -> None:
+        while user_uid in self._stale:
+            self._stale.discard(user_uid)
+            try:
+                await self.build(user_uid)
+            except Exception as e:
+                logger.error(f"Error building dashboard: {e}")
+
+    async def refresh(self, user_uid: str) -> None:
+        """
+        Invalidates the user's dashboard and waits for the rebuild, for use as a background task.
+        """
+        await self.invalidate(user_uid)
+
+    async def on_activities(self, user_uid: str, activities: List[Dict[str, Any]]) -> None:
+        """
+        ActivityStore listener.
+        """
+        self.invalidate(user_uid)
+
+    async def on_activities_deleted(self, user_uid: str, activity_ids: List[int]) -> None:
+        """
+        ActivityStore delete listener.
+        """
+        self.invalidate(user_uid)
+
+    async def on_analytics(self, user_uid: str) -> None:
+        """
+        AnalyticsService listener.
+        """
+        self.invalidate(user_uid)
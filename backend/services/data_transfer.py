@@ -0,0 +1,148 @@
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+from app.models.workout_plan import WorkoutPlan
+from services.activity_store import MAX_BATCH_SIZE, ActivityStore, activity_start_ts
+from services.workout_plans import compact_plan, expand_plan
+from services.workout_store import WorkoutStore
+
+# Documents read per Firestore page while exporting
+EXPORT_PAGE_SIZE = 500
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class InvalidImportLine(ValueError):
+    pass
+
+
+def _to_json(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_line(kind: str, data: Dict[str, Any]) -> str:
+    return json.dumps({"type": kind, "data": data}, default=_to_json) + "\n"
+
+
+async def export_user_data(workout_store: WorkoutStore, activity_store: ActivityStore,
+                           user_uid: str) -> AsyncIterator[str]:
+    """
+    Yields the user's workouts then activities as NDJSON lines, one Firestore page at a time.
+    Workouts are exported as stored, plans in their compact form.
+    """
+    cursor = None
+    while True:
+        workouts, cursor = await workout_store.list_workouts(
+            user_uid, limit=EXPORT_PAGE_SIZE, cursor=cursor, raw=True)
+        for workout in workouts:
+            yield ndjson_line("workout", workout)
+        if cursor is None:
+            break
+
+    after = None
+    while True:
+        activities, after = await activity_store.list_activities_after(user_uid, EXPORT_PAGE_SIZE, after)
+        for activity in activities:
+            yield ndjson_line("activity", activity)
+        if after is None:
+            break
+
+
+def _workout_record(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    An exported workout checked against what a saved workout holds: a text `suggestion`
+    or a compact `plan` that expands to a valid WorkoutPlan, and a `created_at`. The
+    compact fields are rebuilt from the validated plan, so they always agree with it.
+    """
+    if not isinstance(data, dict):
+        raise TypeError("workout data is not an object")
+    created_at = data.get("created_at")
+    if not isinstance(created_at, str):
+        raise ValueError("workout has no created_at")
+    workout = {**data, "created_at": datetime.fromisoformat(created_at)}
+    if "plan" in data:
+        try:
+            plan = WorkoutPlan.model_validate(expand_plan(data.get("summary", ""), data["plan"]))
+        except (KeyError, IndexError, AttributeError, TypeError) as e:
+            raise ValueError(f"malformed workout plan: {e!r}")
+        workout.pop("suggestion", None)
+        return {**workout, **compact_plan(plan)}
+    if not isinstance(data.get("suggestion"), str):
+        raise ValueError("workout has neither a suggestion nor a plan")
+    return workout
+
+
+def _activity_record(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    An exported activity checked against what a synced one holds: an integer `id`,
+    its document id, and a `start_date` the store can order and page by.
+    """
+    if not isinstance(data, dict):
+        raise TypeError("activity data is not an object")
+    activity_id = data.get("id")
+    if not isinstance(activity_id, int) or isinstance(activity_id, bool):
+        raise ValueError("activity has no integer id")
+    start_date = data.get("start_date")
+    if not isinstance(start_date, str):
+        raise ValueError("activity has no start_date")
+    # Raises ValueError for a date that is not ISO 8601
+    activity_start_ts(data)
+    return data
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    yield pending
+
+
+async def import_user_data(workout_store: WorkoutStore, activity_store: ActivityStore,
+                           user_uid: str, chunks: AsyncIterator[bytes]) -> Dict[str, int]:
+    """
+    Writes an NDJSON export back, flushing each record type in batches of MAX_BATCH_SIZE.
+    Records keep their ids, so a partially failed import can be replayed.
+    """
+    workouts: List[Dict[str, Any]] = []
+    activities: List[Dict[str, Any]] = []
+    counts = {"workouts": 0, "activities": 0}
+
+    async def flush_workouts():
+        counts["workouts"] += len(await workout_store.save_workouts(user_uid, workouts))
+        workouts.clear()
+
+    async def flush_activities():
+        counts["activities"] += await activity_store.upsert_activities(user_uid, activities)
+        activities.clear()
+
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            kind, data = record["type"], record["data"]
+            if kind == "workout":
+                workouts.append(_workout_record(data))
+            elif kind == "activity":
+                activities.append(_activity_record(data))
+            else:
+                raise ValueError(f"unknown record type {kind!r}")
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidImportLine(f"line {line_number}: {e}")
+
+        if len(workouts) >= MAX_BATCH_SIZE:
+            await flush_workouts()
+        if len(activities) >= MAX_BATCH_SIZE:
+            await flush_activities()
+
+    await flush_workouts()
+    await flush_activities()
+    return counts
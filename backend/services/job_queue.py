@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "4"))
+AI_JOB_MAX_QUEUE = int(os.getenv("AI_JOB_MAX_QUEUE", "100"))
+AI_JOB_RESULT_TTL_SECONDS = float(os.getenv("AI_JOB_RESULT_TTL_SECONDS", "600"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    owners: set
+    run: Callable[[], Awaitable[Any]]
+    status: str = "queued"
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "wait_ms": None if self.started_at is None else (self.started_at - self.created_at) * 1000,
+            "run_ms": None if self.finished_at is None or self.started_at is None
+            else (self.finished_at - self.started_at) * 1000,
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue drained by a fixed pool of worker tasks.
+
+    Jobs submitted with the key of a queued or running job are merged into it
+    (single-flight), so identical requests share one execution. A bounded queue
+    gives backpressure: `submit` raises JobQueueFull instead of piling up work.
+    """
+
+    def __init__(self, workers: int = AI_JOB_WORKERS, max_queue: int = AI_JOB_MAX_QUEUE,
+                 result_ttl_seconds: float = AI_JOB_RESULT_TTL_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl_seconds = result_ttl_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, Job] = {}
+        self._wait_times = deque(maxlen=1000)
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._in_flight.clear()
+
+    def submit(self, key: str, owner: str, run: Callable[[], Awaitable[Any]]) -> Job:
+        self._expire_finished()
+        existing = self._in_flight.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            existing.owners.add(owner)
+            return existing
+
+        job = Job(id=uuid.uuid4().hex, key=key, owners={owner}, run=run)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull()
+        self.submitted += 1
+        self._jobs[job.id] = job
+        self._in_flight[key] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = np.fromiter(self._wait_times, dtype=float) * 1000
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._in_flight),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_p50": float(np.percentile(waits, 50)) if waits.size else None,
+            "wait_ms_p95": float(np.percentile(waits, 95)) if waits.size else None,
+            "wait_ms_max": float(waits.max()) if waits.size else None,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._wait_times.append(job.started_at - job.created_at)
+            try:
+                job.result = await job.run()
+                job.status = "done"
+                self.completed += 1
+            except Exception as e:
+                logger.error(f"Error running job {job.id}: {e}")
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                self._in_flight.pop(job.key, None)
+                job.done.set()
+                self._queue.task_done()
+
+    def _expire_finished(self) -> None:
+        cutoff = time.time() - self.result_ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,123 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+from services.suggestion_cache import SuggestionCache
+
+logger = logging.getLogger(__name__)
+
+# Pre-generated overnight, a suggestion is served through the next day
+READY_SUGGESTION_TTL_SECONDS = float(os.getenv("READY_SUGGESTION_TTL_SECONDS", str(36 * 3600)))
+# The last request is recorded on the user document at most this often when it does not change
+LAST_REQUEST_RECORD_SECONDS = float(os.getenv("LAST_REQUEST_RECORD_SECONDS", "3600"))
+
+
+def request_fields(request) -> Dict[str, Any]:
+    return {"goal": request.goal, "equipment": request.equipment, "time": request.time,
+            "requirements": request.requirements}
+
+
+class ReadySuggestionStore:
+    """
+    The per-user "ready" slot at users/{uid}/suggestions/ready, holding a suggestion
+    generated ahead of time by the batch job for the user's last request.
+
+    The slot is served while it is fresh and the request matches the one it was
+    generated for. New activities make it stale, the slot is dropped as an
+    ActivityStore listener.
+    """
+
+    def __init__(self, firestore_db, ttl_seconds: float = READY_SUGGESTION_TTL_SECONDS):
+        self.firestore_db = firestore_db
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def _user_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid)
+
+    def _slot_ref(self, user_uid: str):
+        return self._user_ref(user_uid).collection('suggestions').document('ready')
+
+    async def read(self, user_uid: str) -> Optional[Dict[str, Any]]:
+        with span("firestore", "suggestions.get"):
+            snapshot = await run_in_threadpool(self._slot_ref(user_uid).get)
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def is_fresh(self, slot: Optional[Dict[str, Any]], request=None) -> bool:
+        if slot is None or time.time() >= slot.get('expires_at', 0):
+            return False
+        return request is None or slot.get('request_key') == SuggestionCache.key_for(request, "")
+
+    async def get(self, user_uid: str, request) -> Optional[str]:
+        """
+        Returns the ready suggestion for `request`, None when there is no fresh one.
+        """
+        try:
+            slot = await self.read(user_uid)
+            fresh = self.is_fresh(slot, request)
+        except Exception as e:
+            logger.error(f"Error reading the ready workout suggestion: {e}")
+            fresh = False
+        if not fresh:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return slot['content']
+
+    async def put(self, user_uid: str, request, content: str, batch_id: str) -> None:
+        now = time.time()
+        slot = {
+            'request_key': SuggestionCache.key_for(request, ""),
+            'request': request_fields(request),
+            'content': content,
+            'batch_id': batch_id,
+            'generated_at': now,
+            'expires_at': now + self.ttl_seconds,
+        }
+        with span("firestore", "suggestions.set"):
+            await run_in_threadpool(self._slot_ref(user_uid).set, slot)
+
+    async def clear(self, user_uid: str) -> None:
+        with span("firestore", "suggestions.delete"):
+            await run_in_threadpool(self._slot_ref(user_uid).delete)
+
+    async def record_request(self, user_uid: str, request,
+                             last_request: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Stores the request on the user document, where the batch job finds recently
+        active users and what to generate for them. Skipped when `last_request`, the
+        recorded one, is the same and recent.
+        """
+        now = datetime.now(timezone.utc)
+        fields = request_fields(request)
+        if last_request and {key: last_request.get(key) for key in fields} == fields:
+            requested_at = last_request.get('requested_at')
+            if requested_at and now - requested_at < timedelta(seconds=LAST_REQUEST_RECORD_SECONDS):
+                return
+        try:
+            with span("firestore", "users.set"):
+                await run_in_threadpool(self._user_ref(user_uid).set,
+                                        {'last_workout_request': {**fields, 'requested_at': now}}, merge=True)
+        except Exception as e:
+            logger.error(f"Error recording the workout request: {e}")
+
+    async def on_activities(self, user_uid: str, activities: List[Dict[str, Any]]) -> None:
+        """
+        ActivityStore listener.
+        """
+        await self.clear(user_uid)
+
+    async def on_activities_deleted(self, user_uid: str, activity_ids: List[int]) -> None:
+        """
+        ActivityStore delete listener.
+        """
+        await self.clear(user_uid)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
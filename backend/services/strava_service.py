@@ -1,23 +1,45 @@
+import logging
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.clients import strava_client
+from app.models.user_context import UserContext
+from app.telemetry import span
+from services.activity_store import InvalidCursor
+from services.activity_streams import ActivityStreamService, STRAVA_STREAMS_SYNC_LIMIT
+from services.activity_sync import ActivitySyncService
+from services.strava_token_manager import StravaTokenError, StravaTokenManager
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 
 class StravaService:
-    def __init__(self, firestore_db):
+    def __init__(self, firestore_db, activity_sync: ActivitySyncService,
+                 token_manager: StravaTokenManager,
+                 stream_service: Optional[ActivityStreamService] = None):
         self.client_id = os.getenv("STRAVA_CLIENT_ID")
         self.client_secret = os.getenv("STRAVA_CLIENT_SECRET")
         self.redirect_uri = os.getenv("STRAVA_REDIRECT_URI")
         self.firestore_db = firestore_db
+        self.activity_sync = activity_sync
+        self.token_manager = token_manager
+        self.stream_service = stream_service
 
         if not all([self.client_id, self.client_secret, self.redirect_uri]):
             raise RuntimeError(
                 "Strava environment variables are not properly set")
 
 
+    async def _get_user_doc(self, user_uid: str):
+        # The Firestore Admin client is blocking, keep it off the event loop
+        user_doc_ref = self.firestore_db.collection('users').document(user_uid)
+        with span("firestore", "users.get"):
+            return await run_in_threadpool(user_doc_ref.get)
+
     def get_auth_url(self):
         if not all([self.client_id, self.redirect_uri]):
             raise HTTPException(
@@ -32,9 +54,9 @@ class StravaService:
 
         return {"authorization_url": authorization_url}
 
-    def exchange_token(self, code: str, user_uid: str):
+    async def exchange_token(self, code: str, user_uid: str):
         try:
-            token_data = strava_client.get_tokens(
+            token_data = await strava_client.get_tokens(
                 client_id=self.client_id,
                 client_secret=self.client_secret,
                 code=code,
@@ -46,46 +68,99 @@ class StravaService:
                 .document(user_uid)
             )
 
-            user_doc_ref.set(
-                {"strava_tokens": token_data},
-                merge=True
-            )
+            with span("firestore", "users.set"):
+                await run_in_threadpool(
+                    user_doc_ref.set,
+                    {"strava_tokens": token_data},
+                    merge=True
+                )
+            self.token_manager.forget(user_uid)
+            self.token_manager.remember(user_uid, token_data)
 
             return {"message": "Token exchanged successfully."}
 
         except Exception as e:
-            print(f"Error exchanging token: {e}")
+            logger.error(f"Error exchanging token: {e}")
             raise HTTPException(
                 status_code=400,
                 detail="Failed to exchange token with Strava."
             )
         
-    def get_strava_connection_status(self, user_uid: str):
-        user_doc = self.firestore_db.collection('users').document(user_uid).get()
-
-        is_connected = (user_doc.exists and
-                        'strava_tokens' in user_doc.to_dict() and
-                        user_doc.to_dict().get('strava_tokens', {}).get('access_token') is not None)
-
-        return {"is_connected": is_connected}
+    async def get_strava_connection_status(self, user: UserContext):
+        return {"is_connected": user.is_strava_connected}
 
-    def get_activities(self, user_uid: str, per_page: int = 15):
-        user_doc = self.firestore_db.collection('users').document(user_uid).get()
-
-        if not user_doc.exists or 'strava_tokens' not in user_doc.to_dict():
+    async def _get_access_token(self, user: UserContext) -> str:
+        if not user.exists or user.strava_tokens is None:
             raise HTTPException(
                 status_code=401, detail="Strava account not connected.")
 
-        access_token = user_doc.to_dict()['strava_tokens'].get('access_token')
+        try:
+            access_token = await self.token_manager.get_access_token(
+                user.uid, user.strava_tokens.model_dump())
+        except StravaTokenError as e:
+            logger.error(f"Error refreshing Strava token: {e}")
+            access_token = None
 
         if not access_token:
             raise HTTPException(status_code=401, detail="Invalid Strava token.")
 
+        return access_token
+
+    async def get_activities(self, user: UserContext, per_page: int = 15, cursor: Optional[str] = None):
+        """
+        Returns a page of the user's stored activities and the cursor of the next page.
+        """
+        access_token = await self._get_access_token(user)
+
         try:
-            activities = strava_client.get_activities(
-                access_token=access_token, per_page=per_page)
-            return activities
+            await self.activity_sync.sync_recent(user.uid, access_token)
         except Exception as e:
-            print(f"Error fetching activities: {e}")
+            # Serve what is already stored rather than failing the whole view
+            logger.error(f"Error syncing activities: {e}")
+
+        try:
+            return await self.activity_sync.store.list_activities(user.uid, per_page=per_page, cursor=cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        except Exception as e:
+            logger.error(f"Error fetching activities: {e}")
             raise HTTPException(
-                status_code=500, detail="Failed to fetch activities from Strava.")
+                status_code=500, detail="Failed to fetch activities.")
+
+    async def sync_activities(self, user_uid: str):
+        """
+        Fetches the newest activities then backfills the history, for use as a background task
+        by views that only read what is stored.
+        """
+        try:
+            user = UserContext.from_snapshot(user_uid, await self._get_user_doc(user_uid))
+            access_token = await self._get_access_token(user)
+            synced = await self.activity_sync.sync_recent(user_uid, access_token)
+        except Exception as e:
+            logger.error(f"Error syncing activities: {e}")
+            return
+        await self.backfill_activities(user_uid, access_token, synced=synced)
+
+    async def backfill_activities(self, user_uid: str, access_token: str = None, synced: int = 0):
+        """
+        Backfills the history, then fetches the streams of recent activities. Streams are
+        only looked for when this backfill ran or `synced` new activities were stored.
+        """
+        try:
+            if access_token is None:
+                user = UserContext.from_snapshot(user_uid, await self._get_user_doc(user_uid))
+                access_token = await self._get_access_token(user)
+            backfilled = await self.activity_sync.backfill(user_uid, access_token)
+            if self.stream_service is not None and (backfilled is not None or synced):
+                await self.sync_streams(user_uid, access_token)
+        except Exception as e:
+            logger.error(f"Error backfilling activities: {e}")
+
+    async def sync_streams(self, user_uid: str, access_token: str) -> int:
+        """
+        Fetches the streams of the most recent stored activities that have none yet.
+        """
+        activities, _ = await self.activity_sync.store.list_activities_after(
+            user_uid, STRAVA_STREAMS_SYNC_LIMIT)
+        return await self.stream_service.fetch_missing(
+            user_uid, access_token, [activity['id'] for activity in activities])
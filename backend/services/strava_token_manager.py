@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.clients import strava_client
+from app.telemetry import span
+
+# Strava access tokens live six hours, renew them this long before they expire
+STRAVA_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("STRAVA_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+
+# Fields of the token response kept in users/{uid}.strava_tokens
+TOKEN_FIELDS = ("access_token", "refresh_token", "expires_at", "expires_in", "token_type")
+
+
+class StravaTokenError(Exception):
+    pass
+
+
+class StravaTokenManager:
+    """
+    Keeps a hot in-memory copy of every user's Strava tokens and renews them
+    shortly before they expire.
+
+    Requests read the access token from memory. A token close to expiry is
+    refreshed once per user however many requests need it at the same time,
+    and the new token is written with a Firestore transaction that keeps
+    whichever of the stored and refreshed tokens expires last, so instances
+    refreshing concurrently converge on one token.
+    """
+
+    def __init__(self, firestore_db, client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 refresh_margin_seconds: float = STRAVA_TOKEN_REFRESH_MARGIN_SECONDS):
+        self.firestore_db = firestore_db
+        self.client_id = client_id or os.getenv("STRAVA_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("STRAVA_CLIENT_SECRET")
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.refreshes = 0
+
+    def _user_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid)
+
+    def _is_fresh(self, tokens: Dict[str, Any]) -> bool:
+        expires_at = tokens.get('expires_at')
+        # Tokens stored without an expiry predate this manager, use them as they are
+        return expires_at is None or expires_at - self.refresh_margin_seconds > time.time()
+
+    def remember(self, user_uid: str, tokens: Optional[Dict[str, Any]]) -> None:
+        """
+        Seeds the hot copy, keeping the newer of the known and the given tokens.
+        """
+        if not tokens or not tokens.get('access_token'):
+            return
+        known = self._tokens.get(user_uid)
+        if known is None or (tokens.get('expires_at') or 0) >= (known.get('expires_at') or 0):
+            self._tokens[user_uid] = dict(tokens)
+
+    def forget(self, user_uid: str) -> None:
+        self._tokens.pop(user_uid, None)
+
+    async def get_access_token(self, user_uid: str, tokens: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Returns a valid access token, None when the user has not connected Strava.
+        `tokens` are the user's stored tokens when the caller already read the user document.
+        """
+        self.remember(user_uid, tokens)
+        known = self._tokens.get(user_uid)
+        if known is None:
+            with span("firestore", "users.get"):
+                user_doc = await run_in_threadpool(self._user_ref(user_uid).get)
+            self.remember(user_uid, (user_doc.to_dict() or {}).get('strava_tokens') if user_doc.exists else None)
+            known = self._tokens.get(user_uid)
+            if known is None:
+                return None
+        if self._is_fresh(known):
+            return known['access_token']
+
+        lock = self._locks.setdefault(user_uid, asyncio.Lock())
+        async with lock:
+            # Another request may have refreshed while this one waited
+            known = self._tokens[user_uid]
+            if not self._is_fresh(known):
+                known = await self._refresh(user_uid, known)
+            return known['access_token']
+
+    async def _refresh(self, user_uid: str, known: Dict[str, Any]) -> Dict[str, Any]:
+        if not known.get('refresh_token'):
+            raise StravaTokenError("Strava token expired and no refresh token is stored.")
+        try:
+            response = await strava_client.refresh_access_token(
+                self.client_id, self.client_secret, known['refresh_token'])
+        except Exception as e:
+            raise StravaTokenError(f"Failed to refresh Strava token: {e}")
+        self.refreshes += 1
+        refreshed = {field: response[field] for field in TOKEN_FIELDS if field in response}
+        with span("firestore", "users.transaction"):
+            stored = await run_in_threadpool(self._persist, user_uid, refreshed)
+        self._tokens[user_uid] = {**known, **stored}
+        return self._tokens[user_uid]
+
+    def _persist(self, user_uid: str, refreshed: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Atomically stores the refreshed tokens unless a newer token is already stored.
+        Returns the tokens that are stored afterwards.
+        """
+        from google.cloud import firestore
+
+        user_ref = self._user_ref(user_uid)
+
+        @firestore.transactional
+        def update(transaction):
+            snapshot = user_ref.get(transaction=transaction)
+            current = ((snapshot.to_dict() or {}) if snapshot.exists else {}).get('strava_tokens') or {}
+            if (current.get('expires_at') or 0) >= refreshed.get('expires_at', 0):
+                return current
+            transaction.set(user_ref, {'strava_tokens': refreshed}, merge=True)
+            return {**current, **refreshed}
+
+        return update(self.firestore_db.transaction())
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.clients import strava_client
+from services.activity_store import ActivityStore
+from services.strava_token_manager import StravaTokenManager
+
+logger = logging.getLogger(__name__)
+
+STRAVA_WEBHOOK_QUEUE_SIZE = int(os.getenv("STRAVA_WEBHOOK_QUEUE_SIZE", "10000"))
+STRAVA_WEBHOOK_BATCH_SIZE = int(os.getenv("STRAVA_WEBHOOK_BATCH_SIZE", "50"))
+STRAVA_WEBHOOK_BATCH_WAIT_SECONDS = float(os.getenv("STRAVA_WEBHOOK_BATCH_WAIT_SECONDS", "0.5"))
+
+
+def is_deauthorization(event: Dict[str, Any]) -> bool:
+    """
+    Strava sends an athlete update with `authorized: "false"` when the athlete revokes access.
+    """
+    return (event.get("object_type") == "athlete"
+            and str((event.get("updates") or {}).get("authorized")).lower() == "false")
+
+
+def is_valid_event(event: Dict[str, Any]) -> bool:
+    """
+    Whether the event has the fields the worker reads: an owner, and for activity
+    events the activity id and a known aspect type.
+    """
+    if not isinstance(event.get("owner_id"), int):
+        return False
+    if event.get("object_type") != "activity":
+        return True
+    return isinstance(event.get("object_id"), int) and event.get("aspect_type") in ("create", "update", "delete")
+
+
+class StravaWebhookProcessor:
+    """
+    Queues Strava push events and applies them to the activity store in batches.
+
+    The HTTP handler only calls `enqueue`, so Strava gets its acknowledgement
+    immediately. A single background worker drains the queue, collapses repeated
+    events for the same activity, and fetches each created or updated activity once.
+    An athlete revoking the app's access clears their stored tokens, then
+    `on_deauthorized` is called with their uid.
+    """
+
+    def __init__(self, store: ActivityStore, queue_size: int = STRAVA_WEBHOOK_QUEUE_SIZE,
+                 batch_size: int = STRAVA_WEBHOOK_BATCH_SIZE,
+                 batch_wait_seconds: float = STRAVA_WEBHOOK_BATCH_WAIT_SECONDS,
+                 token_manager: Optional[StravaTokenManager] = None,
+                 on_deauthorized: Optional[Callable[[str], Awaitable[None]]] = None):
+        self.store = store
+        self.token_manager = token_manager
+        self.on_deauthorized = on_deauthorized
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        if event.get("object_type") != "activity" and not is_deauthorization(event):
+            return False
+        if not is_valid_event(event):
+            logger.warning(f"Dropping malformed Strava webhook event: {event}")
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Strava webhook queue full, dropping event for activity {event.get('object_id')}")
+            return False
+
+    def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # The queue is bound to the running loop, start fresh on the next start()
+        self._queue = None
+
+    async def drain(self) -> None:
+        """
+        Waits until every queued event has been processed.
+        """
+        await self.queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.process_batch(batch)
+            except Exception as e:
+                logger.error(f"Error processing Strava webhook batch: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def process_batch(self, events: List[Dict[str, Any]]) -> None:
+        # One malformed event must not cost the rest of the batch
+        events = [event for event in events if is_valid_event(event)]
+        # Revoked access first, the activity events of those athletes can no longer be fetched
+        deauthorized = {event["owner_id"] for event in events if is_deauthorization(event)}
+        await asyncio.gather(*(self._deauthorize(owner_id) for owner_id in deauthorized))
+
+        # Only the latest event per activity matters, e.g. create followed by delete
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for event in sorted(events, key=lambda e: e.get("event_time", 0)):
+            if event.get("object_type") != "activity":
+                continue
+            latest[(event["owner_id"], event["object_id"])] = event
+
+        by_athlete: Dict[int, List[Dict[str, Any]]] = {}
+        for (owner_id, _), event in latest.items():
+            by_athlete.setdefault(owner_id, []).append(event)
+
+        await asyncio.gather(*(self._apply(owner_id, athlete_events)
+                               for owner_id, athlete_events in by_athlete.items()))
+
+    async def _deauthorize(self, owner_id: int) -> None:
+        user = await self.store.find_user_by_athlete(owner_id)
+        if user is None:
+            return
+        user_uid, _ = user
+        await self.store.clear_strava_tokens(user_uid)
+        if self.token_manager is not None:
+            self.token_manager.forget(user_uid)
+        logger.info(f"Strava athlete {owner_id} revoked access, tokens cleared.")
+        if self.on_deauthorized is not None:
+            await self.on_deauthorized(user_uid)
+
+    async def _apply(self, owner_id: int, events: List[Dict[str, Any]]) -> None:
+        user = await self.store.find_user_by_athlete(owner_id)
+        if user is None:
+            logger.warning(f"No user connected to Strava athlete {owner_id}")
+            return
+        user_uid, user_data = user
+        strava_tokens = user_data.get('strava_tokens') or {}
+        access_token = strava_tokens.get('access_token')
+        if self.token_manager is not None:
+            try:
+                access_token = await self.token_manager.get_access_token(user_uid, strava_tokens)
+            except Exception as e:
+                logger.error(f"Error refreshing Strava token for athlete {owner_id}: {e}")
+                access_token = None
+
+        # The sync cursor is left to sync_recent: moved forward here, it would skip the
+        # activities whose events were dropped or failed to fetch
+        upserts = []
+        for event in events:
+            if event["aspect_type"] == "delete":
+                await self.store.delete_activity(user_uid, event["object_id"])
+            elif access_token:
+                try:
+                    activity = await strava_client.get_activity(
+                        access_token, event["object_id"], priority=strava_client.BACKGROUND)
+                except Exception as e:
+                    logger.error(f"Error fetching activity {event['object_id']}: {e}")
+                    continue
+                upserts.append(activity)
+
+        await self.store.upsert_activities(user_uid, upserts)
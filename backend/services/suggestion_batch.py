@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.models.workout_request import WorkoutRequest
+from app.telemetry import span
+from services.analytics import format_analytics_context
+from services.ready_suggestions import ReadySuggestionStore
+from services.workout_plans import InvalidSuggestion
+
+logger = logging.getLogger(__name__)
+
+# Users who asked for a suggestion within this many days get one ready for the next day
+BATCH_ACTIVE_DAYS = int(os.getenv("BATCH_ACTIVE_DAYS", "7"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+# Stays under the inference provider's limit, the interactive endpoint shares it
+BATCH_REQUESTS_PER_MINUTE = float(os.getenv("BATCH_REQUESTS_PER_MINUTE", "30"))
+BATCH_PAGE_SIZE = int(os.getenv("BATCH_PAGE_SIZE", "100"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "3"))
+BATCH_BACKOFF_BASE_SECONDS = float(os.getenv("BATCH_BACKOFF_BASE_SECONDS", "2"))
+BATCH_PROGRESS_SECONDS = float(os.getenv("BATCH_PROGRESS_SECONDS", "30"))
+BATCH_COLLECTION = "suggestion_batches"
+
+# Generates the model output for a request from the user's activities and metrics,
+# raising InvalidSuggestion for output that must not be stored
+Generate = Callable[[WorkoutRequest, bool, List[Dict[str, Any]], str], Awaitable[str]]
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestRateLimiter:
+    """
+    Spaces requests `60 / requests_per_minute` seconds apart across all the workers.
+    A throttled response pushes the next slot back for everyone.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    def pause(self, seconds: float) -> None:
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+@dataclass
+class BatchProgress:
+    batch_id: str
+    status: str = "running"
+    cursor: Optional[List[Any]] = None
+    processed: int = 0
+    generated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    throttled: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def per_minute(self) -> float:
+        return self.generated / self.elapsed_seconds * 60 if self.elapsed_seconds else 0.0
+
+
+class SuggestionBatch:
+    """
+    Pre-generates next-day workout suggestions for recently active users.
+
+    Users whose last recorded request is within `active_days` are read a page at a time,
+    with their request and Strava connection from the user document, and their synced
+    activities and training metrics from the stores, not from Strava. Suggestions are generated by a pool of
+    `workers` under a shared requests-per-minute limit, throttled and failed calls are
+    retried with backoff, and each result is stored in the user's ready slot. Output
+    that does not validate is counted as failed, and never stored.
+
+    Progress is checkpointed in suggestion_batches/{batch_id} after every page. A run
+    with the same batch id resumes after the last finished page, and users of the
+    interrupted page whose slot already holds this batch's suggestion are skipped.
+    """
+
+    def __init__(self, firestore_db, activity_store, ready_store: ReadySuggestionStore, generate: Generate,
+                 load_metrics: Callable[[str], Awaitable[str]], activities_per_user: int = 30,
+                 workers: int = BATCH_WORKERS, requests_per_minute: float = BATCH_REQUESTS_PER_MINUTE,
+                 active_days: int = BATCH_ACTIVE_DAYS, page_size: int = BATCH_PAGE_SIZE,
+                 max_retries: int = BATCH_MAX_RETRIES, progress_seconds: float = BATCH_PROGRESS_SECONDS):
+        self.firestore_db = firestore_db
+        self.activity_store = activity_store
+        self.ready_store = ready_store
+        self.generate = generate
+        self.load_metrics = load_metrics
+        self.activities_per_user = activities_per_user
+        self.workers = workers
+        self.rate_limiter = RequestRateLimiter(requests_per_minute)
+        self.active_days = active_days
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.progress_seconds = progress_seconds
+
+    def _batch_ref(self, batch_id: str):
+        return self.firestore_db.collection(BATCH_COLLECTION).document(batch_id)
+
+    async def _load_progress(self, batch_id: str) -> BatchProgress:
+        with span("firestore", "suggestion_batches.get"):
+            snapshot = await run_in_threadpool(self._batch_ref(batch_id).get)
+        if not snapshot.exists:
+            return BatchProgress(batch_id=batch_id)
+        return BatchProgress(**snapshot.to_dict())
+
+    async def _save_progress(self, progress: BatchProgress) -> None:
+        with span("firestore", "suggestion_batches.set"):
+            await run_in_threadpool(self._batch_ref(progress.batch_id).set, asdict(progress))
+
+    async def _active_users(self, since: datetime, cursor: Optional[List[Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        query = (self.firestore_db.collection('users')
+                 .where('last_workout_request.requested_at', '>=', since)
+                 .order_by('last_workout_request.requested_at')
+                 .order_by('__name__')
+                 .limit(self.page_size))
+        if cursor is not None:
+            query = query.start_after(cursor)
+
+        def read():
+            return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+        with span("firestore", "users.query"):
+            return await run_in_threadpool(read)
+
+    async def _generate(self, request: WorkoutRequest, is_strava_connected: bool,
+                        activities: List[Dict[str, Any]], metrics_str: str, progress: BatchProgress) -> str:
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                return await self.generate(request, is_strava_connected, activities, metrics_str)
+            except Exception as e:
+                status_code = _status_code(e)
+                if attempt == self.max_retries or isinstance(e, InvalidSuggestion) or (
+                        status_code is not None and status_code != 429 and status_code < 500):
+                    raise
+                delay = random.uniform(0, BATCH_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                if status_code == 429:
+                    progress.throttled += 1
+                    delay = _retry_after(e) or delay
+                    self.rate_limiter.pause(delay)
+                await asyncio.sleep(delay)
+
+    async def _process(self, user_uid: str, user_data: Dict[str, Any], progress: BatchProgress) -> None:
+        try:
+            request = WorkoutRequest(**{key: value for key, value in user_data['last_workout_request'].items()
+                                        if key != 'requested_at'})
+            slot = await self.ready_store.read(user_uid)
+            # Already generated by this batch before it was interrupted
+            if (slot or {}).get('batch_id') == progress.batch_id and self.ready_store.is_fresh(slot, request):
+                progress.skipped += 1
+                return
+
+            is_strava_connected = bool((user_data.get('strava_tokens') or {}).get('access_token'))
+            activities: List[Dict[str, Any]] = []
+            metrics_str = format_analytics_context(None)
+            if is_strava_connected:
+                (activities, _), metrics_str = await asyncio.gather(
+                    self.activity_store.list_activities(user_uid, per_page=self.activities_per_user),
+                    self.load_metrics(user_uid))
+            content = await self._generate(request, is_strava_connected, activities, metrics_str, progress)
+            await self.ready_store.put(user_uid, request, content, progress.batch_id)
+            progress.generated += 1
+        except Exception as e:
+            progress.failed += 1
+            logger.error(f"Error pre-generating a suggestion for user {user_uid}: {e}")
+        finally:
+            progress.processed += 1
+
+    def _report(self, progress: BatchProgress) -> None:
+        logger.info(f"Suggestion batch {progress.batch_id}: processed={progress.processed} "
+                    f"generated={progress.generated} skipped={progress.skipped} failed={progress.failed} "
+                    f"throttled={progress.throttled} rate={progress.per_minute:.1f}/min",
+                    extra={"fields": {**asdict(progress), "per_minute": round(progress.per_minute, 2)}})
+
+    async def run(self, batch_id: Optional[str] = None, resume: bool = True,
+                  max_users: Optional[int] = None) -> BatchProgress:
+        """
+        Runs or resumes the batch, by default the one of the current UTC day.
+        Returns its progress once every active user was processed, or `max_users` were.
+        """
+        batch_id = batch_id or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        progress = await self._load_progress(batch_id) if resume else BatchProgress(batch_id=batch_id)
+        if progress.status == "done":
+            logger.info(f"Suggestion batch {batch_id} already done.")
+            return progress
+        progress.status = "running"
+        since = datetime.now(timezone.utc) - timedelta(days=self.active_days)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        started = time.monotonic()
+        elapsed = progress.elapsed_seconds
+
+        async def worker():
+            while True:
+                user_uid, user_data = await queue.get()
+                try:
+                    await self._process(user_uid, user_data, progress)
+                finally:
+                    queue.task_done()
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(self.progress_seconds)
+                progress.elapsed_seconds = elapsed + time.monotonic() - started
+                self._report(progress)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)] + [asyncio.create_task(reporter())]
+        try:
+            processed_in_run = 0
+            while max_users is None or processed_in_run < max_users:
+                page = await self._active_users(since, progress.cursor)
+                users = page if max_users is None else page[:max_users - processed_in_run]
+                for user in users:
+                    await queue.put(user)
+                await queue.join()
+                processed_in_run += len(users)
+                if users:
+                    user_uid, user_data = users[-1]
+                    progress.cursor = [user_data['last_workout_request']['requested_at'], user_uid]
+                if len(page) < self.page_size and len(users) == len(page):
+                    progress.status = "done"
+                progress.elapsed_seconds = elapsed + time.monotonic() - started
+                await self._save_progress(progress)
+                if progress.status == "done":
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._report(progress)
+        return progress
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_CACHE_TTL_SECONDS = float(os.getenv("SUGGESTION_CACHE_TTL_SECONDS", str(6 * 3600)))
+SUGGESTION_CACHE_MAX_ENTRIES = int(os.getenv("SUGGESTION_CACHE_MAX_ENTRIES", "2000"))
+SUGGESTION_CACHE_SEMANTIC = os.getenv("SUGGESTION_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+SUGGESTION_CACHE_EMBEDDING_MODEL = os.getenv(
+    "SUGGESTION_CACHE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SUGGESTION_CACHE_SIMILARITY = float(os.getenv("SUGGESTION_CACHE_SIMILARITY", "0.95"))
+
+_BODYWEIGHT = {"", "none", "no equipment", "bodyweight", "bodyweight only"}
+
+
+def _normalize_text(value: str) -> str:
+    return re.sub(r"\s+", " ", (value or "").strip().lower())
+
+
+def normalize_request(request) -> Dict[str, Any]:
+    """
+    Reduces a WorkoutRequest to a canonical form, so trivially different requests share a key.
+    """
+    equipment = sorted({_normalize_text(item) for item in (request.equipment or "").split(",")} - {""})
+    if not equipment or set(equipment) <= _BODYWEIGHT:
+        equipment = ["bodyweight only"]
+    return {
+        "goal": _normalize_text(request.goal),
+        "time": request.time,
+        "equipment": equipment,
+        "requirements": _normalize_text(request.requirements) or "none",
+    }
+
+
+def activity_fingerprint(activities: List[Dict[str, Any]], is_strava_connected: bool, metrics_str: str = "") -> str:
+    """
+    Compact fingerprint of an activity history: sport, day, and rounded distance and duration.
+    Small differences such as a few metres or seconds map to the same fingerprint.
+    The Strava connection status is part of it, the prompt differs for a connected user
+    whose history could not be read and one who never connected. So is a hash of the
+    training metrics text, which changes with a recompute the activities do not show,
+    such as one after older activities were backfilled.
+    """
+    compact = [
+        (a.get("sport_type") or a.get("type"),
+         (a.get("start_date") or "")[:10],
+         round((a.get("distance") or 0) / 1000),
+         round((a.get("moving_time") or 0) / 300))
+        for a in activities
+    ]
+    metrics = hashlib.sha1(metrics_str.encode()).hexdigest()[:16]
+    return hashlib.sha1(json.dumps([is_strava_connected, metrics, compact]).encode()).hexdigest()[:16]
+
+
+@dataclass
+class CachedSuggestion:
+    suggestion: str
+    fingerprint: str
+    text: str
+    created_at: float
+    embedding: Optional[np.ndarray] = None
+
+
+class SuggestionCache:
+    """
+    Response cache for AI workout suggestions.
+
+    Entries are keyed on the normalized request plus the activity fingerprint, expire after
+    a TTL and are evicted least-recently-used. When an embedding function is given, an exact
+    miss falls back to the nearest cached request with the same fingerprint, if its cosine
+    similarity is above the threshold.
+    """
+
+    def __init__(self, ttl_seconds: float = SUGGESTION_CACHE_TTL_SECONDS,
+                 max_entries: int = SUGGESTION_CACHE_MAX_ENTRIES,
+                 embed: Optional[Callable[[str], Awaitable[Any]]] = None,
+                 similarity_threshold: float = SUGGESTION_CACHE_SIMILARITY):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CachedSuggestion]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def request_text(normalized: Dict[str, Any]) -> str:
+        return (f"goal: {normalized['goal']}; time: {normalized['time']} min; "
+                f"equipment: {', '.join(normalized['equipment'])}; requirements: {normalized['requirements']}")
+
+    @staticmethod
+    def _key(text: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}|{text}".encode()).hexdigest()
+
+    @classmethod
+    def key_for(cls, request, fingerprint: str) -> str:
+        return cls._key(cls.request_text(normalize_request(request)), fingerprint)
+
+    def _is_fresh(self, entry: CachedSuggestion) -> bool:
+        return time.time() - entry.created_at < self.ttl_seconds
+
+    async def get(self, request, fingerprint: str) -> Optional[str]:
+        text = self.request_text(normalize_request(request))
+        key = self._key(text, fingerprint)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_fresh(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.suggestion
+            del self._entries[key]
+
+        if self.embed is not None:
+            match = await self._nearest(text, fingerprint)
+            if match is not None:
+                self.semantic_hits += 1
+                return match.suggestion
+
+        self.misses += 1
+        return None
+
+    async def put(self, request, fingerprint: str, suggestion: str) -> None:
+        text = self.request_text(normalize_request(request))
+        embedding = await self._embedding(text) if self.embed is not None else None
+        self._entries[self._key(text, fingerprint)] = CachedSuggestion(
+            suggestion=suggestion, fingerprint=fingerprint, text=text,
+            created_at=time.time(), embedding=embedding)
+        self._entries.move_to_end(self._key(text, fingerprint))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    async def _embedding(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embed(text), dtype=np.float32).reshape(-1)
+        except Exception as e:
+            logger.error(f"Error embedding suggestion request: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def _nearest(self, text: str, fingerprint: str) -> Optional[CachedSuggestion]:
+        candidates = [entry for entry in self._entries.values()
+                      if entry.fingerprint == fingerprint and entry.embedding is not None
+                      and self._is_fresh(entry)]
+        if not candidates:
+            return None
+        query = await self._embedding(text)
+        if query is None:
+            return None
+        similarities = np.stack([entry.embedding for entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return candidates[best]
@@ -0,0 +1,212 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.models.workout_plan import WorkoutPlan
+
+logger = logging.getLogger(__name__)
+
+# Sent as `response_format`, the model's output is constrained to the plan schema
+WORKOUT_PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "workout_plan",
+        "description": "A personalized workout plan.",
+        "schema": WorkoutPlan.model_json_schema(),
+    },
+}
+
+# Workout document fields a caller may ask for -> the stored fields they are built from.
+# A plan's days and muscles are kept under `plan`, its text is rendered on read.
+WORKOUT_FIELD_SOURCES = {
+    "suggestion": ("suggestion", "summary", "plan"),
+    "summary": ("summary",),
+    "days": ("days",),
+    "exercises": ("exercises",),
+    "plan": ("summary", "plan"),
+    "created_at": ("created_at",),
+}
+
+
+class InvalidSuggestion(ValueError):
+    """
+    The model's output is not a suggestion to keep. It carries the output and its
+    token counts, so it can still be answered once without being cached or stored.
+    """
+
+    def __init__(self, content: str, prompt_tokens: int, completion_tokens: int):
+        super().__init__("workout suggestion did not validate")
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def exercise_key(name: str) -> str:
+    """
+    Normalized exercise name, stored in `exercises` for array-contains queries.
+    """
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+
+def muscle_name(name: str) -> str:
+    return _clean(name).title()
+
+
+def parse_workout_plan(content: str) -> Optional[WorkoutPlan]:
+    """
+    Parses and validates the model's JSON in one pass. None when it is not a valid plan,
+    such as a completion cut off by the token limit.
+    """
+    try:
+        return WorkoutPlan.model_validate_json(content)
+    except ValidationError as e:
+        logger.warning(f"Workout plan did not validate, returning the text: {e.error_count()} errors")
+        return None
+
+
+def is_valid_suggestion(content: str, structured: bool, finish_reason: Optional[str] = None) -> bool:
+    """
+    Whether the model's output may be cached or stored: a plan that validates for
+    structured output, otherwise text that was not cut off by the token limit.
+    """
+    if structured:
+        return parse_workout_plan(content) is not None
+    return bool(content.strip()) and finish_reason != "length"
+
+
+def render_plan(plan: Dict[str, Any]) -> str:
+    """
+    The plan as the markdown the free-text suggestions used, for clients that show text.
+    """
+    lines = [plan["summary"]]
+    if plan.get("warm_up"):
+        lines += ["", f"**Warm-Up:** {plan['warm_up']}"]
+    for day in plan["days"]:
+        lines += ["", f"**{day['title']}**"]
+        for number, exercise in enumerate(day["exercises"], 1):
+            lines.append(f"{number}. {exercise['name']} – {exercise['sets']}x{exercise['reps']}")
+            if exercise.get("muscles"):
+                lines.append(f"   💪 {', '.join(exercise['muscles'])}")
+            if exercise.get("purpose"):
+                lines.append(f"   🎯 {exercise['purpose']}")
+    if plan.get("cool_down"):
+        lines += ["", f"**Cool-Down:** {plan['cool_down']}"]
+    if plan.get("tips"):
+        lines += ["", "**Tips**"] + [f"- {tip}" for tip in plan["tips"]]
+    return "\n".join(lines)
+
+
+def suggestion_response(content: str) -> Dict[str, Any]:
+    """
+    The response body of a suggestion: the plan and its text when the model's output
+    is a valid plan, the text as generated otherwise.
+    """
+    plan = parse_workout_plan(content) if content.lstrip().startswith("{") else None
+    if plan is None:
+        return {"suggestion": content}
+    plan_data = plan.model_dump()
+    return {"suggestion": render_plan(plan_data), "plan": plan_data}
+
+
+def compact_plan(plan: WorkoutPlan) -> Dict[str, Any]:
+    """
+    The fields a plan is stored as. Muscles are kept once per plan and referenced by
+    index, days are keyed "d1", "d2"... so a single day can be read with a field
+    projection, empty fields are dropped, and `exercises` lists the normalized exercise
+    names to query on. The summary is its own field, list views read only that.
+    """
+    muscles: List[str] = []
+    muscle_index: Dict[str, int] = {}
+    days = {}
+    for number, day in enumerate(plan.days, 1):
+        exercises = []
+        for exercise in day.exercises:
+            refs = []
+            for muscle in exercise.muscles:
+                name = muscle_name(muscle)
+                if name not in muscle_index:
+                    muscle_index[name] = len(muscles)
+                    muscles.append(name)
+                refs.append(muscle_index[name])
+            stored = {"name": _clean(exercise.name), "sets": exercise.sets, "reps": _clean(exercise.reps)}
+            if refs:
+                stored["muscles"] = refs
+            if exercise.purpose:
+                stored["purpose"] = _clean(exercise.purpose)
+            exercises.append(stored)
+        days[f"d{number}"] = {"title": _clean(day.title), "exercises": exercises}
+
+    stored_plan = {"days": days, "muscles": muscles}
+    for field in ("warm_up", "cool_down"):
+        if getattr(plan, field):
+            stored_plan[field] = _clean(getattr(plan, field))
+    if plan.tips:
+        stored_plan["tips"] = [_clean(tip) for tip in plan.tips]
+    return {
+        "summary": _clean(plan.summary),
+        "days": [_clean(day.title) for day in plan.days],
+        "exercises": sorted({exercise_key(exercise.name) for day in plan.days for exercise in day.exercises}),
+        "plan": stored_plan,
+    }
+
+
+def expand_day(day: Dict[str, Any], muscles: List[str]) -> Dict[str, Any]:
+    return {
+        "title": day["title"],
+        "exercises": [{"name": exercise["name"], "sets": exercise["sets"], "reps": exercise["reps"],
+                       "muscles": [muscles[index] for index in exercise.get("muscles", [])],
+                       "purpose": exercise.get("purpose", "")}
+                      for exercise in day["exercises"]],
+    }
+
+
+def expand_plan(summary: str, stored_plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The stored form of a plan back in the shape of WorkoutPlan.
+    """
+    muscles = stored_plan.get("muscles", [])
+    days = stored_plan["days"]
+    return {
+        "summary": summary,
+        "warm_up": stored_plan.get("warm_up", ""),
+        "days": [expand_day(days[f"d{number}"], muscles) for number in range(1, len(days) + 1)],
+        "cool_down": stored_plan.get("cool_down", ""),
+        "tips": stored_plan.get("tips", []),
+    }
+
+
+def workout_document(suggestion: Optional[str], plan: Optional[WorkoutPlan]) -> Dict[str, Any]:
+    """
+    The stored fields of a saved workout. A plan is stored in its compact form without
+    the text, which is rendered from it on read.
+    """
+    if plan is not None:
+        return compact_plan(plan)
+    return {"suggestion": suggestion}
+
+
+def workout_view(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A stored workout as served: the plan expanded and its text rendered, when read.
+    Workouts saved as text are returned as stored.
+    """
+    if "plan" not in stored:
+        return stored
+    workout = dict(stored)
+    plan = expand_plan(workout.get("summary", ""), workout.pop("plan"))
+    workout["plan"] = plan
+    workout["suggestion"] = render_plan(plan)
+    return workout
+
+
+def stored_fields(fields) -> List[str]:
+    """
+    The stored fields to read for the requested ones.
+    """
+    return sorted({source for field in fields for source in WORKOUT_FIELD_SOURCES[field]})
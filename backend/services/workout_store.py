@@ -0,0 +1,143 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.telemetry import span
+from services.activity_store import MAX_BATCH_SIZE, InvalidCursor
+from services.workout_plans import expand_day, exercise_key, stored_fields, workout_view
+
+# Fields a caller may project, the list view only needs `created_at` and `summary`
+WORKOUT_FIELDS = ("suggestion", "summary", "days", "exercises", "plan", "created_at")
+
+
+def encode_cursor(created_at: datetime, workout_id: str) -> str:
+    """
+    Opaque page cursor holding the sort key of the last workout on a page.
+    """
+    raw = json.dumps([created_at.isoformat(), workout_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, workout_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(workout_id)
+    except Exception:
+        raise InvalidCursor(cursor)
+
+
+class WorkoutStore:
+    """
+    Reads saved workouts under users/{uid}/workouts newest first, one page per query.
+    Pages are ordered by (created_at, document id) descending, the order of the
+    composite index in firestore.indexes.json, and resume after the cursor of the
+    previous page instead of using an offset.
+    """
+
+    def __init__(self, firestore_db):
+        self.firestore_db = firestore_db
+
+    def _workouts_ref(self, user_uid: str):
+        return self.firestore_db.collection('users').document(user_uid).collection('workouts')
+
+    async def save_workouts(self, user_uid: str, workouts: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Writes workouts with batched writes of up to MAX_BATCH_SIZE documents.
+        A workout carrying an `id` overwrites that document, so re-imports are idempotent.
+        """
+        workouts = list(workouts)
+
+        def write():
+            workouts_ref = self._workouts_ref(user_uid)
+            workout_ids = []
+            for start in range(0, len(workouts), MAX_BATCH_SIZE):
+                batch = self.firestore_db.batch()
+                for workout in workouts[start:start + MAX_BATCH_SIZE]:
+                    data = dict(workout)
+                    workout_id = data.pop('id', None)
+                    workout_ref = workouts_ref.document(workout_id) if workout_id else workouts_ref.document()
+                    batch.set(workout_ref, data)
+                    workout_ids.append(workout_ref.id)
+                batch.commit()
+            return workout_ids
+
+        if not workouts:
+            return []
+        with span("firestore", "workouts.write"):
+            return await run_in_threadpool(write)
+
+    async def list_workouts(self, user_uid: str, limit: int, cursor: Optional[str] = None,
+                            start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            fields: Optional[Sequence[str]] = None, exercise: Optional[str] = None,
+                            raw: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns a page of workouts and the cursor of the next page, None on the last page.
+        Only the stored fields behind `fields` are read, `exercise` keeps the plans that
+        include it, and `raw` returns the documents as stored, as exports do.
+        """
+        # One extra document tells whether another page follows
+        query = (self._workouts_ref(user_uid)
+                 .order_by('created_at', direction='DESCENDING')
+                 .order_by('__name__', direction='DESCENDING')
+                 .limit(limit + 1))
+        if start is not None:
+            query = query.where('created_at', '>=', start)
+        if end is not None:
+            query = query.where('created_at', '<', end)
+        if exercise:
+            query = query.where('exercises', 'array_contains', exercise_key(exercise))
+        if cursor is not None:
+            query = query.start_after(list(decode_cursor(cursor)))
+        if fields:
+            # created_at is the sort key, it is needed for the next cursor
+            fields = set(fields) | {'created_at'}
+            query = query.select(stored_fields(fields))
+
+        def read():
+            workouts = []
+            for doc in query.stream():
+                workout = doc.to_dict() if raw else workout_view(doc.to_dict())
+                if fields:
+                    workout = {field: value for field, value in workout.items() if field in fields}
+                workout['id'] = doc.id
+                workouts.append(workout)
+            return workouts
+
+        with span("firestore", "workouts.query"):
+            workouts = await run_in_threadpool(read)
+        next_cursor = None
+        if len(workouts) > limit:
+            workouts = workouts[:limit]
+            next_cursor = encode_cursor(workouts[-1]['created_at'], workouts[-1]['id'])
+        return workouts, next_cursor
+
+    async def get_latest_workout(self, user_uid: str) -> List[Dict[str, Any]]:
+        workouts, _ = await self.list_workouts(user_uid, limit=1)
+        return workouts
+
+    async def get_workout(self, user_uid: str, workout_id: str) -> Optional[Dict[str, Any]]:
+        with span("firestore", "workouts.get"):
+            snapshot = await run_in_threadpool(self._workouts_ref(user_uid).document(workout_id).get)
+        if not snapshot.exists:
+            return None
+        return {**workout_view(snapshot.to_dict()), 'id': workout_id}
+
+    async def get_workout_day(self, user_uid: str, workout_id: str, day: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns one day of a plan, reading only that day and the muscle names it refers to.
+        None when the workout has no such day, workouts saved as text have none.
+        """
+        field_paths = ["summary", "days", f"plan.days.d{day}", "plan.muscles"]
+        with span("firestore", "workouts.get"):
+            snapshot = await run_in_threadpool(
+                self._workouts_ref(user_uid).document(workout_id).get, field_paths=field_paths)
+        stored = snapshot.to_dict() if snapshot.exists else None
+        plan_day = ((stored or {}).get('plan') or {}).get('days', {}).get(f"d{day}")
+        if plan_day is None:
+            return None
+        return {'id': workout_id, 'summary': stored.get('summary', ''), 'day': day,
+                'days': len(stored.get('days', [])), **expand_day(plan_day, stored['plan'].get('muscles', []))}
@@ -56,3 +56,20 @@ def firestore_db_mock(mock_shared_dependencies):
     firestore_mock = mock_shared_dependencies
     firestore_mock.reset_mock()
     return firestore_mock
+
+@pytest.fixture
+def mock_strava(monkeypatch):
+    """
+    Routes the Strava client to a local mock Strava server with a fresh rate limiter.
+    """
+    import httpx
+    from app.clients import strava_client
+    from app.clients.strava_rate_limit import StravaRateLimiter
+    from mock_strava import MockStrava
+
+    server = MockStrava()
+    monkeypatch.setattr(strava_client, "_http_client",
+                        httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app)))
+    monkeypatch.setattr(strava_client, "rate_limiter", StravaRateLimiter())
+    monkeypatch.setattr(strava_client, "STRAVA_BACKOFF_BASE_SECONDS", 0.01)
+    return server
@@ -0,0 +1,215 @@
+"""
+In-memory stand-in for the parts of the Firestore client the backend uses:
+documents, subcollections, batched writes and ordered, filtered, paginated queries.
+Safe to call from several threads, and with `latency` each call waits like a round trip.
+"""
+import copy
+import functools
+import operator
+import time
+import uuid
+
+MAX_BATCH_WRITES = 500
+
+_OPERATORS = {
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "array_contains": lambda values, value: isinstance(values, list) and value in values,
+}
+
+
+_MISSING = object()
+
+
+def _get_path(data, field_path, default=None):
+    for part in field_path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return default
+        data = data[part]
+    return data
+
+
+def _order_value(value):
+    # Firestore orders null before every other value
+    return (0, None) if value is None else (1, value)
+
+
+def _project(data, field_paths):
+    projected = {}
+    for field_path in field_paths:
+        value = _get_path(data, field_path)
+        if value is None:
+            continue
+        *parents, name = field_path.split(".")
+        target = projected
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[name] = value
+    return projected
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self, field_paths=None):
+        self._db.round_trip()
+        self._db.reads += 1
+        data = self._db.docs.get(self.path)
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+        return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        self._db.round_trip()
+        self._write(data, merge)
+
+    def delete(self):
+        self._db.round_trip()
+        self._remove()
+
+    def _write(self, data, merge):
+        self._db.writes += 1
+        current = self._db.docs.get(self.path) if merge else None
+        self._db.docs[self.path] = {**(current or {}), **copy.deepcopy(data)}
+
+    def _remove(self):
+        self._db.writes += 1
+        self._db.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), orders=(), limit=None, offset=0, after=None, fields=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._after = after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     offset=self._offset, after=self._after, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field_path, op_string, value):
+        return self._copy(filters=self._filters + ((field_path, _OPERATORS[op_string], value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, count):
+        return self._copy(offset=count)
+
+    def start_after(self, values):
+        return self._copy(after=list(values))
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _sort_key(self, doc_id, data):
+        return [doc_id if field == "__name__" else _get_path(data, field) for field, _ in self._orders]
+
+    def _compare(self, left, right):
+        for (_, direction), a, b in zip(self._orders, left, right):
+            a, b = _order_value(a), _order_value(b)
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if direction == "DESCENDING" else result
+        return 0
+
+    def stream(self):
+        db = self._collection._db
+        db.round_trip()
+        prefix = self._collection.path + "/"
+        rows = [(path[len(prefix):], data) for path, data in list(db.docs.items())
+                if path.startswith(prefix) and "/" not in path[len(prefix):]]
+        rows = [(doc_id, data) for doc_id, data in rows
+                if all(_get_path(data, field) is not None and op(_get_path(data, field), value)
+                       for field, op, value in self._filters)]
+        # Ordering on a field leaves out the documents without it, a null value is kept
+        rows = [(doc_id, data) for doc_id, data in rows
+                if all(field == "__name__" or _get_path(data, field, _MISSING) is not _MISSING
+                       for field, _ in self._orders)]
+        compare = functools.cmp_to_key(lambda l, r: self._compare(self._sort_key(*l), self._sort_key(*r)))
+        rows.sort(key=compare)
+        if self._after is not None:
+            rows = [row for row in rows if self._compare(self._sort_key(*row), self._after) > 0]
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for doc_id, data in rows:
+            db.reads += 1
+            if self._fields is not None:
+                data = _project(data, self._fields)
+            yield FakeSnapshot(self._collection.document(doc_id), copy.deepcopy(data))
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        super().__init__(self)
+
+    def document(self, document_id=None):
+        return FakeDocument(self._db, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._operations = []
+
+    def set(self, reference, data, merge=False):
+        self._operations.append(lambda: reference._write(data, merge))
+
+    def delete(self, reference):
+        self._operations.append(reference._remove)
+
+    def commit(self):
+        assert len(self._operations) <= MAX_BATCH_WRITES, "Firestore batches are capped at 500 writes"
+        self._db.round_trip()
+        self._db.commits += 1
+        for apply in self._operations:
+            apply()
+
+
+class FakeFirestore:
+    def __init__(self, latency: float = 0.0):
+        self.docs = {}
+        self.latency = latency
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
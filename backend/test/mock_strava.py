@@ -0,0 +1,67 @@
+"""
+Local mock of the Strava API, served in-process through httpx.ASGITransport.
+Responses can be scripted per request: a status code and a delay.
+"""
+import asyncio
+from collections import deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class MockStrava:
+    def __init__(self, short_limit: int = 200, daily_limit: int = 2000, activities=None):
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.activities = activities if activities is not None else [{"id": 1, "name": "Morning Run"}]
+        self.script = deque()
+        self.requests = []
+        self.app = FastAPI()
+        self.app.add_api_route("/api/v3/athlete/activities", self._activities)
+        self.app.add_api_route("/api/v3/activities/{activity_id}", self._activity)
+        self.app.add_api_route("/api/v3/activities/{activity_id}/streams", self._streams)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def respond(self, status_code: int = 200, delay: float = 0.0, times: int = 1) -> "MockStrava":
+        self.script.extend([(status_code, delay)] * times)
+        return self
+
+    def _headers(self):
+        return {
+            "X-RateLimit-Limit": f"{self.short_limit},{self.daily_limit}",
+            "X-RateLimit-Usage": f"{self.short_usage},{self.daily_usage}",
+        }
+
+    async def _reply(self, request: Request, body):
+        self.requests.append(request.url.path)
+        status_code, delay = self.script.popleft() if self.script else (200, 0.0)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        if status_code != 429:
+            self.short_usage += 1
+            self.daily_usage += 1
+        if status_code >= 400:
+            body = {"message": "error", "errors": []}
+        return JSONResponse(body, status_code=status_code, headers=self._headers())
+
+    async def _activities(self, request: Request):
+        return await self._reply(request, self.activities)
+
+    async def _activity(self, request: Request, activity_id: int):
+        return await self._reply(request, {"id": activity_id, "name": f"Activity {activity_id}"})
+
+    async def _streams(self, request: Request, activity_id: int):
+        points = 60 * activity_id
+        return await self._reply(request, {
+            "time": {"data": list(range(points))},
+            "heartrate": {"data": [120 + i % 40 for i in range(points)]},
+            "distance": {"data": [3.0 * i for i in range(points)]},
+            "latlng": {"data": [[48.85, 2.35]] * points},
+        })
@@ -0,0 +1,70 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from services.activity_cache import ActivityCache
+
+
+def test_fresh_entry_is_served_without_calling_strava(mocker):
+    """
+    Test that a second lookup within the TTL is a cache hit.
+    """
+    fetch = mocker.patch('app.clients.strava_client.get_activities_if_modified',
+                         new_callable=AsyncMock, return_value=([{"id": 1}], '"v1"'))
+    cache = ActivityCache(ttl_seconds=60)
+
+    first = asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5))
+    second = asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5))
+
+    assert first == second == [{"id": 1}]
+    assert fetch.await_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_entry_is_revalidated_with_etag(mocker):
+    """
+    Test that an expired entry sends its ETag and keeps the cached list on 304.
+    """
+    fetch = mocker.patch('app.clients.strava_client.get_activities_if_modified',
+                         new_callable=AsyncMock, side_effect=[([{"id": 1}], '"v1"'), (None, '"v1"')])
+    cache = ActivityCache(ttl_seconds=0)
+
+    asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5))
+    activities = asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5))
+
+    assert activities == [{"id": 1}]
+    assert fetch.await_args.kwargs["etag"] == '"v1"'
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(mocker):
+    """
+    Test that the in-memory tier stays within its byte budget.
+    """
+    mocker.patch('app.clients.strava_client.get_activities_if_modified',
+                 new_callable=AsyncMock, return_value=([{"id": 1, "name": "Run"}], None))
+    cache = ActivityCache(ttl_seconds=60, max_bytes=40)
+
+    for athlete in ("athlete-1", "athlete-2", "athlete-3"):
+        asyncio.run(cache.get_activities(athlete, access_token="token", per_page=5))
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 2
+
+
+def test_entries_are_dropped_when_stored_activities_change(mocker):
+    """
+    Test that an upsert or delete for a user makes the next lookup fetch from Strava.
+    """
+    fetch = mocker.patch('app.clients.strava_client.get_activities_if_modified',
+                         new_callable=AsyncMock, return_value=([{"id": 1}], '"v1"'))
+    cache = ActivityCache(ttl_seconds=60)
+
+    asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5, user_uid="uid-1"))
+    asyncio.run(cache.on_activities("uid-1", [{"id": 2}]))
+    asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5, user_uid="uid-1"))
+    asyncio.run(cache.on_activities_deleted("uid-1", [1]))
+    asyncio.run(cache.get_activities("athlete-1", access_token="token", per_page=5, user_uid="uid-1"))
+
+    assert fetch.await_count == 3
+    assert cache.stats()["hits"] == 0
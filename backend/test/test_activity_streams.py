@@ -0,0 +1,59 @@
+import asyncio
+
+import numpy as np
+
+from services.activity_streams import ActivityStreamService, StreamStore, to_array
+
+
+def test_streams_round_trip_as_typed_memory_maps(tmp_path):
+    """
+    Test that stored streams load back as read-only memory maps with their storage dtype.
+    """
+    store = StreamStore(str(tmp_path))
+    store.save("uid", 1, {"heartrate": to_array("heartrate", [120, None, 131.6]),
+                          "latlng": to_array("latlng", [[48.85, 2.35], [48.86, 2.36], [48.87, 2.37]])})
+
+    streams = store.load("uid", 1)
+
+    assert isinstance(streams["heartrate"], np.memmap)
+    assert streams["heartrate"].dtype == np.int16
+    assert streams["heartrate"].tolist() == [120, 0, 132]
+    assert streams["latlng"].shape == (3, 2)
+    assert store.load("uid", 1, ["heartrate"]).keys() == {"heartrate"}
+    assert store.activity_ids("uid") == [1]
+
+
+def test_fetch_missing_runs_concurrently_and_skips_stored(tmp_path, mock_strava):
+    """
+    Test that missing streams are fetched with bounded concurrency and stored ones are skipped.
+    """
+    mock_strava.respond(200, delay=0.02, times=5)
+    store = StreamStore(str(tmp_path))
+    store.save("uid", 1, {})
+    service = ActivityStreamService(store, concurrency=3)
+
+    fetched = asyncio.run(service.fetch_missing("uid", "token", [1, 2, 3, 4, 5, 6]))
+
+    assert fetched == 5
+    assert mock_strava.max_in_flight == 3
+    assert "/api/v3/activities/1/streams" not in mock_strava.requests
+    streams = store.load("uid", 6)
+    assert streams["time"].dtype == np.int32 and len(streams["time"]) == 360
+
+
+def test_least_recently_used_streams_are_evicted_past_the_budget(tmp_path):
+    """
+    Test that saving past the byte budget deletes the least recently used activity, and that a reopened store
+    indexes what is on disk.
+    """
+    streams = {"time": to_array("time", list(range(1000)))}
+    store = StreamStore(str(tmp_path), max_bytes=10_000)
+    store.save("uid", 1, streams)
+    store.save("uid", 2, streams)
+    store.load("uid", 1)
+    store.save("uid", 3, streams)
+
+    assert store.activity_ids("uid") == [1, 3]
+    assert not store.has("uid", 2)
+    assert store.evictions == 1
+    assert StreamStore(str(tmp_path)).stored_bytes() == store.stored_bytes() <= 10_000
@@ -0,0 +1,32 @@
+from services.activity_summary import format_activity_context, summarize_activities
+
+
+def test_summary_keeps_only_typed_prompt_fields():
+    """
+    Test that raw Strava fields such as polylines are dropped from the summary.
+    """
+    activities = [{"id": 1, "sport_type": "Run", "start_date_local": "2025-01-06T08:00:00Z",
+                   "distance": 10000, "moving_time": 3000, "total_elevation_gain": 50,
+                   "average_heartrate": 150, "map": {"summary_polyline": "abc"}}]
+
+    summary = summarize_activities(activities)
+
+    assert list(summary.columns) == ["sport", "date", "elevation_m", "avg_hr", "max_hr",
+                                     "distance_km", "moving_min", "load"]
+    assert summary.loc[0, "distance_km"] == 10.0
+    assert summary.loc[0, "moving_min"] == 50.0
+
+
+def test_activity_context_includes_weekly_volume_and_trend():
+    """
+    Test the compact prompt context for a two-week history.
+    """
+    activities = [{"type": "Ride", "start_date_local": f"2025-01-{day:02d}T08:00:00Z",
+                   "distance": 20000, "moving_time": 3600} for day in (6, 8, 13, 14, 15)]
+
+    context = format_activity_context(activities)
+
+    assert context.splitlines()[0] == "2025-01-15 Ride 20.0km 60min"
+    assert "2025-01-06: 2 sessions, 40.0km, 120min, load 120" in context
+    assert "2025-01-13: 3 sessions, 60.0km, 180min, load 180" in context
+    assert "Training load trend: +50%" in context
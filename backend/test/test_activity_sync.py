@@ -0,0 +1,105 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from fake_firestore import FakeFirestore
+from services.activity_store import ActivityStore, InvalidCursor, activity_start_ts
+from services.activity_sync import ActivitySyncService
+
+
+class InMemoryActivityStore:
+    def __init__(self):
+        self.activities = {}
+        self.state = {}
+
+    async def get_sync_state(self, user_uid):
+        return dict(self.state)
+
+    async def update_sync_state(self, user_uid, **state):
+        self.state.update(state)
+
+    async def upsert_activities(self, user_uid, activities):
+        for activity in activities:
+            self.activities[activity['id']] = activity
+        return len(activities)
+
+
+def _activity(activity_id, day):
+    return {"id": activity_id, "start_date": f"2025-01-{day:02d}T08:00:00Z"}
+
+
+def test_sync_recent_only_requests_newer_activities(mocker):
+    """
+    Test that a second sync passes the newest stored start time as `after`, and that the backfill starts
+    before the oldest activity of the first sync.
+    """
+    fetch = mocker.patch('app.clients.strava_client.get_activities', new_callable=AsyncMock,
+                         side_effect=[[_activity(2, 2), _activity(1, 1)], [_activity(3, 3)]])
+    store = InMemoryActivityStore()
+    sync = ActivitySyncService(store, page_size=10, min_interval_seconds=0)
+
+    asyncio.run(sync.sync_recent("uid", "token"))
+    asyncio.run(sync.sync_recent("uid", "token"))
+
+    assert fetch.await_args_list[0].kwargs["after"] is None
+    assert fetch.await_args_list[1].kwargs["after"] == activity_start_ts(_activity(2, 2))
+    assert store.state["backfill_before_ts"] == activity_start_ts(_activity(1, 1))
+    assert sorted(store.activities) == [1, 2, 3]
+
+
+def test_backfill_pages_concurrently_until_short_page(mocker):
+    """
+    Test that backfill fetches pages in concurrent batches and stops on a short page.
+    """
+    pages = {1: [_activity(4, 4), _activity(3, 3)], 2: [_activity(2, 2), _activity(1, 1)], 3: [_activity(0, 1)], 4: []}
+
+    async def fake_get_activities(access_token, per_page, page, before, priority):
+        return pages[page]
+
+    mocker.patch('app.clients.strava_client.get_activities', side_effect=fake_get_activities)
+    store = InMemoryActivityStore()
+    sync = ActivitySyncService(store, page_size=2, backfill_concurrency=2)
+
+    synced = asyncio.run(sync.backfill("uid", "token"))
+    again = asyncio.run(sync.backfill("uid", "token"))
+
+    assert synced == 5
+    assert again is None
+    assert store.state["backfill_complete"] is True
+    assert store.state["backfill_next_page"] == 5
+
+
+def test_list_activities_pages_with_a_cursor():
+    """
+    Test that pages resume after the previous page's cursor, with activities sharing a start time kept in order.
+    """
+    store = ActivityStore(FakeFirestore())
+    asyncio.run(store.upsert_activities("uid", [_activity(i, 1 + i // 2) for i in range(5)]))
+
+    first, cursor = asyncio.run(store.list_activities("uid", per_page=2))
+    second, cursor = asyncio.run(store.list_activities("uid", per_page=2, cursor=cursor))
+    third, last = asyncio.run(store.list_activities("uid", per_page=2, cursor=cursor))
+
+    assert [a["id"] for a in first + second + third] == [4, 3, 2, 1, 0]
+    assert last is None
+    with pytest.raises(InvalidCursor):
+        asyncio.run(store.list_activities("uid", per_page=2, cursor="not-a-cursor"))
+
+
+def test_streams_are_only_looked_for_after_new_activities(mocker):
+    """
+    Test that a completed backfill with nothing new synced does not list activities for missing streams.
+    """
+    from services.strava_service import StravaService
+
+    store = InMemoryActivityStore()
+    store.state["backfill_complete"] = True
+    service = StravaService(FakeFirestore(), ActivitySyncService(store), token_manager=None,
+                            stream_service=mocker.Mock())
+    sync_streams = mocker.patch.object(service, "sync_streams", AsyncMock(return_value=0))
+
+    asyncio.run(service.backfill_activities("uid", "token"))
+    asyncio.run(service.backfill_activities("uid", "token", synced=2))
+
+    assert sync_streams.await_count == 1
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from fake_firestore import FakeFirestore
+from services.activity_store import ActivityStore, activity_start_ts
+from services.analytics import CTL_DAYS, ATL_DAYS, analytics_report, best_effort_seconds, compute_state, update_state
+from services.analytics_service import AnalyticsService
+
+
+def _run(activity_id, day, distance_km=10.0, minutes=50, avg_hr=150):
+    start = datetime(2024, 1, 1, 7, 0) + timedelta(days=day)
+    return {"id": activity_id, "sport_type": "Run", "start_date": start.isoformat() + "Z",
+            "distance": distance_km * 1000, "moving_time": minutes * 60, "total_elevation_gain": 50,
+            "average_heartrate": avg_hr, "max_heartrate": 185}
+
+
+def test_fitness_and_fatigue_follow_the_daily_load():
+    """
+    Test that CTL and ATL match the closed form of a constant daily load.
+    """
+    history = [_run(i, i, avg_hr=140) for i in range(30)]
+
+    state = compute_state(history)
+
+    assert state["ctl"] == pytest.approx(50 * (1 - (1 - 1 / CTL_DAYS) ** 30))
+    assert state["atl"] == pytest.approx(50 * (1 - (1 - 1 / ATL_DAYS) ** 30))
+
+
+def test_incremental_update_matches_a_full_recompute():
+    """
+    Test that folding new activities into a state gives the same metrics as recomputing.
+    """
+    history = [_run(i, day, distance_km=5 + i % 7, minutes=30 + i % 20) for i, day in enumerate(range(0, 120, 2))]
+
+    incremental = update_state(compute_state(history[:40]), history[40:])
+    full = compute_state(history)
+
+    assert incremental["ctl"] == pytest.approx(full["ctl"])
+    assert incremental["atl"] == pytest.approx(full["atl"])
+    assert incremental["weekly"].keys() == full["weekly"].keys()
+    for week, volume in full["weekly"].items():
+        assert incremental["weekly"][week] == pytest.approx(volume)
+    assert incremental["hr_zones_min"] == pytest.approx(full["hr_zones_min"])
+    assert incremental["best_efforts"] == full["best_efforts"]
+    assert incremental["activities"] == 60
+
+
+def test_older_activity_requires_a_recompute():
+    """
+    Test that a backfilled activity older than the state cannot be folded in.
+    """
+    state = compute_state([_run(1, 10)])
+
+    assert update_state(state, [_run(2, 5)]) is None
+
+
+def test_best_effort_from_streams():
+    """
+    Test that the fastest stretch of a run is found in its distance stream.
+    """
+    seconds = np.arange(0, 3601, dtype=np.float64)
+    speed = np.where((seconds > 1000) & (seconds <= 2000), 5.0, 3.0)
+    distance = np.concatenate([[0.0], np.cumsum(speed[1:])])
+
+    assert best_effort_seconds(distance, seconds, 5000) == pytest.approx(1000)
+    assert best_effort_seconds(distance, seconds, 50000) is None
+
+
+def test_service_folds_new_activities_into_the_stored_state():
+    """
+    Test that the listener updates the stored state without rereading the history.
+    """
+    firestore_db = FakeFirestore()
+    store = ActivityStore(firestore_db)
+    service = AnalyticsService(store, firestore_db)
+
+    async def run():
+        await store.upsert_activities("uid", [_run(1, 0), _run(2, 1)])
+        await service.on_activities("uid", [_run(1, 0), _run(2, 1)])
+        await service.on_activities("uid", [_run(3, 2)])
+        return await service.get_report("uid")
+
+    report = asyncio.run(run())
+
+    assert (service.recomputes, service.updates) == (1, 1)
+    assert report["activities"] == 3
+    assert report["personal_bests"]["Run"]["longest_km"]["value"] == 10.0
+    assert report["best_efforts"]["10k"]["value"] == 3000.0
+    assert analytics_report(compute_state([]))["fitness"]["ctl"] == 0
+
+
+def test_backfill_pages_are_recomputed_once_when_the_backfill_completes():
+    """
+    Test that older activities stored during a backfill defer the recompute to its completion, and a delete recomputes.
+    """
+    firestore_db = FakeFirestore()
+    store = ActivityStore(firestore_db)
+    service = AnalyticsService(store, firestore_db)
+    store.add_listener(service.on_activities)
+    store.add_delete_listener(service.on_activities_deleted)
+    store.add_sync_listener(service.on_sync_state)
+
+    async def settle():
+        while store._notifications:
+            await asyncio.gather(*store._notifications)
+
+    async def run():
+        before_ts = activity_start_ts(_run(10, 10))
+        await store.upsert_activities("uid", [_run(10, 10)])
+        await store.update_sync_state("uid", backfill_before_ts=before_ts)
+        await settle()
+        for day in range(3):
+            await store.upsert_activities("uid", [_run(day, day)])
+            await store.update_sync_state("uid", backfill_before_ts=before_ts, backfill_complete=False)
+            await settle()
+        during_backfill = service.recomputes
+        await store.update_sync_state("uid", backfill_before_ts=before_ts, backfill_complete=True)
+        await settle()
+        after_backfill = service.recomputes
+        await store.delete_activity("uid", 10)
+        await settle()
+        return during_backfill, after_backfill, await service.get_report("uid")
+
+    during_backfill, after_backfill, report = asyncio.run(run())
+
+    assert (during_backfill, after_backfill, service.recomputes) == (1, 2, 3)
+    assert report["activities"] == 3
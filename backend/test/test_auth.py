@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from app.auth import VerifiedTokenCache, get_current_user, token_cache
+
+
+def test_verified_token_is_not_verified_again(mock_auth):
+    """
+    Test that a warm token skips Firebase verification.
+    """
+    token_cache.clear()
+    mock_auth.reset_mock()
+    mock_auth.return_value = {'uid': 'test_user_uid', 'exp': time.time() + 3600}
+    try:
+        first = asyncio.run(get_current_user("warm-token"))
+        second = asyncio.run(get_current_user("warm-token"))
+    finally:
+        mock_auth.return_value = {'uid': 'test_user_uid'}
+        token_cache.clear()
+
+    assert first == second
+    assert mock_auth.call_count == 1
+
+
+def test_expired_token_is_not_served_from_cache():
+    """
+    Test that cached claims are dropped once the token's exp claim has passed.
+    """
+    cache = VerifiedTokenCache()
+    cache.put("old-token", {'uid': 'test_user_uid', 'exp': time.time() - 1})
+
+    assert cache.get("old-token") is None
+    assert cache.misses == 1
@@ -0,0 +1,88 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, choose_encoding
+from app.responses import FastJSONResponse
+
+ITEMS = [{"id": index, "name": "Morning Run", "type": "Run"} for index in range(100)]
+
+
+class Timestamp(datetime):
+    """Firestore timestamps are datetime subclasses."""
+
+
+def _client():
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/items")
+    def get_items(count: int = 100):
+        return FastJSONResponse(ITEMS[:count], headers={"ETag": '"v1"'})
+
+    @app.get("/events")
+    def get_events():
+        return StreamingResponse(iter(["data: x\n\n"] * 100), media_type="text/event-stream")
+
+    @app.get("/export")
+    def get_export():
+        return StreamingResponse((json.dumps(item) + "\n" for item in ITEMS), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    """
+    Test that the encoding follows the q-values of Accept-Encoding and falls back to identity.
+    """
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") == choose_encoding("br, gzip")
+    assert choose_encoding("identity") is None
+
+
+def test_large_json_is_gzipped_and_small_is_not():
+    """
+    Test that a JSON body above the size threshold is gzipped with a weak ETag, and a small one is sent as is.
+    """
+    client = _client()
+
+    response = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    raw = client.get("/items", headers={"Accept-Encoding": "gzip"}, params={"count": 2})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == ITEMS
+    assert "content-encoding" not in raw.headers
+    assert raw.headers["etag"] == '"v1"'
+
+
+def test_streams_are_compressed_but_event_streams_are_not():
+    """
+    Test that an NDJSON stream is gzipped chunk by chunk and Server-Sent Events pass through.
+    """
+    client = _client()
+
+    with client.stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as response:
+        body = b"".join(response.iter_raw())
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line) for line in gzip.decompress(body).splitlines()] == ITEMS
+    assert "content-encoding" not in events.headers
+
+
+def test_fast_json_response_serializes_timestamps():
+    """
+    Test that datetime subclasses render as ISO timestamps, like FastAPI's encoder renders them.
+    """
+    created_at = Timestamp(2025, 1, 1, 8, 30, tzinfo=timezone.utc)
+
+    body = FastJSONResponse({"created_at": created_at, "plain": datetime(2025, 1, 2)}).body
+
+    assert json.loads(body) == {"created_at": "2025-01-01T08:30:00+00:00", "plain": "2025-01-02T00:00:00"}
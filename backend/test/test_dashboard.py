@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime
+
+from fake_firestore import FakeFirestore
+from services.activity_store import ActivityStore
+from services.analytics_service import AnalyticsService
+from services.dashboard import DashboardService
+from services.workout_store import WorkoutStore
+
+
+def _activity(activity_id, day):
+    return {"id": activity_id, "name": f"Run {activity_id}", "type": "Run", "sport_type": "Run",
+            "start_date": f"2024-03-{day:02d}T07:00:00Z", "start_date_local": f"2024-03-{day:02d}T08:00:00",
+            "distance": 10000.0, "moving_time": 3000, "average_heartrate": 150, "map": {"polyline": "x" * 500}}
+
+
+def _services(db):
+    activity_store = ActivityStore(db)
+    workout_store = WorkoutStore(db)
+    analytics = AnalyticsService(activity_store, db)
+    dashboard = DashboardService(db, activity_store, workout_store, analytics)
+    activity_store.add_listener(analytics.on_activities)
+    activity_store.add_listener(dashboard.on_activities)
+    activity_store.add_delete_listener(analytics.on_activities_deleted)
+    activity_store.add_delete_listener(dashboard.on_activities_deleted)
+    analytics.add_listener(dashboard.on_analytics)
+    return activity_store, workout_store, analytics, dashboard
+
+
+async def _settle():
+    # Let listener tasks and the rebuilds they schedule finish
+    for _ in range(20):
+        await asyncio.sleep(0)
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def test_dashboard_is_built_once_and_served_with_one_read():
+    """
+    Test that the dashboard holds its inputs and later requests read only the stored document.
+    """
+    db = FakeFirestore()
+    db.collection('users').document('u1').set({'profile': {'goal': '10k'},
+                                               'strava_tokens': {'access_token': 'token'}})
+
+    async def scenario():
+        activity_store, workout_store, _, dashboard = _services(db)
+        await activity_store.upsert_activities('u1', [_activity(1, 1), _activity(2, 2)])
+        await workout_store.save_workouts('u1', [{'suggestion': 'Intervals', 'created_at': datetime(2024, 3, 3)}])
+        await _settle()
+        await dashboard.refresh('u1')
+
+        reads = db.reads
+        document = await dashboard.get('u1')
+        return document, db.reads - reads
+
+    document, reads = asyncio.run(scenario())
+
+    assert reads == 1
+    assert document["strava_connected"] is True
+    assert document["profile"] == {'goal': '10k'}
+    assert [activity["id"] for activity in document["recent_activities"]] == [2, 1]
+    assert "map" not in document["recent_activities"][0]
+    assert document["latest_workout"]["suggestion"] == 'Intervals'
+    assert document["metrics"]["activities"] == 2
+
+
+def test_version_changes_only_with_the_inputs():
+    """
+    Test that rebuilding unchanged inputs keeps the version and a new activity changes it.
+    """
+    db = FakeFirestore()
+
+    async def scenario():
+        activity_store, _, _, dashboard = _services(db)
+        await activity_store.upsert_activities('u1', [_activity(1, 1)])
+        await _settle()
+        first = await dashboard.build('u1')
+        again = await dashboard.build('u1')
+        await activity_store.upsert_activities('u1', [_activity(2, 2)])
+        await _settle()
+        return first, again, await dashboard.get('u1')
+
+    first, again, changed = asyncio.run(scenario())
+
+    assert first["version"] == again["version"]
+    assert changed["version"] != first["version"]
+    assert changed["recent_activities"][0]["id"] == 2
+
+
+def test_invalidations_are_coalesced():
+    """
+    Test that changes arriving during a rebuild cause a single further rebuild.
+    """
+    db = FakeFirestore()
+
+    async def scenario():
+        _, _, _, dashboard = _services(db)
+        for _ in range(10):
+            dashboard.invalidate('u1')
+        await _settle()
+        return dashboard.builds
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_deleted_activity_leaves_the_dashboard():
+    """
+    Test that deleting an activity rebuilds the dashboard without it.
+    """
+    db = FakeFirestore()
+
+    async def scenario():
+        activity_store, _, _, dashboard = _services(db)
+        await activity_store.upsert_activities('u1', [_activity(1, 1), _activity(2, 2)])
+        await _settle()
+        await activity_store.delete_activity('u1', 2)
+        # The delete rebuilds the dashboard, the recompute it triggers rebuilds it again
+        await _settle()
+        await _settle()
+        return await dashboard.get('u1')
+
+    document = asyncio.run(scenario())
+
+    assert [activity["id"] for activity in document["recent_activities"]] == [1]
+    assert document["metrics"]["activities"] == 1
@@ -0,0 +1,151 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fake_firestore import FakeFirestore
+from services.activity_store import ActivityStore
+from services.data_transfer import InvalidImportLine, export_user_data, import_user_data
+from services.workout_store import WorkoutStore
+
+
+def _stores(firestore_db):
+    return WorkoutStore(firestore_db), ActivityStore(firestore_db)
+
+
+def _workouts(count):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [{'suggestion': f'Workout {i}', 'created_at': start + timedelta(minutes=i)} for i in range(count)]
+
+
+async def _export(firestore_db, user_uid):
+    return [line async for line in export_user_data(*_stores(firestore_db), user_uid)]
+
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_save_workouts_commits_in_batches_of_500():
+    """
+    Test that a bulk save of 1200 workouts takes three batched commits.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, _ = _stores(firestore_db)
+
+    workout_ids = asyncio.run(workout_store.save_workouts("uid", _workouts(1200)))
+
+    assert len(set(workout_ids)) == 1200
+    assert firestore_db.commits == 3
+
+
+def test_list_workouts_pages_through_history():
+    """
+    Test that following the cursors visits every workout once, newest first.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, _ = _stores(firestore_db)
+    asyncio.run(workout_store.save_workouts("uid", _workouts(25)))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = asyncio.run(workout_store.list_workouts("uid", limit=10, cursor=cursor, fields=['created_at']))
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 25
+    assert [w['created_at'] for w in seen] == sorted((w['created_at'] for w in seen), reverse=True)
+    assert 'suggestion' not in seen[0]
+
+
+def test_export_then_import_round_trip():
+    """
+    Test that an NDJSON export imports back into another user unchanged, from a chunked stream.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, activity_store = _stores(firestore_db)
+    asyncio.run(workout_store.save_workouts("uid", _workouts(3)))
+    asyncio.run(activity_store.upsert_activities("uid", [
+        {"id": i, "name": f"Run {i}", "start_date": f"2025-01-{i:02d}T08:00:00Z"} for i in range(1, 4)]))
+
+    lines = asyncio.run(_export(firestore_db, "uid"))
+    assert [json.loads(line)["type"] for line in lines] == ["workout"] * 3 + ["activity"] * 3
+
+    counts = asyncio.run(import_user_data(
+        workout_store, activity_store, "other_uid", _chunks("".join(lines).encode(), 7)))
+
+    assert counts == {"workouts": 3, "activities": 3}
+    assert asyncio.run(_export(firestore_db, "other_uid")) == lines
+
+
+def test_import_rejects_malformed_lines():
+    """
+    Test that an unknown record type is reported with its line number.
+    """
+    workout_store, activity_store = _stores(FakeFirestore())
+    body = (b'{"type": "workout", "data": {"suggestion": "ok", "created_at": "2025-01-01T00:00:00+00:00"}}\n'
+            b'{"type": "note", "data": {}}\n')
+
+    with pytest.raises(InvalidImportLine, match="line 2"):
+        asyncio.run(import_user_data(workout_store, activity_store, "uid", _chunks(body, 1024)))
+
+
+@pytest.mark.parametrize("data", [
+    {"created_at": "2025-01-01T00:00:00+00:00"},
+    {"suggestion": "ok"},
+    {"suggestion": "ok", "created_at": "yesterday"},
+    {"summary": "Plan", "plan": {"days": {"d2": {"title": "Day", "exercises": []}}},
+     "created_at": "2025-01-01T00:00:00+00:00"},
+    {"summary": "Plan", "plan": {"days": {"d1": {"title": "Day", "exercises": [{"name": "Squat"}]}}},
+     "created_at": "2025-01-01T00:00:00+00:00"},
+])
+def test_import_rejects_workouts_that_were_not_saved_workouts(data):
+    """
+    Test that a workout needs a suggestion or a well-formed plan, and a parseable created_at, to be written.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, activity_store = _stores(firestore_db)
+    body = json.dumps({"type": "workout", "data": data}).encode()
+
+    with pytest.raises(InvalidImportLine, match="line 1"):
+        asyncio.run(import_user_data(workout_store, activity_store, "uid", _chunks(body, 1024)))
+    assert firestore_db.writes == 0
+
+
+@pytest.mark.parametrize("data", [
+    [1, 2],
+    {"name": "Run", "start_date": "2025-01-01T08:00:00Z"},
+    {"id": "1", "start_date": "2025-01-01T08:00:00Z"},
+    {"id": 1},
+    {"id": 1, "start_date": "yesterday"},
+])
+def test_import_rejects_activities_that_were_not_synced_activities(data):
+    """
+    Test that an activity needs an integer id and a parseable start_date, and is reported with its line number.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, activity_store = _stores(firestore_db)
+    body = (b'{"type": "activity", "data": {"id": 1, "start_date": "2025-01-01T08:00:00Z"}}\n'
+            + json.dumps({"type": "activity", "data": data}).encode())
+
+    with pytest.raises(InvalidImportLine, match="line 2"):
+        asyncio.run(import_user_data(workout_store, activity_store, "uid", _chunks(body, 1024)))
+    assert firestore_db.writes == 0
+
+
+def test_ordered_queries_keep_null_values():
+    """
+    Test that the fake orders nulls first ascending and last descending, and leaves out missing fields, as Firestore does.
+    """
+    collection = FakeFirestore().collection("rows")
+    for doc_id, data in (("a", {"rank": 2}), ("b", {"rank": None}), ("c", {}), ("d", {"rank": 1})):
+        collection.document(doc_id).set(data)
+
+    ascending = [snapshot.id for snapshot in collection.order_by("rank").stream()]
+    descending = [snapshot.id for snapshot in collection.order_by("rank", direction="DESCENDING").stream()]
+
+    assert ascending == ["b", "d", "a"]
+    assert descending == ["a", "d", "b"]
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app import inference
+from app.ai_client import parse_backends
+from app.inference import InferenceBackend, InferenceRouter, LlamaCppBackend
+
+
+class FakeBackend(InferenceBackend):
+    def __init__(self, name, latency=0.0, fail=False, local=False, chunks=("Plan",)):
+        super().__init__(name, f"model-{name}")
+        self.latency = latency
+        self.fail = fail
+        self.local = local
+        self.chunks = chunks
+        self.closed_streams = 0
+
+    async def chat_completion(self, messages, stream=False, **options):
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        if stream:
+            return self._stream()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"Plan from {self.name}"))])
+
+    async def _stream(self):
+        try:
+            for chunk in self.chunks:
+                yield chunk
+                await asyncio.sleep(self.latency)
+        finally:
+            self.closed_streams += 1
+
+
+def _content(completion):
+    return completion.choices[0].message.content
+
+
+def test_slow_backend_is_hedged_and_cancelled(monkeypatch):
+    """
+    Test that a call over its budget is sent to the next backend, which wins while the slow call is cancelled.
+    """
+    monkeypatch.setattr(inference, "AI_HEDGE_DEFAULT_SECONDS", 0.02)
+    slow, fast = FakeBackend("slow", latency=1.0), FakeBackend("fast", latency=0.01)
+    router = InferenceRouter([slow, fast])
+
+    completion = asyncio.run(router.chat_completion([{"role": "user", "content": "Plan"}]))
+
+    assert _content(completion) == "Plan from fast"
+    assert router.hedges == 1
+    assert fast.hedge_wins == 1
+    assert slow.timings["complete"].cancelled == 1
+    assert router.candidates("complete") == [fast, slow]
+
+
+def test_failures_fall_back_to_the_local_backend(monkeypatch):
+    """
+    Test that failed calls move on to the next backend, and that a backend failing repeatedly ranks last.
+    """
+    monkeypatch.setattr(inference, "AI_BACKEND_FAILURES", 2)
+    down, local = FakeBackend("down", fail=True), FakeBackend("local", local=True)
+    flaky = FakeBackend("flaky", fail=True)
+    router = InferenceRouter([down, flaky, local])
+
+    first = asyncio.run(router.chat_completion([]))
+    second = asyncio.run(router.chat_completion([]))
+
+    assert (_content(first), _content(second)) == ("Plan from local", "Plan from local")
+    assert down.timings["complete"].errors == 2
+    assert not down.available(inference.time.monotonic())
+    local.fail = True
+    with pytest.raises(RuntimeError, match="local is down"):
+        asyncio.run(router.chat_completion([]))
+
+
+def test_streams_are_hedged_on_their_first_chunk(monkeypatch):
+    """
+    Test that the stream answering first is returned whole, and the loser's stream is closed.
+    """
+    monkeypatch.setattr(inference, "AI_HEDGE_DEFAULT_SECONDS", 0.02)
+    slow = FakeBackend("slow", latency=0.5)
+    fast = FakeBackend("fast", latency=0.001, chunks=("Warm", " up"))
+    router = InferenceRouter([slow, fast])
+
+    async def scenario():
+        stream = await router.chat_completion([], stream=True)
+        chunks = [chunk async for chunk in stream]
+        return chunks
+
+    assert asyncio.run(scenario()) == ["Warm", " up"]
+    assert fast.closed_streams == 1
+    assert fast.timings["stream"].calls == 1
+    assert slow.timings["stream"].cancelled == 1
+
+
+def test_backend_configuration():
+    """
+    Test that AI_BACKENDS entries name a model and an optional server, and that JSON plans keep their schema locally.
+    """
+    assert parse_backends("router=org/model, endpoint=org/model@https://endpoint.example") == [
+        ("router", "org/model", None), ("endpoint", "org/model", "https://endpoint.example")]
+    with pytest.raises(ValueError):
+        parse_backends("missing-model")
+
+    options = LlamaCppBackend("local", "/models/small.gguf")._options(
+        {"max_tokens": 100, "response_format": {"type": "json_schema", "json_schema": {"schema": {"type": "object"}}}})
+
+    assert options == {"max_tokens": 100, "response_format": {"type": "json_object", "schema": {"type": "object"}}}
+
+
+def test_local_only_router_explains_what_is_missing(monkeypatch):
+    """
+    Test that embeddings without a remote backend, and a local backend without llama-cpp-python, fail with a clear error.
+    """
+    monkeypatch.setitem(sys.modules, "llama_cpp", None)
+    router = InferenceRouter([FakeBackend("local", local=True)])
+
+    with pytest.raises(RuntimeError, match="remote inference backend"):
+        asyncio.run(router.feature_extraction("goal: build endurance"))
+    with pytest.raises(RuntimeError, match="llama-cpp-python"):
+        LlamaCppBackend("local", "/models/small.gguf")._load()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from services.job_queue import JobQueue, JobQueueFull
+
+
+def test_identical_in_flight_jobs_are_coalesced():
+    """
+    Test that jobs with the same key share one execution and one result.
+    """
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"suggestion": "Plan"}
+
+    async def scenario():
+        queue = JobQueue(workers=2)
+        queue.start()
+        first = queue.submit("same-request", "uid-1", generate)
+        second = queue.submit("same-request", "uid-2", generate)
+        await queue.wait(first, timeout=1)
+        metrics = queue.metrics()
+        await queue.stop()
+        return first, second, metrics
+
+    first, second, metrics = asyncio.run(scenario())
+
+    assert first is second
+    assert first.status == "done"
+    assert first.result == {"suggestion": "Plan"}
+    assert first.owners == {"uid-1", "uid-2"}
+    assert len(calls) == 1
+    assert metrics["coalesced"] == 1
+    assert metrics["wait_ms_p95"] is not None
+
+
+def test_full_queue_rejects_new_jobs():
+    """
+    Test that the bounded queue applies backpressure instead of growing.
+    """
+    async def scenario():
+        queue = JobQueue(workers=1, max_queue=1)
+        queue.start()
+        blocker = asyncio.Event()
+        queue.submit("running", "uid", blocker.wait)
+        await asyncio.sleep(0)
+        queue.submit("queued", "uid", blocker.wait)
+        try:
+            with pytest.raises(JobQueueFull):
+                queue.submit("rejected", "uid", blocker.wait)
+            return queue.metrics()
+        finally:
+            blocker.set()
+            await queue.stop()
+
+    metrics = asyncio.run(scenario())
+
+    assert metrics["rejected"] == 1
+    assert metrics["queue_depth"] == 1
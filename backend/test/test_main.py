@@ -1,5 +1,15 @@
+import pytest
 from unittest.mock import MagicMock
 
+
+@pytest.fixture(autouse=True)
+def clear_suggestion_cache(client):
+    """
+    Keeps cached suggestions from leaking between tests.
+    """
+    from app.main import suggestion_cache
+    suggestion_cache.clear()
+
 def test_get_strava_auth_url(client):
     """
     Test the endpoint for getting the Strava authorization URL.
@@ -101,6 +111,34 @@ def test_suggest_workout_no_strava_data(client, mocker, firestore_db_mock):
     assert response.json() == {"suggestion": "Here is a general workout..."}
 
 
+def test_suggest_workout_retries_an_invalid_plan_as_text(client, mocker, firestore_db_mock):
+    """
+    Test that a plan cut off by the token limit is asked for again as text, and that text
+    cut off as well is answered but not cached.
+    """
+    from app.main import suggestion_cache
+    mock_user_doc = MagicMock()
+    mock_user_doc.exists = False
+    firestore_db_mock.collection.return_value.document.return_value.get.return_value = mock_user_doc
+
+    truncated_plan, truncated_text = MagicMock(), MagicMock()
+    truncated_plan.choices[0].message.content = '{"summary": "Full body", "days": [{"title": "Day 1"'
+    truncated_plan.choices[0].finish_reason = "length"
+    truncated_text.choices[0].message.content = "Here is a general workout..."
+    truncated_text.choices[0].finish_reason = "length"
+    chat_completion = mocker.patch('app.ai_client.client.chat_completion',
+                                   side_effect=[truncated_plan, truncated_text])
+
+    response = client.post("/api/v1/ai/suggest_workout", json={"goal": "Get Fit", "time": 30},
+                           headers={"Authorization": "Bearer fake-token"})
+
+    assert response.status_code == 200
+    assert response.json() == {"suggestion": "Here is a general workout..."}
+    assert "response_format" in chat_completion.call_args_list[0].kwargs
+    assert "response_format" not in chat_completion.call_args_list[1].kwargs
+    assert suggestion_cache.stats()["entries"] == 0
+
+
 def test_get_latest_workout_success(client, firestore_db_mock):
     """
     Test successfully retrieving the latest workout.
@@ -116,7 +154,7 @@ def test_get_latest_workout_success(client, firestore_db_mock):
     mock_stream = MagicMock()
     mock_stream.return_value = [mock_workout_doc]
 
-    firestore_db_mock.collection.return_value.document.return_value.collection.return_value.order_by.return_value.limit.return_value.stream = mock_stream
+    firestore_db_mock.collection.return_value.document.return_value.collection.return_value.order_by.return_value.order_by.return_value.limit.return_value.stream = mock_stream
 
     response = client.get("/api/v1/get_latest_workout",
                           headers={"Authorization": "Bearer fake-token"})
@@ -124,3 +162,148 @@ def test_get_latest_workout_success(client, firestore_db_mock):
     assert response.status_code == 200
     assert response.json() == [{**mock_workout_data, 'id': "workout_id_123"}]
 
+
+
+def test_suggest_workout_stream(client, mocker, firestore_db_mock):
+    """
+    Test that the streaming endpoint forwards tokens as Server-Sent Events.
+    """
+    mock_user_doc = MagicMock()
+    mock_user_doc.exists = False
+    firestore_db_mock.collection.return_value.document.return_value.get.return_value = mock_user_doc
+
+    async def fake_stream():
+        for content in ["Day 1", " – Squats"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = content
+            yield chunk
+
+    mocker.patch('app.ai_client.client.chat_completion', return_value=fake_stream())
+
+    request_body = {"goal": "Get Fit", "time": 30}
+    response = client.post("/api/v1/ai/suggest_workout/stream", json=request_body,
+                           headers={"Authorization": "Bearer fake-token"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: token\ndata: {"content": "Day 1"}' in response.text
+    assert 'event: token\ndata: {"content": " \\u2013 Squats"}' in response.text
+    assert "event: done" in response.text
+
+
+def test_suggest_workout_on_job_queue(client, mocker, firestore_db_mock):
+    """
+    Test that a queued suggestion can be waited on and then polled by job id.
+    """
+    mock_user_doc = MagicMock()
+    mock_user_doc.exists = False
+    firestore_db_mock.collection.return_value.document.return_value.get.return_value = mock_user_doc
+
+    mock_ai_response = MagicMock()
+    mock_ai_response.choices[0].message.content = "Queued workout..."
+    mocker.patch('app.ai_client.client.chat_completion', return_value=mock_ai_response)
+
+    response = client.post("/api/v1/ai/suggest_workout", params={"queue": True},
+                           json={"goal": "Get Strong", "time": 20},
+                           headers={"Authorization": "Bearer fake-token"})
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(50):
+        job = client.get(f"/api/v1/ai/jobs/{job_id}", headers={"Authorization": "Bearer fake-token"}).json()
+        if job["status"] == "done":
+            break
+    assert job["result"]["suggestion"] == "Queued workout..."
+
+
+def test_get_user_profile_reads_user_doc_once(client, firestore_db_mock):
+    """
+    Test that the user document is loaded once per request and decoded into the user context.
+    """
+    mock_user_doc = MagicMock()
+    mock_user_doc.exists = True
+    mock_user_doc.to_dict.return_value = {'profile': {'name': 'Test'}}
+    get_user_doc = firestore_db_mock.collection.return_value.document.return_value.get
+    get_user_doc.reset_mock()
+    get_user_doc.return_value = mock_user_doc
+
+    response = client.get("/api/v1/user/profile", headers={"Authorization": "Bearer fake-token"})
+
+    assert response.status_code == 200
+    assert response.json() == {'name': 'Test'}
+    assert get_user_doc.call_count == 1
+
+
+def test_get_user_profile_failure(client, firestore_db_mock):
+    """
+    Test that a failed read of the user document is answered with a 500.
+    """
+    from app.main import user_context_cache
+    user_context_cache.invalidate("test_user_uid")
+    firestore_db_mock.collection.return_value.document.return_value.get.side_effect = Exception("unavailable")
+
+    response = client.get("/api/v1/user/profile", headers={"Authorization": "Bearer fake-token"})
+
+    firestore_db_mock.collection.return_value.document.return_value.get.side_effect = None
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Failed to fetch profile."}
+
+
+def test_get_dashboard_answers_conditional_requests(client, monkeypatch):
+    """
+    Test that the dashboard is sent with an ETag and a matching If-None-Match gets a 304,
+    and that a connected user's activities are synced in the background, once per sync interval.
+    """
+    from app import main
+    from fake_firestore import FakeFirestore
+    from services.activity_store import ActivityStore
+    from services.analytics_service import AnalyticsService
+    from services.dashboard import DashboardService
+    from services.workout_store import WorkoutStore
+
+    db = FakeFirestore()
+    db.collection('users').document('test_user_uid').set({'strava_tokens': {'access_token': 'token'}})
+    activity_store = ActivityStore(db)
+    monkeypatch.setattr(main, "dashboard_service", DashboardService(
+        db, activity_store, WorkoutStore(db), AnalyticsService(activity_store, db)))
+    synced = []
+
+    async def sync_activities(user_uid):
+        synced.append(user_uid)
+
+    monkeypatch.setattr(main.get_strava_service(), "sync_activities", sync_activities)
+    headers = {"Authorization": "Bearer fake-token"}
+
+    response = client.get("/api/v1/dashboard", headers=headers)
+    etag = response.headers["ETag"]
+    not_modified = client.get("/api/v1/dashboard", headers={**headers, "If-None-Match": etag})
+    modified = client.get("/api/v1/dashboard", headers={**headers, "If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()["strava_connected"] is True
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert modified.status_code == 200
+    assert synced == ["test_user_uid"]
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    """
+    Test that /metrics exposes the request histograms and cache counters in the Prometheus format,
+    only to a scraper holding the metrics token.
+    """
+    from app import main
+    client.get("/api/v1/")
+
+    unconfigured = client.get("/metrics")
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+    unauthorized = client.get("/metrics", headers={"Authorization": "Bearer other"})
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+
+    assert unconfigured.status_code == 404
+    assert unauthorized.status_code == 401
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'versionup_http_request_duration_seconds_count{method="GET",route="/api/v1/",status="200"}' in response.text
+    assert 'versionup_cache_lookups_total{cache="activities",result="hit"}' in response.text
@@ -0,0 +1,33 @@
+from app.ai_models import ModelSettings
+from app.models.workout_request import WorkoutRequest
+from app.prompts import TokenCounter, build_workout_messages, fit_activity_context
+
+
+def test_activity_context_is_trimmed_oldest_first():
+    """
+    Test that trimming drops the oldest activity lines and keeps the aggregates.
+    """
+    context = "\n".join(["2025-01-03 Run 5.0km 30min", "2025-01-02 Run 5.0km 30min",
+                         "2025-01-01 Run 5.0km 30min", "Weekly volume: n/a", "Training load trend: n/a"])
+
+    trimmed = fit_activity_context(context, budget=20, counter=TokenCounter())
+
+    assert trimmed.splitlines() == ["2025-01-03 Run 5.0km 30min", "Weekly volume: n/a",
+                                    "Training load trend: n/a"]
+
+
+def test_prompt_fits_the_model_budget():
+    """
+    Test that the prompt plus max output tokens stays within the model context window.
+    """
+    settings = ModelSettings(model_id="test/model", context_window=1300, max_output_tokens=200)
+    context = "\n".join(f"2025-01-{day:02d} Run 5.0km 30min avg HR 150" for day in range(28, 0, -1))
+    context += "\nWeekly volume: n/a\nTraining load trend: n/a"
+
+    messages, prompt_tokens = build_workout_messages(
+        WorkoutRequest(goal="Build Endurance", time=45), True, context, settings)
+
+    assert prompt_tokens + settings.max_output_tokens <= settings.context_window
+    assert "**User's Goal:** Build Endurance" in messages[1]["content"]
+    assert "Training load trend: n/a" in messages[1]["content"]
+    assert "2025-01-01 Run" not in messages[1]["content"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.clients import strava_client
+from app.clients.strava_rate_limit import BACKGROUND, INTERACTIVE, StravaRateLimited, StravaRateLimiter
+
+
+def test_retries_server_errors_with_backoff(mock_strava):
+    """
+    Test that 5xx responses are retried until Strava answers.
+    """
+    mock_strava.respond(503, times=2)
+
+    activities = asyncio.run(strava_client.get_activities("token", per_page=5))
+
+    assert activities == mock_strava.activities
+    assert len(mock_strava.requests) == 3
+
+
+def test_rate_limit_headers_update_usage(mock_strava):
+    """
+    Test that the limiter adopts the usage Strava reports.
+    """
+    mock_strava.short_usage, mock_strava.daily_usage = 41, 900
+
+    asyncio.run(strava_client.get_activity("token", 7))
+
+    stats = strava_client.rate_limiter.stats()
+    assert (stats["short_usage"], stats["daily_usage"]) == (42, 901)
+    assert (stats["short_limit"], stats["daily_limit"]) == (200, 2000)
+
+
+def test_interactive_call_fails_fast_when_quota_is_spent(mock_strava):
+    """
+    Test that after a 429 an interactive call raises instead of waiting for the window to reset.
+    """
+    mock_strava.short_usage = mock_strava.short_limit
+    mock_strava.respond(429)
+
+    with pytest.raises(StravaRateLimited):
+        asyncio.run(strava_client.get_activities("token", per_page=5))
+    assert len(mock_strava.requests) == 1
+
+
+def test_call_timeout_bounds_a_slow_response(mock_strava):
+    """
+    Test that a hanging Strava response is cut off by the per-call timeout.
+    """
+    mock_strava.respond(200, delay=1.0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(strava_client.request("GET", f"{strava_client.STRAVA_API_BASE_URL}/athlete/activities",
+                                          timeout=0.05))
+
+
+def test_background_lane_keeps_a_reserve_for_interactive_calls():
+    """
+    Test that background calls stop at the reserve while interactive calls still go through.
+    """
+    limiter = StravaRateLimiter(reserve=0.2, clock=lambda: 1_000_000.0)
+    limiter.update({"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "160,500"})
+
+    assert limiter.try_acquire(BACKGROUND) > 0
+    assert limiter.try_acquire(INTERACTIVE) == 0
+    assert limiter.short_usage == 161
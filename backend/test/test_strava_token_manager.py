@@ -0,0 +1,61 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from services.strava_token_manager import StravaTokenError, StravaTokenManager
+
+
+def _manager(mocker):
+    manager = StravaTokenManager(MagicMock(), client_id="1", client_secret="s")
+    # Store whatever was refreshed, the Firestore transaction is not under test here
+    mocker.patch.object(manager, '_persist', side_effect=lambda user_uid, refreshed: refreshed)
+    return manager
+
+
+def test_fresh_token_is_served_from_memory(mocker):
+    """
+    Test that a token far from expiry is returned without refreshing or reading Firestore.
+    """
+    refresh = mocker.patch('app.clients.strava_client.refresh_access_token', new_callable=AsyncMock)
+    manager = _manager(mocker)
+    manager.remember("uid", {"access_token": "a1", "refresh_token": "r1", "expires_at": time.time() + 3600})
+
+    assert asyncio.run(manager.get_access_token("uid")) == "a1"
+    refresh.assert_not_awaited()
+    manager.firestore_db.collection.assert_not_called()
+
+
+def test_concurrent_requests_share_one_refresh(mocker):
+    """
+    Test that requests racing on an expiring token trigger a single refresh.
+    """
+    async def slow_refresh(client_id, client_secret, refresh_token):
+        await asyncio.sleep(0.01)
+        return {"access_token": "a2", "refresh_token": "r2", "expires_at": int(time.time()) + 21600}
+
+    refresh = mocker.patch('app.clients.strava_client.refresh_access_token', side_effect=slow_refresh)
+    manager = _manager(mocker)
+    stored = {"access_token": "a1", "refresh_token": "r1", "expires_at": int(time.time()) + 60}
+
+    async def run():
+        return await asyncio.gather(*(manager.get_access_token("uid", stored) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["a2"] * 10
+    assert refresh.call_count == 1
+    assert refresh.call_args.args[2] == "r1"
+    assert manager.refreshes == 1
+
+
+def test_failed_refresh_raises(mocker):
+    """
+    Test that an expired token whose refresh fails raises StravaTokenError.
+    """
+    mocker.patch('app.clients.strava_client.refresh_access_token', new_callable=AsyncMock,
+                 side_effect=RuntimeError("400 Bad Request"))
+    manager = _manager(mocker)
+    stored = {"access_token": "a1", "refresh_token": "r1", "expires_at": int(time.time()) - 10}
+
+    with pytest.raises(StravaTokenError):
+        asyncio.run(manager.get_access_token("uid", stored))
@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+from unittest.mock import patch
+
+from services.strava_webhook import StravaWebhookProcessor
+
+
+class FakeStravaEventSource:
+    """
+    Produces push events shaped like the ones Strava sends to the callback URL.
+    """
+
+    def __init__(self, owner_id, subscription_id=1):
+        self.owner_id = owner_id
+        self.subscription_id = subscription_id
+        self._clock = itertools.count(1_700_000_000)
+
+    def event(self, aspect_type, activity_id, object_type="activity"):
+        return {
+            "aspect_type": aspect_type,
+            "event_time": next(self._clock),
+            "object_id": activity_id,
+            "object_type": object_type,
+            "owner_id": self.owner_id,
+            "subscription_id": self.subscription_id,
+            "updates": {},
+        }
+
+
+class InMemoryActivityStore:
+    def __init__(self, users):
+        self.users = users
+        self.activities = {uid: {} for uid in users}
+
+    async def find_user_by_athlete(self, athlete_id):
+        for uid, data in self.users.items():
+            if (data['strava_tokens'] or {}).get('athlete', {}).get('id') == athlete_id:
+                return uid, data
+        return None
+
+    async def upsert_activities(self, user_uid, activities):
+        for activity in activities:
+            self.activities[user_uid][activity['id']] = activity
+        return len(activities)
+
+    async def delete_activity(self, user_uid, activity_id):
+        self.activities[user_uid].pop(activity_id, None)
+
+    async def update_sync_state(self, user_uid, **state):
+        self.users[user_uid].setdefault('strava_sync', {}).update(state)
+
+    async def clear_strava_tokens(self, user_uid):
+        self.users[user_uid]['strava_tokens'] = None
+
+
+def test_webhook_events_update_the_athlete_store_in_one_batch():
+    """
+    Test that queued events are applied in a batch with one fetch per changed activity,
+    leaving the sync cursor to sync_recent.
+    """
+    store = InMemoryActivityStore({
+        "uid-1": {'strava_tokens': {'access_token': 'token', 'athlete': {'id': 42}}},
+    })
+    store.activities["uid-1"][7] = {"id": 7}
+    source = FakeStravaEventSource(owner_id=42)
+    fetched = []
+
+    async def fake_get_activity(access_token, activity_id, priority):
+        fetched.append(activity_id)
+        return {"id": activity_id, "name": f"Activity {activity_id}", "start_date": "2025-01-01T08:00:00Z"}
+
+    async def scenario():
+        processor = StravaWebhookProcessor(store, batch_wait_seconds=0.05)
+        processor.start()
+        for event in [source.event("create", 1), source.event("update", 1),
+                      source.event("create", 2), source.event("delete", 7),
+                      source.event("update", 42, object_type="athlete")]:
+            processor.enqueue(event)
+        await processor.drain()
+        await processor.stop()
+
+    with patch('app.clients.strava_client.get_activity', side_effect=fake_get_activity):
+        asyncio.run(scenario())
+
+    assert sorted(fetched) == [1, 2]
+    assert sorted(store.activities["uid-1"]) == [1, 2]
+    assert 'strava_sync' not in store.users["uid-1"]
+
+
+def test_deauthorization_clears_the_athlete_tokens():
+    """
+    Test that an athlete revoking access clears their tokens and notifies the app, and other athlete updates are dropped.
+    """
+    store = InMemoryActivityStore({
+        "uid-1": {'strava_tokens': {'access_token': 'token', 'athlete': {'id': 42}}},
+    })
+    source = FakeStravaEventSource(owner_id=42)
+    deauthorized = []
+
+    async def on_deauthorized(user_uid):
+        deauthorized.append(user_uid)
+
+    revoked = {**source.event("update", 42, object_type="athlete"), "updates": {"authorized": "false"}}
+    processor = StravaWebhookProcessor(store, on_deauthorized=on_deauthorized)
+
+    assert not processor.enqueue(source.event("update", 42, object_type="athlete"))
+    asyncio.run(processor.process_batch([revoked, source.event("delete", 7)]))
+
+    assert store.users["uid-1"]['strava_tokens'] is None
+    assert deauthorized == ["uid-1"]
+
+
+def test_malformed_events_are_dropped_one_at_a_time():
+    """
+    Test that events missing their ids or aspect type are not queued, and do not stop the rest of a batch.
+    """
+    store = InMemoryActivityStore({
+        "uid-1": {'strava_tokens': {'access_token': 'token', 'athlete': {'id': 42}}},
+    })
+    store.activities["uid-1"][7] = {"id": 7}
+    source = FakeStravaEventSource(owner_id=42)
+    missing_id = {key: value for key, value in source.event("create", 1).items() if key != "object_id"}
+    unknown_aspect = source.event("archive", 2)
+    processor = StravaWebhookProcessor(store)
+
+    assert not processor.enqueue(missing_id)
+    assert not processor.enqueue(unknown_aspect)
+    assert not processor.enqueue({**source.event("create", 3), "owner_id": "42"})
+    asyncio.run(processor.process_batch([missing_id, unknown_aspect, source.event("delete", 7)]))
+
+    assert store.activities["uid-1"] == {}
+
+
+def test_webhook_validation_handshake(client, monkeypatch):
+    """
+    Test that the subscription handshake echoes the challenge for the right verify token.
+    """
+    monkeypatch.setattr('app.main.STRAVA_WEBHOOK_VERIFY_TOKEN', 'secret')
+
+    response = client.get("/api/v1/strava/webhook",
+                           params={"hub.mode": "subscribe", "hub.verify_token": "secret", "hub.challenge": "abc"})
+    rejected = client.get("/api/v1/strava/webhook",
+                          params={"hub.mode": "subscribe", "hub.verify_token": "wrong", "hub.challenge": "abc"})
+
+    assert response.status_code == 200
+    assert response.json() == {"hub.challenge": "abc"}
+    assert rejected.status_code == 403
+
+
+def test_webhook_event_is_acknowledged_and_queued(client, mocker):
+    """
+    Test that the receiver acknowledges immediately and hands the event to the queue.
+    """
+    enqueue = mocker.patch('app.main.webhook_processor.enqueue')
+    event = FakeStravaEventSource(owner_id=42).event("create", 1)
+
+    response = client.post("/api/v1/strava/webhook", json=event)
+
+    assert response.status_code == 200
+    enqueue.assert_called_once_with(event)
+
+
+def test_webhook_rejects_a_body_that_is_not_json(client):
+    """
+    Test that a malformed webhook body is answered with 400 rather than a server error.
+    """
+    response = client.post("/api/v1/strava/webhook", content=b"not json",
+                           headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
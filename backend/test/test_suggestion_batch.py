@@ -0,0 +1,155 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from app.models.workout_request import WorkoutRequest
+from fake_firestore import FakeFirestore
+from services.activity_store import ActivityStore
+from services.ready_suggestions import ReadySuggestionStore
+from services.suggestion_batch import SuggestionBatch
+from services.workout_plans import InvalidSuggestion
+
+REQUEST = {"goal": "Build Endurance", "equipment": "", "time": 45, "requirements": ""}
+
+
+def _add_user(db, uid, requested_days_ago=1, connected=False, **request):
+    requested_at = datetime.now(timezone.utc) - timedelta(days=requested_days_ago)
+    data = {"last_workout_request": {**REQUEST, **request, "requested_at": requested_at}}
+    if connected:
+        data["strava_tokens"] = {"access_token": f"token-{uid}"}
+    db.collection("users").document(uid).set(data)
+
+
+def _batch(db, generate, **options):
+    activity_store = ActivityStore(db)
+    ready_store = ReadySuggestionStore(db)
+
+    async def load_metrics(user_uid):
+        return f"metrics of {user_uid}"
+
+    options = {"requests_per_minute": 0, "progress_seconds": 60, **options}
+    return SuggestionBatch(db, activity_store, ready_store, generate, load_metrics, **options), ready_store
+
+
+def test_ready_slot_serves_only_a_fresh_matching_request():
+    """
+    Test that the ready suggestion is served for the request it was generated for, until it expires or activities change.
+    """
+    db = FakeFirestore()
+    activity_store = ActivityStore(db)
+    ready_store = ReadySuggestionStore(db)
+    activity_store.add_listener(ready_store.on_activities)
+    request = WorkoutRequest(**REQUEST)
+
+    async def scenario():
+        await ready_store.put("uid-1", request, "Plan", "2025-01-01")
+        served = await ready_store.get("uid-1", WorkoutRequest(**{**REQUEST, "goal": " build endurance"}))
+        other = await ready_store.get("uid-1", WorkoutRequest(**{**REQUEST, "time": 30}))
+        await activity_store.upsert_activities("uid-1", [{"id": 1, "type": "Run", "start_date": "2025-01-02"}])
+        await asyncio.sleep(0.01)
+        return served, other, await ready_store.get("uid-1", request)
+
+    served, other, after_sync = asyncio.run(scenario())
+
+    assert (served, other, after_sync) == ("Plan", None, None)
+    expired = {"request_key": "key", "content": "Plan", "expires_at": time.time() - 1}
+    assert not ready_store.is_fresh(expired)
+
+
+def test_batch_generates_for_recently_active_users():
+    """
+    Test that only users with a recent request get a suggestion, built from their stored activities and metrics.
+    """
+    db = FakeFirestore()
+    _add_user(db, "active", connected=True)
+    _add_user(db, "disconnected", goal="Get Strong")
+    _add_user(db, "inactive", requested_days_ago=30)
+    calls = {}
+
+    async def generate(request, is_strava_connected, activities, metrics_str):
+        calls[request.goal] = (is_strava_connected, len(activities), metrics_str)
+        return f"Plan for {request.goal}"
+
+    batch, ready_store = _batch(db, generate, page_size=1)
+    asyncio.run(batch.activity_store.upsert_activities(
+        "active", [{"id": 1, "type": "Run", "start_date": "2025-01-02T08:00:00Z"}]))
+    progress = asyncio.run(batch.run(batch_id="b1"))
+
+    assert progress.status == "done"
+    assert (progress.generated, progress.failed) == (2, 0)
+    assert calls["Build Endurance"] == (True, 1, "metrics of active")
+    assert calls["Get Strong"][:2] == (False, 0)
+    assert asyncio.run(ready_store.get("disconnected", WorkoutRequest(**{**REQUEST, "goal": "Get Strong"}))) \
+        == "Plan for Get Strong"
+    assert asyncio.run(ready_store.read("inactive")) is None
+    assert db.collection("suggestion_batches").document("b1").get().to_dict()["status"] == "done"
+
+
+def test_interrupted_batch_resumes_after_its_checkpoint():
+    """
+    Test that a second run of the same batch only generates for the users the first one did not reach.
+    """
+    db = FakeFirestore()
+    for index in range(5):
+        _add_user(db, f"uid-{index}")
+    generated = []
+
+    async def generate(request, is_strava_connected, activities, metrics_str):
+        generated.append(request.goal)
+        return "Plan"
+
+    batch, _ = _batch(db, generate, page_size=2)
+    first = asyncio.run(batch.run(batch_id="b1", max_users=2))
+    second = asyncio.run(batch.run(batch_id="b1"))
+    again = asyncio.run(batch.run(batch_id="b1"))
+
+    assert first.status == "running"
+    assert second.status == "done"
+    assert (second.processed, second.generated) == (5, 5)
+    assert again.processed == 5
+    assert len(generated) == 5
+
+
+def test_throttled_requests_are_retried():
+    """
+    Test that a 429 from the inference provider is retried after its Retry-After and counted.
+    """
+    db = FakeFirestore()
+    _add_user(db, "uid-1")
+    attempts = []
+
+    async def generate(request, is_strava_connected, activities, metrics_str):
+        attempts.append(1)
+        if len(attempts) == 1:
+            response = httpx.Response(429, headers={"Retry-After": "0"},
+                                      request=httpx.Request("POST", "http://inference"))
+            raise httpx.HTTPStatusError("Too Many Requests", request=response.request, response=response)
+        return "Plan"
+
+    batch, _ = _batch(db, generate)
+    progress = asyncio.run(batch.run(batch_id="b1"))
+
+    assert len(attempts) == 2
+    assert (progress.generated, progress.throttled, progress.failed) == (1, 1, 0)
+
+
+def test_invalid_output_is_not_stored():
+    """
+    Test that output that does not validate fails the user without a retry, and leaves the ready slot empty.
+    """
+    db = FakeFirestore()
+    _add_user(db, "uid-1")
+    attempts = []
+
+    async def generate(request, is_strava_connected, activities, metrics_str):
+        attempts.append(1)
+        raise InvalidSuggestion('{"summary": "Cut', 100, 4096)
+
+    batch, ready_store = _batch(db, generate)
+    progress = asyncio.run(batch.run(batch_id="b1"))
+
+    assert len(attempts) == 1
+    assert (progress.generated, progress.failed) == (0, 1)
+    assert asyncio.run(ready_store.read("uid-1")) is None
@@ -0,0 +1,78 @@
+import asyncio
+
+from app.models.workout_request import WorkoutRequest
+from services.suggestion_cache import SuggestionCache, activity_fingerprint
+
+
+def test_equivalent_requests_share_a_cache_entry():
+    """
+    Test that casing, whitespace and equipment order do not change the cache key.
+    """
+    cache = SuggestionCache(ttl_seconds=60)
+    fingerprint = activity_fingerprint([{"type": "Run", "start_date": "2025-01-01T08:00:00Z",
+                                         "distance": 5012, "moving_time": 1805}], True)
+    first = WorkoutRequest(goal="Build Endurance", time=45, equipment="Dumbbells, Bands")
+    second = WorkoutRequest(goal="  build   endurance ", time=45, equipment="bands,dumbbells")
+
+    asyncio.run(cache.put(first, fingerprint, "Plan"))
+
+    assert asyncio.run(cache.get(second, fingerprint)) == "Plan"
+    assert asyncio.run(cache.get(second, "other-history")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_strava_connection_is_part_of_the_key():
+    """
+    Test that a connected user without readable activities does not share entries with a user who never connected.
+    """
+    cache = SuggestionCache(ttl_seconds=60)
+    request = WorkoutRequest(goal="Build Endurance", time=45)
+
+    asyncio.run(cache.put(request, activity_fingerprint([], False), "Plan without Strava"))
+
+    assert asyncio.run(cache.get(request, activity_fingerprint([], True))) is None
+    assert asyncio.run(cache.get(request, activity_fingerprint([], False))) == "Plan without Strava"
+
+
+def test_training_metrics_are_part_of_the_key():
+    """
+    Test that the same activities with different training metrics do not share an entry.
+    """
+    cache = SuggestionCache(ttl_seconds=60)
+    request = WorkoutRequest(goal="Build Endurance", time=45)
+
+    asyncio.run(cache.put(request, activity_fingerprint([], True, "CTL 40"), "Plan at CTL 40"))
+
+    assert asyncio.run(cache.get(request, activity_fingerprint([], True, "CTL 55"))) is None
+    assert asyncio.run(cache.get(request, activity_fingerprint([], True, "CTL 40"))) == "Plan at CTL 40"
+
+
+def test_nearest_neighbour_match_on_embeddings():
+    """
+    Test that a near-identical request is served from the closest cached embedding.
+    """
+    vectors = {"endurance": [1.0, 0.0], "strength": [0.0, 1.0]}
+
+    async def embed(text):
+        goal = text.split(";")[0]
+        return [0.99, 0.05] if "stamina" in goal else vectors["endurance" if "endurance" in goal else "strength"]
+
+    cache = SuggestionCache(ttl_seconds=60, embed=embed, similarity_threshold=0.95)
+    asyncio.run(cache.put(WorkoutRequest(goal="Build Endurance", time=45), "fp", "Endurance plan"))
+
+    assert asyncio.run(cache.get(WorkoutRequest(goal="Build Stamina", time=45), "fp")) == "Endurance plan"
+    assert asyncio.run(cache.get(WorkoutRequest(goal="Get Strong", time=45), "fp")) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_least_recently_used_suggestion_is_evicted():
+    """
+    Test that the cache never holds more than max_entries suggestions.
+    """
+    cache = SuggestionCache(ttl_seconds=60, max_entries=2)
+    for minutes in (30, 45, 60):
+        asyncio.run(cache.put(WorkoutRequest(goal="Get Fit", time=minutes), "fp", f"{minutes} min plan"))
+
+    assert asyncio.run(cache.get(WorkoutRequest(goal="Get Fit", time=30), "fp")) is None
+    assert cache.stats()["entries"] == 2
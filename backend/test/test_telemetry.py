@@ -0,0 +1,95 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.telemetry import (Counter, Histogram, JsonFormatter, TelemetryMiddleware, http_requests, request_id_var,
+                           span, upstream_calls)
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(TelemetryMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Test that observations land in their bucket and are rendered cumulatively in the Prometheus format.
+    """
+    histogram = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'say "hi"')
+
+    lines = histogram.collect()
+
+    assert 'test_seconds_bucket{route="say \\"hi\\"",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{route="say \\"hi\\"",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{route="say \\"hi\\""} 4' in lines
+    assert lines[1] == "# TYPE test_seconds histogram"
+
+
+def test_counter_sums_per_label_set():
+    """
+    Test that a counter keeps one total per label set.
+    """
+    counter = Counter("test_total", "Test.", ("kind",))
+    counter.inc("prompt", amount=120)
+    counter.inc("prompt", amount=30)
+    counter.inc("completion", amount=5)
+
+    assert counter.value("prompt") == 150
+    assert 'test_total{kind="completion"} 5' in counter.collect()
+
+
+def test_middleware_records_route_template_and_request_id():
+    """
+    Test that requests are timed per route template, not per path, and keep a caller's request id.
+    """
+    before = http_requests.count("GET", "/items/{item_id}", 200)
+
+    with TestClient(_app()) as client:
+        response = client.get("/items/1", headers={"X-Request-ID": "abc-123"})
+        client.get("/items/2")
+        generated = client.get("/items/3").headers["X-Request-ID"]
+
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert len(generated) == 32
+    assert http_requests.count("GET", "/items/{item_id}", 200) == before + 3
+
+
+def test_span_records_errors():
+    """
+    Test that a span failing with an exception is recorded with the error status.
+    """
+    before = upstream_calls.count("firestore", "test.get", "error")
+
+    with pytest.raises(RuntimeError):
+        with span("firestore", "test.get"):
+            raise RuntimeError("unavailable")
+
+    assert upstream_calls.count("firestore", "test.get", "error") == before + 1
+
+
+def test_json_logs_carry_the_request_id():
+    """
+    Test that log lines are JSON objects with the id of the request being served.
+    """
+    record = logging.LogRecord("app.main", logging.ERROR, __file__, 1, "Error saving workout: %s", ("boom",), None)
+    token = request_id_var.set("req-1")
+    try:
+        entry = json.loads(JsonFormatter().format(record))
+    finally:
+        request_id_var.reset(token)
+
+    assert entry["severity"] == "ERROR"
+    assert entry["message"] == "Error saving workout: boom"
+    assert entry["request_id"] == "req-1"
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from fake_firestore import FakeFirestore
+from app.models.workout_plan import WorkoutPlan
+from services.workout_plans import compact_plan, expand_plan, suggestion_response, workout_document
+from services.workout_store import WorkoutStore
+
+PLAN = {
+    "summary": "Full-body conditioning and fat loss.",
+    "warm_up": "5 minutes of dynamic stretching.",
+    "days": [
+        {"title": "Day 1 – Strength & Core", "exercises": [
+            {"name": "Squats", "sets": 3, "reps": "15", "muscles": ["legs", "Glutes"],
+             "purpose": "Builds lower body strength."},
+            {"name": "Plank", "sets": 3, "reps": "30s", "muscles": ["Core", "Shoulders"], "purpose": ""},
+        ]},
+        {"title": "Day 2 – Cardio", "exercises": [
+            {"name": "Jump Squats", "sets": 4, "reps": "10", "muscles": ["Legs"], "purpose": "Power."},
+        ]},
+    ],
+    "cool_down": "Light stretching.",
+    "tips": ["Stay hydrated!"],
+}
+
+
+def _save(firestore_db, document):
+    workout_store = WorkoutStore(firestore_db)
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return workout_store, asyncio.run(workout_store.save_workouts("uid", [{**document, 'created_at': created_at}]))[0]
+
+
+def test_suggestion_response_validates_plan_or_keeps_text():
+    """
+    Test that a JSON plan is returned with its rendered text, and other output as generated.
+    """
+    response = suggestion_response(json.dumps(PLAN))
+
+    assert response["plan"] == PLAN
+    assert "**Day 2 – Cardio**" in response["suggestion"]
+    assert "1. Squats – 3x15" in response["suggestion"]
+    assert suggestion_response("Run 5k.") == {"suggestion": "Run 5k."}
+    # A completion cut off by the token limit is not a plan
+    assert suggestion_response(json.dumps(PLAN)[:-20]) == {"suggestion": json.dumps(PLAN)[:-20]}
+
+
+def test_compact_plan_round_trip():
+    """
+    Test that a plan is stored with shared muscle names and normalized exercise keys, and expands back.
+    """
+    stored = compact_plan(WorkoutPlan.model_validate(PLAN))
+
+    assert stored["plan"]["muscles"] == ["Legs", "Glutes", "Core", "Shoulders"]
+    assert stored["exercises"] == ["jump squats", "plank", "squats"]
+    assert stored["days"] == ["Day 1 – Strength & Core", "Day 2 – Cardio"]
+    assert "purpose" not in stored["plan"]["days"]["d1"]["exercises"][1]
+    expanded = expand_plan(stored["summary"], stored["plan"])
+    assert expanded["days"][0]["exercises"][0]["muscles"] == ["Legs", "Glutes"]
+    assert expanded["days"][1] == PLAN["days"][1]
+
+
+def test_list_workouts_summary_and_exercise_filter():
+    """
+    Test that listing summaries leaves the plan out and the exercise filter matches normalized names.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, workout_id = _save(firestore_db, workout_document(None, WorkoutPlan.model_validate(PLAN)))
+    _save(firestore_db, {'suggestion': 'Run 5k.'})
+
+    workouts, _ = asyncio.run(workout_store.list_workouts("uid", limit=10, fields=['summary']))
+    matches, _ = asyncio.run(workout_store.list_workouts("uid", limit=10, exercise="jump-squats"))
+
+    assert {tuple(sorted(workout)) for workout in workouts} == {("created_at", "id", "summary"), ("created_at", "id")}
+    assert [workout['id'] for workout in matches] == [workout_id]
+    assert matches[0]['plan']['days'][1]['title'] == "Day 2 – Cardio"
+    assert matches[0]['suggestion'].startswith(PLAN["summary"])
+
+
+def test_get_workout_day_reads_one_day():
+    """
+    Test that a single day is read with its muscle names, and text workouts have no days.
+    """
+    firestore_db = FakeFirestore()
+    workout_store, workout_id = _save(firestore_db, workout_document(None, WorkoutPlan.model_validate(PLAN)))
+    _, text_id = _save(firestore_db, {'suggestion': 'Run 5k.'})
+
+    day = asyncio.run(workout_store.get_workout_day("uid", workout_id, 2))
+
+    assert day == {"id": workout_id, "summary": PLAN["summary"], "day": 2, "days": 2, **PLAN["days"][1]}
+    assert asyncio.run(workout_store.get_workout_day("uid", workout_id, 3)) is None
+    assert asyncio.run(workout_store.get_workout_day("uid", text_id, 1)) is None
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.workout_store import InvalidCursor, WorkoutStore, decode_cursor, encode_cursor
+
+
+def _workout_doc(workout_id, day):
+    doc = MagicMock()
+    doc.id = workout_id
+    doc.to_dict.return_value = {
+        'suggestion': f'Workout {workout_id}',
+        'created_at': datetime(2025, 1, day, tzinfo=timezone.utc),
+    }
+    return doc
+
+
+def test_cursor_round_trip():
+    """
+    Test that a page cursor decodes back to the sort key it was built from.
+    """
+    created_at = datetime(2025, 1, 2, 8, 30, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_list_workouts_returns_next_cursor():
+    """
+    Test that a full page returns a cursor after its last workout and the query resumes from it.
+    """
+    firestore_db = MagicMock()
+    query = (firestore_db.collection.return_value.document.return_value.collection.return_value
+             .order_by.return_value.order_by.return_value.limit.return_value)
+    query.stream.return_value = [_workout_doc("w3", 3), _workout_doc("w2", 2), _workout_doc("w1", 1)]
+    store = WorkoutStore(firestore_db)
+
+    workouts, next_cursor = asyncio.run(store.list_workouts("uid", limit=2))
+
+    assert [w['id'] for w in workouts] == ["w3", "w2"]
+    assert decode_cursor(next_cursor) == (datetime(2025, 1, 2, tzinfo=timezone.utc), "w2")
+
+    query.start_after.return_value.stream.return_value = [_workout_doc("w1", 1)]
+    workouts, next_cursor = asyncio.run(store.list_workouts("uid", limit=2, cursor=next_cursor))
+
+    query.start_after.assert_called_once_with([datetime(2025, 1, 2, tzinfo=timezone.utc), "w2"])
+    assert [w['id'] for w in workouts] == ["w1"]
+    assert next_cursor is None
@@ -16,12 +16,13 @@ export default function ActivitiesPage() {
         try {
           const token = await user.getIdToken();
           const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-          const response = await axios.get<StravaActivity[]>(`${apiUrl}/api/v1/strava/activities`, {
+          // The browser revalidates the dashboard with its ETag and reuses the cached copy on 304
+          const response = await axios.get<Dashboard>(`${apiUrl}/api/v1/dashboard`, {
             headers: {
               Authorization: `Bearer ${token}`,
             },
           });
-          setActivities(response.data);
+          setActivities(response.data.recent_activities);
         } catch (err) {
           if (axios.isAxiosError(err)) {
             setError(err.response?.data?.detail || 'Failed to fetch activities.');
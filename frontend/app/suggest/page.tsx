@@ -11,6 +11,7 @@ export default function SuggestWorkoutPage() {
   const [requirements, setRequirements] = useState('');
   const [time, setTime] = useState(45);
   const [suggestion, setSuggestion] = useState('');
+  const [plan, setPlan] = useState<WorkoutPlan | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
   const [isStravaConnected, setIsStravaConnected] = useState(true);
@@ -27,6 +28,7 @@ export default function SuggestWorkoutPage() {
     setIsLoading(true);
     setError('');
     setSuggestion('');
+    setPlan(null);
 
     if (!user) {
       setError('You must be logged in to get a suggestion.');
@@ -53,6 +55,7 @@ export default function SuggestWorkoutPage() {
 
       const data = await response.json();
       setSuggestion(data.suggestion);
+      setPlan(data.plan ?? null);
     } catch (err: any) {
       setError(err.message);
     } finally {
@@ -78,7 +81,8 @@ export default function SuggestWorkoutPage() {
             'Content-Type': 'application/json',
             'Authorization': `Bearer ${token}`,
           },
-          body: JSON.stringify({ suggestion: suggestion }),
+          // A plan is stored compactly and its text rendered on read, no need to send both
+          body: JSON.stringify(plan ? { plan } : { suggestion }),
         });
 
         if (!response.ok) {
@@ -88,6 +92,7 @@ export default function SuggestWorkoutPage() {
 
         alert('Workout saved successfully!');
         setSuggestion('');
+        setPlan(null);
       } catch (err: any) {
         setError(err.message);
       } finally {
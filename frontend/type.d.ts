@@ -7,9 +7,32 @@ interface StravaActivity {
   start_date_local: string;
 }
 
+interface Exercise {
+  name: string;
+  sets: number;
+  reps: string;
+  muscles: string[];
+  purpose: string;
+}
+
+interface WorkoutDay {
+  title: string;
+  exercises: Exercise[];
+}
+
+interface WorkoutPlan {
+  summary: string;
+  warm_up: string;
+  days: WorkoutDay[];
+  cool_down: string;
+  tips: string[];
+}
+
 interface Workout {
   id: string;
   suggestion: string;
+  summary?: string;
+  plan?: WorkoutPlan;
   created_at: string;
 }
 
@@ -20,7 +43,8 @@ interface WorkoutRequest {
 }
 
 interface WorkoutToSave {
-  suggestion: string;
+  suggestion?: string;
+  plan?: WorkoutPlan;
 }
 
 interface UserProfile {
@@ -29,3 +53,20 @@ interface UserProfile {
   gender?: 'Male' | 'Female' | 'Other' | 'Prefer not to say';
   workout_level?: 'Beginner' | 'Intermediate' | 'Advanced';
 }
+
+interface DashboardMetrics {
+  activities: number;
+  fitness: { ctl: number; atl: number; tsb: number; as_of: string };
+  this_week: { week: string; sessions: number; distance_km: number; moving_min: number; load: number } | null;
+  weekly: { week: string; sessions: number; distance_km: number; moving_min: number; load: number }[];
+}
+
+interface Dashboard {
+  version: string;
+  built_at: string;
+  strava_connected: boolean;
+  profile: UserProfile;
+  recent_activities: StravaActivity[];
+  latest_workout: Workout | null;
+  metrics: DashboardMetrics | null;
+}